@@ -4,9 +4,18 @@ from LLM.call_llm_api.call_llm import main_logger
 import config
 import os
 import re
+import json
 import subprocess
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Process, Queue
-from configs.rollout_config import run_times
+from configs.rollout_config import (run_times, use_instance_pool, pool_size, use_eval_cache, cache_top_up,
+                                    game_wall_timeout, max_games_in_flight)
+from rollout import (get_evaluation_service, planned_games, stop_decision, rollout_seed, timeout_record,
+                     kill_process_tree, RESULT_PATH_ENV, SEED_ENV)
+from preflight import preflight
+from evaluation_cache import evaluation_key, load_evaluation, save_evaluation
 
 class LLMCoder:
 
@@ -57,7 +66,7 @@ The basic task content is:
         
         
 
-    def generate_code(self, promotion='', retry = 0):
+    def generate_code(self, promotion='', retry = 0, path='res-temp.py'):
 
         if retry == 10:
             return
@@ -94,17 +103,29 @@ The basic task content is:
                         1
                     )
                 else:
-                    return self.generate_code(promotion, retry + 1)
+                    return self.generate_code(promotion, retry + 1, path)
 
             total_code = self.prefix_code + code + self.post_code
 
-            with open('res-temp.py', 'w') as writer:
+            with open(path, 'w') as writer:
                 writer.write(total_code)
 
             return total_code
         except:
             # print("somewhere fault\n")
-            return self.generate_code(promotion, retry + 1)
+            return self.generate_code(promotion, retry + 1, path)
+
+    def generate_candidates(self, promotion, k):
+        """
+        并发请求 k 份候选代码，分别写入 res-cand{i}.py
+
+        Returns:
+            list: 生成成功的候选文件路径
+        """
+        paths = ['res-cand{}.py'.format(i) for i in range(k)]
+        with ThreadPoolExecutor(max_workers=k) as executor:
+            codes = list(executor.map(lambda path: self.generate_code(promotion, path=path), paths))
+        return [path for path, code in zip(paths, codes) if code is not None]
         
     def clean_ansi_codes(self, text):
         """移除ANSI转义序列（颜色代码）"""
@@ -139,147 +160,334 @@ The basic task content is:
 
         return numeric_values
 
+    def archive_code(self, path, label, times, restart_idx, iter_idx):
+        """把测试过的代码归档为 res-{label}-{times}-temp{restart_idx}-{iter_idx}.py，候选代码额外带上候选文件名"""
+        suffix = '' if path == 'res-temp.py' else '-' + os.path.splitext(os.path.basename(path))[0]
+        os.popen('mv {} res-{}-{}-temp{}-{}{}.py'.format(path, label, times, restart_idx, iter_idx, suffix))
+
     def test_code(self, restart_idx, iter_idx):
 
         main_logger.debug('Start Testing')
         print('Start Testing')
-        running = subprocess.Popen('python res-temp.py', shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        invoke_result = running.stdout.read().decode('utf-8', errors='ignore')
+        with open('res-temp.py', 'r', encoding='utf-8', errors='ignore') as file:
+            code = file.read()
+
+        if not use_eval_cache:
+            return self.run_tests(code, [], restart_idx, iter_idx)
+
+        key = evaluation_key(code)
+        cached = load_evaluation(key)
+        if cached is not None and self.cache_complete(cached):
+            main_logger.debug('Reuse cached evaluation ' + key)
+            print('Reuse cached evaluation')
+            return self.cached_result(cached, restart_idx, iter_idx)
+
+        # 缓存中的对局数不够时只补充剩余的对局
+        prior = cached['records'] if cached is not None else []
+        data = self.run_tests(code, prior, restart_idx, iter_idx)
+        save_evaluation(key, data)
+        return data
+
+    def cache_complete(self, cached):
+        """缓存的结果是 bug、已经能做出判断或者不需要补充对局时，直接使用缓存"""
+        if cached['type'] == 'bug' or not cache_top_up:
+            return True
+        planned = planned_games()
+        return len(cached['records']) >= planned or stop_decision(cached['records'], planned) is not None
+
+    def cached_result(self, cached, restart_idx, iter_idx, path='res-temp.py'):
+        """把缓存条目还原成 test_code 的结果字典，并像正常测试一样归档代码文件"""
+        if cached['type'] == 'bug':
+            self.archive_code(path, 'X', run_times, restart_idx, iter_idx)
+            return {'type': 'bug', 'message': cached['message']}
+        return self.aggregate_results(cached['records'], restart_idx, iter_idx, path)
+
+    def run_tests(self, code, prior, restart_idx, iter_idx):
+        """预检并运行对局；prior 是缓存中已有的对局记录，非空时代码已经确认可以运行，跳过预检和探测对局"""
+        planned = planned_games()
+        decide = lambda finished: stop_decision(prior + finished, planned)
+        if prior:
+            if use_instance_pool:
+                records = get_evaluation_service().evaluate_until(code, planned - len(prior), decide,
+                                                                  first_index=len(prior))
+            else:
+                records = run_games_until(planned - len(prior), decide, first_index=len(prior))
+            return self.aggregate_results(prior + records, restart_idx, iter_idx)
 
-        units_num = 0
-        enemy_num = 0
-        v = 0
-        d = 0
-        t = 0
+        check = self.preflight_code(code, restart_idx, iter_idx)
+        if check['type'] == 'bug':
+            return {'type': 'bug', 'message': check['message']}
 
-        score = 0
-        damage_dealt = 0
-        damage_taken = 0
-        damage_shield = 0
+        if use_instance_pool:
+            return self.test_code_pooled(code, check['driven'], restart_idx, iter_idx)
 
         times = run_times
 
+        # 预检已经驱动过 on_step 时，不再需要完整的探测对局
+        invoke_result = 'preflight passed'
+        if not check['driven']:
+            running = subprocess.Popen('python res-temp.py', shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            try:
+                invoke_result = running.communicate(timeout=game_wall_timeout)[0].decode('utf-8', errors='ignore')
+            except subprocess.TimeoutExpired:
+                # 卡住的探测对局不算 bug，正式对局会按平局记录
+                kill_process_tree(running.pid)
+                running.communicate()
+                invoke_result = 'probe game timed out'
+
         if 'Traceback' in invoke_result or 'Error' in invoke_result:
             # BUG
             print('-------------------BUG!!!--------------------')
             print(invoke_result)
-            os.popen('mv res-temp.py res-{}-{}-temp{}-{}.py'.format('X', times, restart_idx, iter_idx))
-            return {'type': 'bug', 'message': invoke_result}
+            self.archive_code('res-temp.py', 'X', times, restart_idx, iter_idx)
+            return {'type': 'bug', 'message': invoke_result, 'retry': True}
 
         elif invoke_result == '':
 
-            os.popen('mv res-temp.py res-{}-{}-temp{}-{}.py'.format('X', times, restart_idx, iter_idx))
-            return {'type': 'bug', 'message': 'code incomplete'}
+            self.archive_code('res-temp.py', 'X', times, restart_idx, iter_idx)
+            return {'type': 'bug', 'message': 'code incomplete', 'retry': True}
 
         else:
 
-            q = Queue()
-
-            process_list = []
-
-            for _ in range(times):
-                p = Process(target=run_game, args=(q,))
-                p.start()
-                process_list.append(p)
-
-            for i in range(times):
-                process_list[i].join()
-
-            for _ in range(times):
-                data = q.get()
-                code_result = data['result']
-                if code_result == 'bug':
-                    os.popen('mv res-temp.py res-{}-{}-temp{}-{}.py'.format('X', times, restart_idx, iter_idx))
-                    return {'type': 'bug', 'message': data['content']}
-                u, eu, r, s, dd, dt, ds = data['content']
-                if r == 'v':
-                    v += 1
-                elif r == 'd':
-                    d += 1
-                else:
-                    t += 1
-                score += s
-                damage_dealt += dd
-                damage_taken += dt
-                damage_shield += ds
-
-                units_num += u
-                enemy_num += eu
-
-            score /= times
-            damage_dealt /= times
-            damage_taken /= times
-            damage_shield /= times
-
-            units_num /= times
-            enemy_num /= times
-
-            print(
-                'You Win {}, Tie {}, and Lose {} out of {} times. There are {} units and {} enemy units left.'.format(v,
-                                                                                                                      t,
-                                                                                                                      d,
-                                                                                                                      times,
-                                                                                                                      units_num,
-                                                                                                                      enemy_num))
-            print(
-                'You achieve {} scores, give {} damages to the enemy, take {} damage on health, and take {} damage on shield on average.'.format(
-                    score, damage_dealt, damage_taken, damage_shield))
-            main_logger.info(
-                'You Win {}, Tie {}, and Lose {} out of {} times. There are {} units and {} enemy units left.'.format(v,
-                                                                                                                      t,
-                                                                                                                      d,
-                                                                                                                      times,
-                                                                                                                      units_num,
-                                                                                                                      enemy_num) +
-                'You achieve {} scores, give {} damages to the enemy, take {} damage on health, and take {} damage on shield on average.'.format(
-                    score, damage_dealt, damage_taken, damage_shield)
-                )
-
-            os.popen('mv res-temp.py res-{}-{}-temp{}-{}.py'.format(v, times, restart_idx, iter_idx))
-
-            for p in process_list:
-                p.close()
-
-            return {'type': 'result',
-                    'message': {"win": v, "tie": t, "lose": d, "times": times, "score": score, "damage": damage_dealt,
-                                "damage_taken": damage_taken, "damage_shield": damage_shield, "units_num": units_num,
-                                "enemy_num": enemy_num}}
-
-
-def run_game(q):
-    r = ''
-
-    running = subprocess.Popen('python res-temp.py', shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-    result = running.stdout.read().decode('utf-8', errors='ignore')
-    if '<Result' in result:
-        startpoint = re.search("<Result", result, re.DOTALL).start()
-    else:
-        q.put({'result': 'bug', 'content':"result disappear !!!"})
-        return
-    result = result[startpoint:]
-    if 'Traceback' in result or 'Error' in result:
-        q.put({'result': 'bug', 'content':result})
-        return
-    try:
-        cells = result.split('\n')
-        print('-----------------------------------')
-        print(result)
-        print(cells)
-        score = float(cells[1])
-        damage_dealt = float(cells[2])
-        damage_taken = float(cells[3])
-        damage_shield = float(cells[4])
-        unit_num = float(cells[5])
-        enemy_unit_num = float(cells[6])
-
-        if "Result.Victory" in cells[0].split(',')[0]:
-            r = 'v'
-            enemy_unit_num = 0
-        elif 'Result.Defeat' in cells[0].split(',')[0]:
-            r = 'd'
-            unit_num = 0
-        else: 
-            r = 't'
-        q.put({'result': 'data', 'content':(unit_num, enemy_unit_num, r, score, damage_dealt, damage_taken, damage_shield)})
-    except:
-        q.put({'result': 'bug', 'content':result})
\ No newline at end of file
+            records = run_games_until(planned, decide)
+            return self.aggregate_results(records, restart_idx, iter_idx)
+
+    def preflight_code(self, code, restart_idx, iter_idx, path='res-temp.py'):
+        """不启动 SC2 的快速预检，发现 bug 时与探测对局一样归档代码文件"""
+        check = preflight(code, path=path)
+        if check['type'] == 'bug':
+            print('-------------------BUG!!!--------------------')
+            print(check['message'])
+            self.archive_code(path, 'X', run_times, restart_idx, iter_idx)
+        elif check['type'] == 'unknown':
+            main_logger.debug('Preflight inconclusive, fall back to the probe game:\n' + check['message'])
+        return check
+
+    def test_code_pooled(self, code, preflight_driven, restart_idx, iter_idx):
+        """在常驻的 SC2 实例池上测试代码，预检未驱动 on_step 时先跑一局检查 bug，再跑 run_times 局统计结果"""
+        service = get_evaluation_service()
+
+        if not preflight_driven:
+            probe = service.evaluate(code, 1)[0]
+            if probe['result'] == 'bug':
+                print('-------------------BUG!!!--------------------')
+                print(probe['content'])
+                self.archive_code('res-temp.py', 'X', run_times, restart_idx, iter_idx)
+                return {'type': 'bug', 'message': probe['content'], 'retry': True}
+
+        planned = planned_games()
+        records = service.evaluate_until(code, planned, lambda finished: stop_decision(finished, planned))
+        return self.aggregate_results(records, restart_idx, iter_idx)
+
+    def test_candidates(self, paths, restart_idx, iter_idx):
+        """
+        并行评估多份候选代码，保留胜率、得分、伤害最高的一份并写回 res-temp.py
+
+        Returns:
+            tuple: (最佳候选的测试结果, 最佳候选的代码)
+        """
+        main_logger.debug('Start Testing {} candidates'.format(len(paths)))
+        print('Start Testing {} candidates'.format(len(paths)))
+        codes = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='ignore') as file:
+                codes.append(file.read())
+
+        results = [None] * len(paths)
+        keys = [evaluation_key(code) if use_eval_cache else None for code in codes]
+        live = []
+        reused = set()
+        for i, code in enumerate(codes):
+            cached = load_evaluation(keys[i]) if keys[i] else None
+            if cached is not None and self.cache_complete(cached):
+                results[i] = self.cached_result(cached, restart_idx, iter_idx, paths[i])
+                reused.add(i)
+                continue
+            check = self.preflight_code(code, restart_idx, iter_idx, paths[i])
+            if check['type'] == 'bug':
+                results[i] = {'type': 'bug', 'message': check['message']}
+            else:
+                live.append(i)
+
+        # 每份候选的第一局同时充当探测对局，出现 bug 时 stop_decision 会立即停止该候选
+        planned = planned_games()
+        decide = lambda finished: stop_decision(finished, planned)
+        if live and use_instance_pool:
+            records = get_evaluation_service().evaluate_many([codes[i] for i in live], planned, decide,
+                                                             paths=[paths[i] for i in live])
+        elif live:
+            parallel = max(1, min(max_games_in_flight, pool_size // len(live)))
+            with ThreadPoolExecutor(max_workers=len(live)) as executor:
+                records = list(executor.map(lambda i: run_games_until(planned, decide, parallel, paths[i]), live))
+        else:
+            records = []
+        for i, candidate_records in zip(live, records):
+            results[i] = self.aggregate_results(candidate_records, restart_idx, iter_idx, paths[i])
+        for i in range(len(paths)):
+            if keys[i] and i not in reused:
+                save_evaluation(keys[i], results[i])
+
+        best = max(range(len(paths)), key=lambda i: candidate_rank(results[i]))
+        with open('res-temp.py', 'w') as writer:
+            writer.write(codes[best])
+        main_logger.info('Candidate {} is kept out of {}'.format(best, len(paths)))
+        return results[best], codes[best]
+
+    def aggregate_results(self, records, restart_idx, iter_idx, path='res-temp.py'):
+        """汇总每局的数据，返回 test_code 的结果字典"""
+        units_num = 0
+        enemy_num = 0
+        v = 0
+        d = 0
+        t = 0
+
+        score = 0
+        damage_dealt = 0
+        damage_taken = 0
+        damage_shield = 0
+
+        survivors = Counter()
+        enemy_survivors = Counter()
+        game_loop = 0
+        step_time = 0
+
+        times = len(records)
+
+        for data in records:
+            code_result = data['result']
+            if code_result == 'bug':
+                self.archive_code(path, 'X', times, restart_idx, iter_idx)
+                return {'type': 'bug', 'message': data['content'], 'retry': True}
+            record = data['content']
+            if record['result'] == 'Victory':
+                v += 1
+            elif record['result'] == 'Defeat':
+                d += 1
+            else:
+                t += 1
+            score += record['score']
+            damage_dealt += record['damage_dealt']
+            damage_taken += record['damage_taken']
+            damage_shield += record['damage_shield']
+
+            units_num += record['units_num']
+            enemy_num += record['enemy_num']
+            survivors.update(record['survivors'])
+            enemy_survivors.update(record['enemy_survivors'])
+            game_loop += record['game_loop']
+            step_time += record['step_time']['avg']
+
+        score /= times
+        damage_dealt /= times
+        damage_taken /= times
+        damage_shield /= times
+
+        units_num /= times
+        enemy_num /= times
+        survivors = {name: count / times for name, count in survivors.items()}
+        enemy_survivors = {name: count / times for name, count in enemy_survivors.items()}
+        game_loop /= times
+        step_time /= times
+
+        print(
+            'You Win {}, Tie {}, and Lose {} out of {} times. There are {} units and {} enemy units left.'.format(v,
+                                                                                                                  t,
+                                                                                                                  d,
+                                                                                                                  times,
+                                                                                                                  units_num,
+                                                                                                                  enemy_num))
+        print(
+            'You achieve {} scores, give {} damages to the enemy, take {} damage on health, and take {} damage on shield on average.'.format(
+                score, damage_dealt, damage_taken, damage_shield))
+        main_logger.info(
+            'You Win {}, Tie {}, and Lose {} out of {} times. There are {} units and {} enemy units left.'.format(v,
+                                                                                                                  t,
+                                                                                                                  d,
+                                                                                                                  times,
+                                                                                                                  units_num,
+                                                                                                                  enemy_num) +
+            'You achieve {} scores, give {} damages to the enemy, take {} damage on health, and take {} damage on shield on average.'.format(
+                score, damage_dealt, damage_taken, damage_shield)
+            )
+
+        self.archive_code(path, v, times, restart_idx, iter_idx)
+
+        return {'type': 'result', 'records': records,
+                'message': {"win": v, "tie": t, "lose": d, "times": times, "score": score, "damage": damage_dealt,
+                            "damage_taken": damage_taken, "damage_shield": damage_shield, "units_num": units_num,
+                            "enemy_num": enemy_num, "survivors": survivors, "enemy_survivors": enemy_survivors,
+                            "game_loop": game_loop, "step_time": step_time}}
+
+
+def candidate_rank(data):
+    """候选代码的排序键：先比较胜率，再比较得分和造成的伤害，有 bug 的候选排在最后"""
+    if data['type'] == 'bug':
+        return (-1, 0, 0)
+    result = data['message']
+    return (result['win'] / result['times'], result['score'], result['damage'])
+
+
+def run_games_until(max_games, decide, parallel=max_games_in_flight, path='res-temp.py', first_index=0):
+    """
+    用子进程逐局运行 res-temp.py，同时最多运行 parallel 局，每结束一局调用 decide(records)，返回值不为 None 时停止；
+    第 i 个子进程使用 rollout_seed(first_index + i) 作为种子
+
+    Returns:
+        list: 已结束对局的数据，停止时还在进行的对局连同 SC2 客户端一起结束，不计入结果
+    """
+    q = Queue()
+    process_list = []
+    while len(process_list) < min(parallel, max_games):
+        p = Process(target=run_game, args=(q, path, rollout_seed(first_index + len(process_list))))
+        p.start()
+        process_list.append(p)
+
+    records = []
+    while len(records) < len(process_list):
+        records.append(q.get())
+        if decide(records) is not None:
+            break
+        if len(process_list) < max_games:
+            p = Process(target=run_game, args=(q, path, rollout_seed(first_index + len(process_list))))
+            p.start()
+            process_list.append(p)
+
+    # 结果已经确定，不再等待剩余的对局
+    for p in process_list:
+        if p.is_alive():
+            kill_process_tree(p.pid, include_parent=False)
+            p.kill()
+        p.join()
+        p.close()
+    return records
+
+
+def run_game(q, path='res-temp.py', seed=None):
+    fd, result_path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    env = dict(os.environ, **{RESULT_PATH_ENV: result_path})
+    if seed is not None:
+        env[SEED_ENV] = str(seed)
+    with tempfile.TemporaryFile() as output:
+        running = subprocess.Popen('python {}'.format(path), shell=True, stdout=output, stderr=subprocess.STDOUT, env=env)
+        try:
+            running.wait(timeout=game_wall_timeout)
+        except subprocess.TimeoutExpired:
+            # 卡住的对局连同 SC2 客户端一起结束，按平局记录
+            kill_process_tree(running.pid)
+            running.wait()
+            os.remove(result_path)
+            q.put({'result': 'data', 'content': timeout_record(seed)})
+            return
+        try:
+            with open(result_path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            # 没有写出结果记录，说明对局中途出错，此时才读取输出作为 bug 信息
+            output.seek(0)
+            log = output.read().decode('utf-8', errors='ignore')
+            q.put({'result': 'bug', 'content': log if log else "result disappear !!!"})
+            return
+        finally:
+            os.remove(result_path)
+    q.put({'result': 'data', 'content': record})
@@ -31,9 +31,12 @@ The initial_position is very important, you should put the important units to sa
     def summarize(self, code, result):
         
         if type(result) == dict:
+            survivors = ''
+            if result.get("survivors") is not None:
+                survivors = 'Your surviving units on average: {}. Enemy surviving units on average: {}.\n'.format(result["survivors"], result["enemy_survivors"])
             result = '''
 You win {} times, tie {} times, and lose {} times out of {} combats. There are {} units and {} enemy units left. You give {} damages to the enemy, take {} damage on health, and take {} damage on shield on average.
-'''.format(result["win"], result["tie"], result["lose"], result["times"], result["units_num"], result["enemy_num"], result["damage"], result["damage_taken"], result["damage_shield"])
+'''.format(result["win"], result["tie"], result["lose"], result["times"], result["units_num"], result["enemy_num"], result["damage"], result["damage_taken"], result["damage_shield"]) + survivors
 
 
         prompt = self.task_content + '''
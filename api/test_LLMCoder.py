@@ -0,0 +1,120 @@
+import json
+import os
+import time
+from multiprocessing import Queue
+
+import pytest
+
+pytest.importorskip('openai')
+
+import rollout
+from api import LLMCoder
+from rollout import rollout_seed, stop_decision
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def record(result, seed=None, **fields):
+    content = dict(rollout.timeout_record(seed), result=result, timeout=False)
+    content.update(fields)
+    return {'result': 'data', 'content': content}
+
+
+def write_script(tmp_path, body):
+    path = tmp_path / 'bot.py'
+    path.write_text(body)
+    return str(path)
+
+
+@pytest.fixture
+def importable(monkeypatch):
+    """The scripts of run_game import rollout from the repository"""
+    monkeypatch.setenv('PYTHONPATH', ROOT)
+
+
+def test_run_game_reads_the_record_from_the_result_path(tmp_path, importable):
+    path = write_script(tmp_path, (
+        'import json, os, rollout\n'
+        'print("log lines are not parsed")\n'
+        'record = dict(rollout.timeout_record(int(os.environ[rollout.SEED_ENV])), result="Victory", timeout=False)\n'
+        'with open(os.environ[rollout.RESULT_PATH_ENV], "w") as f:\n'
+        '    json.dump(record, f)\n'
+    ))
+    q = Queue()
+    LLMCoder.run_game(q, path, seed=11)
+    assert q.get(timeout=5) == record('Victory', 11)
+
+
+def test_run_game_reports_the_output_without_a_record(tmp_path, importable):
+    path = write_script(tmp_path, 'raise NameError("name \'marine\' is not defined")\n')
+    q = Queue()
+    LLMCoder.run_game(q, path, seed=11)
+    data = q.get(timeout=5)
+    assert data['result'] == 'bug' and "NameError: name 'marine' is not defined" in data['content']
+
+
+def test_run_game_records_a_hung_game_as_timeout(tmp_path, importable, monkeypatch):
+    monkeypatch.setattr(LLMCoder, 'game_wall_timeout', 1)
+    path = write_script(tmp_path, 'import time\ntime.sleep(60)\n')
+    q = Queue()
+    start = time.monotonic()
+    LLMCoder.run_game(q, path, seed=5)
+    assert time.monotonic() - start < 30
+    assert q.get(timeout=5) == {'result': 'data', 'content': rollout.timeout_record(5)}
+
+
+def fake_run_game(q, path='res-temp.py', seed=None):
+    """Wins the games of the first three seeds at once, the later games take long"""
+    if seed not in {rollout_seed(index) for index in range(3)}:
+        time.sleep(30)
+    q.put(record('Victory', seed))
+
+
+def test_run_games_until_stops_at_the_decision(monkeypatch):
+    monkeypatch.setattr(LLMCoder, 'run_game', fake_run_game)
+    start = time.monotonic()
+    records = LLMCoder.run_games_until(10, lambda done: stop_decision(done, 3, threshold=1, mode='bound'), parallel=4)
+    # Three wins out of three planned games pass, the fourth game is ended without its record
+    assert time.monotonic() - start < 20
+    assert sorted(data['content']['seed'] for data in records) == sorted(rollout_seed(index) for index in range(3))
+
+
+def test_run_games_until_plays_every_game_without_a_decision(monkeypatch):
+    monkeypatch.setattr(LLMCoder, 'run_game', fake_run_game)
+    records = LLMCoder.run_games_until(3, lambda done: None, parallel=2)
+    assert len(records) == 3
+
+
+def make_coder(monkeypatch):
+    coder = LLMCoder.LLMCoder.__new__(LLMCoder.LLMCoder)
+    archived = []
+    monkeypatch.setattr(coder, 'archive_code', lambda *args: archived.append(args), raising=False)
+    return coder, archived
+
+
+def test_aggregate_results_averages_the_records(monkeypatch):
+    coder, archived = make_coder(monkeypatch)
+    records = [
+        record('Victory', score=1000, damage_dealt=300, units_num=4, survivors={'MARINE': 4},
+               step_time={'min': 0.0, 'avg': 0.02, 'max': 0.1}),
+        record('Defeat', score=200, damage_dealt=100, enemy_num=2, enemy_survivors={'ZERGLING': 2},
+               step_time={'min': 0.0, 'avg': 0.04, 'max': 0.1}),
+        {'result': 'data', 'content': rollout.timeout_record(3)},
+    ]
+    result = coder.aggregate_results(records, 0, 1, path='bot.py')
+    message = result['message']
+    assert result['type'] == 'result' and result['records'] is records
+    assert (message['win'], message['tie'], message['lose'], message['times']) == (1, 1, 1, 3)
+    assert message['score'] == pytest.approx(400) and message['damage'] == pytest.approx(400 / 3)
+    assert message['units_num'] == pytest.approx(4 / 3) and message['survivors'] == {'MARINE': pytest.approx(4 / 3)}
+    assert message['enemy_survivors'] == {'ZERGLING': pytest.approx(2 / 3)}
+    assert message['step_time'] == pytest.approx(0.02)
+    assert archived == [('bot.py', 1, 3, 0, 1)]
+    json.dumps(result)
+
+
+def test_aggregate_results_returns_the_first_bug(monkeypatch):
+    coder, archived = make_coder(monkeypatch)
+    records = [record('Victory'), {'result': 'bug', 'content': 'Traceback ...'}]
+    assert coder.aggregate_results(records, 0, 1) == {'type': 'bug', 'message': 'Traceback ...', 'retry': True}
+    assert archived == [('res-temp.py', 'X', 2, 0, 1)]
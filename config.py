@@ -3,7 +3,7 @@ from configs.map_config import MapConfig
 import os
 import importlib
 import sys
-from configs.rollout_config import agent_name
+from configs.rollout_config import agent_name, game_time_limit
 
 # 新增：导入sc2单位能力数据
 try:
@@ -463,17 +463,18 @@ class BattleBot(BotAI):
 
 post_code = '''
 if __name__ == '__main__':
-    time_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    file_name = time_str + "Example.SC2Replay"
-    file_name = os.path.join("replay", file_name)
-    time_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    from rollout import write_game_record, game_seed, seed_enemy, configure_stepping
+    from replays import attach_replay_saver
+    from preflight import attach_recorder
+    seed = game_seed()
     bot = BattleBot()
-    result = run_game(maps.get('{}'), [Bot(Race.Random, bot), Bot(Race.Random, {}())], realtime=False, save_replay_as=file_name)
-    print(result)
-    print(bot.state.score.score)
-    print(bot.state.score.total_damage_dealt_life)
-    print(bot.state.score.total_damage_taken_life)
-    print(bot.state.score.total_damage_taken_shields)
-    print(len(bot.units))
-    print(len(bot.enemy_units)+ len(bot.enemy_structures))
-'''.format(map_name, agent_name)
\ No newline at end of file
+    attach_recorder(bot, '{}')
+    with open(__file__, 'r', encoding='utf-8', errors='ignore') as file:
+        attach_replay_saver(bot, code=file.read())
+    enemy = {}()
+    seed_enemy(enemy, seed)
+    configure_stepping(bot, enemy)
+    result = run_game(maps.get('{}'), [Bot(Race.Random, bot), Bot(Race.Random, enemy)], realtime=False, random_seed=seed,
+                      game_time_limit={})
+    write_game_record(bot, result[0], seed)
+'''.format(map_name, agent_name, map_name, game_time_limit)
\ No newline at end of file
@@ -3,4 +3,57 @@ wining_rate = 0.9
 scenario_type = 'tvp'
 map_name = 'ramp_elsecaro'
 # agent_name = 'EnhancedZergBot'
-agent_name = 'ProtossBot'
\ No newline at end of file
+agent_name = 'ProtossBot'
+
+# Keep warm SC2 clients alive across candidates instead of launching res-temp.py for every game
+use_instance_pool = True
+# Number of pooled games played concurrently (each one keeps two SC2 clients alive for the whole run),
+# fixed so that raising run_times or max_run_times does not start more SC2 instances
+pool_size = 2
+# on_step iterations driven by the pre-flight check against the recorded first frame
+preflight_steps = 5
+# Stop scheduling games once the verdict is known: 'off', 'bound' (exact) or 'sprt' (confidence bound)
+early_stop = 'bound'
+# Games of one candidate played at the same time; below run_times so that early stopping skips the remaining games
+max_games_in_flight = 2
+# Upper limit of games per candidate in 'sprt' mode
+max_run_times = 32
+# SPRT tests win rate <= wining_rate - sprt_delta against >= wining_rate + sprt_delta.
+# With 0.85 against 0.95 and alpha = beta = 0.1 a candidate passes after 20 straight wins or 30 wins in 31 games,
+# and fails after 2 losses in the first games; keep max_run_times >= 31 when changing these values
+sprt_delta = 0.05
+sprt_alpha = 0.1
+sprt_beta = 0.1
+# Candidates generated and evaluated in parallel per round in test_training (1 keeps the serial loop)
+candidates_per_round = 1
+# Reuse evaluation results of identical code (same AST, map file, abilities table, enemy and seeds)
+use_eval_cache = True
+# Play the missing games when a cached result has fewer games than the current evaluation plans
+cache_top_up = True
+# Game i of every evaluation uses seed base_seed + i, so candidates of a task face the same randomness (None disables)
+base_seed = 20240601
+# In-game seconds after which a rollout is declared a tie (None disables the limit)
+game_time_limit = 300
+# Wall-clock seconds after which a hung rollout is killed together with its SC2 clients and counted as a tie
+game_wall_timeout = 600
+# When a rollout saves its replay: 'never', 'final' (the games of the code that training finally accepts),
+# 'victory' (every won game), 'sample' (one in replay_sample_every games) or 'bug'
+replay_policy = 'never'
+replay_sample_every = 10
+# Keep at most this many replays in replay/, the oldest ones are deleted first
+replay_keep = 200
+# Game loops per on_step while no enemy is within the largest weapon range plus the unit radii plus engage_distance
+# of any own unit (None keeps the default game_step); engage_distance covers the distance two units close in one coarse step
+coarse_game_step = 16
+engage_distance = 8
+# Request the pathing grid again only when structures or neutral units changed ('always' is the library default,
+# which also sees force fields; see BotAI.pathing_grid_refresh)
+pathing_grid_refresh = 'on_change'
+# Send the actions and debug draws of a step together with RequestStep in one round trip
+pipeline_requests = True
+# Merge the unit commands of a step across the whole frame and drop commands overwritten later in the same step
+coalesce_actions = True
+# Leave out move/attack commands that repeat the last command of a unit within a distance and frame tolerance
+diff_commands = True
+# Decode the raw units into the UnitSnapshot columns only and create Unit objects and self.units etc. on first access
+lazy_units = False
@@ -23,16 +23,19 @@ import io
 from datetime import datetime
 from configs.rollout_config import scenario_type
 from configs.rollout_config import map_name
+from configs.rollout_config import base_seed
 
 class TerrainAnalyzer:
     """地形分析器 - 用于分析地图高度和可放置区域"""
 
-    def __init__(self):
+    def __init__(self, seed=base_seed):
         self.height_map = None
         self.walkable_map = None
         self.map_width = 0
         self.map_height = 0
         self.height_scale = 1.0
+        # 固定种子的随机数，同一任务多次生成地图时单位位置一致
+        self.rng = random.Random(seed)
 
     def parse_height_map(self, height_data):
         """解析高度图数据"""
@@ -148,8 +151,8 @@ class TerrainAnalyzer:
         if self.height_map is None:
             # 如果没有高度图，使用0-31范围内的随机位置
             for _ in range(count):
-                x = random.uniform(2, 29)
-                y = random.uniform(2, 29)
+                x = self.rng.uniform(2, 29)
+                y = self.rng.uniform(2, 29)
                 safe_positions.append((x, y, 0.0))
             return safe_positions
 
@@ -169,8 +172,8 @@ class TerrainAnalyzer:
             attempts += 1
 
             # 随机选择位置
-            x = random.uniform(min_x, max_x)
-            y = random.uniform(min_y, max_y)
+            x = self.rng.uniform(min_x, max_x)
+            y = self.rng.uniform(min_y, max_y)
 
             map_x, map_y = int(x), int(y)
 
@@ -199,8 +202,8 @@ class TerrainAnalyzer:
 
         # 如果找不到足够的位置，用简单随机填充
         while len(safe_positions) < count:
-            x = random.uniform(min_x, max_x)
-            y = random.uniform(min_y, max_y)
+            x = self.rng.uniform(min_x, max_x)
+            y = self.rng.uniform(min_y, max_y)
             height = self.get_height_at_position(x, y)
             safe_positions.append((x, y, height))
 
@@ -276,14 +279,15 @@ class TerrainAnalyzer:
 class StormLibUnitEditor:
     """使用 StormLib 的 SC2 单位编辑器"""
 
-    def __init__(self):
+    def __init__(self, seed=base_seed):
         """初始化 StormLib"""
         dll_path = r"..\stormlib_dll\x64\StormLib.dll"
         if not os.path.exists(dll_path):
             raise FileNotFoundError(f"StormLib.dll not found: {dll_path}")
 
         self.lib = windll.LoadLibrary(dll_path)
-        self.terrain_analyzer = TerrainAnalyzer()
+        self.terrain_analyzer = TerrainAnalyzer(seed)
+        self.rng = random.Random(seed)
         self._setup_functions()
         print("✅ StormLib 单位编辑器初始化完成")
 
@@ -694,8 +698,8 @@ class StormLibUnitEditor:
                     # 为多个单位添加随机偏移
                     offset_x = offset_y = 0.0
                     if count > 1:
-                        offset_x = random.uniform(-2, 2)
-                        offset_y = random.uniform(-2, 2)
+                        offset_x = self.rng.uniform(-2, 2)
+                        offset_y = self.rng.uniform(-2, 2)
 
                     # 计算位置与高度
                     if isinstance(base_position, (list, tuple)) and len(base_position) >= 3:
@@ -709,7 +713,7 @@ class StormLibUnitEditor:
                         z = self.terrain_analyzer.get_height_at_position(x, y)
 
                     position_str = f"{x},{y},{z}"
-                    unit_rotation = rotation + (random.uniform(-0.5, 0.5) if count > 1 else rotation)
+                    unit_rotation = rotation + (self.rng.uniform(-0.5, 0.5) if count > 1 else rotation)
 
                     if is_mixed_schema:
                         new_unit = {
@@ -0,0 +1,104 @@
+import ast
+import hashlib
+import json
+import os
+
+from sc2 import maps
+
+cache_dir = 'eval_cache'
+
+
+def file_digest(path):
+    """返回文件内容的 sha1，文件不存在时返回空字符串"""
+    if not os.path.exists(path):
+        return ''
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def map_digest(map_name):
+    """返回地图文件内容的 sha1，课程改写地图或修改科技后摘要随之变化"""
+    return hashlib.sha1(maps.get(map_name).data).hexdigest()
+
+
+def normalize_code(code):
+    """
+    把代码规范化为 AST 的文本形式，只有空白、注释不同的代码得到相同结果
+
+    Args:
+        code: res-temp.py 的完整代码
+
+    Returns:
+        str: 规范化后的代码，无法解析时返回原文
+    """
+    try:
+        return ast.dump(ast.parse(code))
+    except SyntaxError:
+        return code
+
+
+def evaluation_key(code, map_name=None, enemy_name=None, seeds=None):
+    """
+    计算评估结果的缓存键：代码 AST、地图文件、技能/科技表、敌方 bot 和随机种子共同决定
+
+    Args:
+        code: res-temp.py 的完整代码
+        map_name: 地图名称，默认使用 config.map_name
+        enemy_name: 敌方 bot 类名，默认使用 rollout_config.agent_name
+        seeds: 对局随机种子序列的起点，默认使用 rollout_config.base_seed
+
+    Returns:
+        str: 缓存键
+    """
+    if map_name is None:
+        import config
+        map_name = config.map_name
+    if enemy_name is None:
+        from configs.rollout_config import agent_name
+        enemy_name = agent_name
+    if seeds is None:
+        from configs.rollout_config import base_seed
+        seeds = base_seed
+    parts = {
+        'code': hashlib.sha1(normalize_code(code).encode('utf-8')).hexdigest(),
+        'map': map_digest(map_name),
+        'abilities': file_digest('abilities_info.json'),
+        'enemy': enemy_name,
+        'seeds': seeds,
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def load_evaluation(key):
+    """读取缓存的评估结果，不存在时返回 None"""
+    path = os.path.join(cache_dir, key + '.json')
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except ValueError:
+        return None
+
+
+def save_evaluation(key, data):
+    """
+    保存 test_code 的结果：有 bug 时保存 bug 信息，否则保存汇总结果和每局的结果记录，以便之后补充对局。
+    只缓存预检发现的确定性 bug；对局中出现的 bug（带 retry 标记，例如 "result disappear !!!"、SC2 崩溃、worker 被杀）
+    可能是偶发的，不写入缓存，下次重新评估
+
+    Args:
+        key: evaluation_key 返回的缓存键
+        data: test_code 返回的结果字典
+    """
+    if data['type'] == 'bug' and data.get('retry'):
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    if data['type'] == 'bug':
+        entry = {'type': 'bug', 'message': data['message']}
+    else:
+        entry = {'type': 'result', 'message': data['message'], 'records': data['records']}
+    path = os.path.join(cache_dir, key + '.json')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(path + '.tmp', path)
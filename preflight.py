@@ -0,0 +1,226 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import traceback
+from multiprocessing import Pipe, Process
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from configs.rollout_config import preflight_steps, game_wall_timeout
+from evaluation_cache import map_digest
+from sc2.client import Client
+from sc2.data import Status
+from sc2.dicts.unit_abilities import UNIT_ABILITIES
+from sc2.game_data import GameData
+from sc2.game_info import GameInfo
+from sc2.game_state import GameState
+
+fixture_dir = 'fixtures'
+
+# 这些异常在任何对局里都会出现，可以直接判定为 bug；其他异常可能是桩客户端造成的，交给真实对局判断
+DEFINITE_BUGS = (SyntaxError, ImportError, NameError, AttributeError)
+
+
+def fixture_path(map_name):
+    """
+    返回地图对应的录制数据目录，目录名包含地图文件的摘要，地图被课程改写后会自动失效
+
+    Args:
+        map_name: 地图名称
+
+    Returns:
+        str: 录制数据目录
+    """
+    return os.path.join(fixture_dir, '{}-{}'.format(map_name, map_digest(map_name)[:12]))
+
+
+async def record_fixture(bot, path):
+    """
+    在对局开始时保存我方第一帧的 GameData / GameInfo / Observation，供预检复用。
+    先写到同级的临时目录再用 os.replace 整体换到 path，并行的对局不会读到或写出不完整的录制数据
+    """
+    data = await bot.client._execute(
+        data=sc_pb.RequestData(ability_id=True, unit_type_id=True, upgrade_id=True, buff_id=True, effect_id=True)
+    )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix=os.path.basename(path) + '.', dir=os.path.dirname(path))
+    try:
+        with open(os.path.join(temp_path, 'data.pb'), 'wb') as f:
+            f.write(data.data.SerializeToString())
+        with open(os.path.join(temp_path, 'game_info.pb'), 'wb') as f:
+            f.write(bot.game_info._proto.SerializeToString())
+        with open(os.path.join(temp_path, 'observation.pb'), 'wb') as f:
+            f.write(bot.state.response_observation.SerializeToString())
+        with open(os.path.join(temp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'player_id': bot.player_id}, f)
+        try:
+            os.replace(temp_path, path)
+        except OSError:
+            # 其他对局已经录制好了同一张地图
+            if not os.path.exists(os.path.join(path, 'meta.json')):
+                raise
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def attach_recorder(bot, map_name):
+    """如果该地图还没有录制数据，就在 bot 的 on_start 前插入一次录制，常驻实例池的对局和 res-temp.py 的对局都会调用"""
+    path = fixture_path(map_name)
+    if os.path.exists(os.path.join(path, 'meta.json')):
+        return
+    on_start = bot.on_start
+
+    async def recording_on_start():
+        try:
+            await record_fixture(bot, path)
+        except Exception as e:
+            print('Failed to record preflight fixture: {}'.format(e))
+        await on_start()
+
+    bot.on_start = recording_on_start
+
+
+def load_fixture(path):
+    """读取录制数据，不存在时返回 None"""
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    data = sc_pb.ResponseData()
+    with open(os.path.join(path, 'data.pb'), 'rb') as f:
+        data.ParseFromString(f.read())
+    game_info = sc_pb.ResponseGameInfo()
+    with open(os.path.join(path, 'game_info.pb'), 'rb') as f:
+        game_info.ParseFromString(f.read())
+    observation = sc_pb.ResponseObservation()
+    with open(os.path.join(path, 'observation.pb'), 'rb') as f:
+        observation.ParseFromString(f.read())
+    with open(os.path.join(path, 'meta.json'), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return data, game_info, observation, meta['player_id']
+
+
+class StubClient(Client):
+    """不连接 SC2 的客户端：动作直接丢弃，查询返回根据单位类型推断的结果"""
+
+    def __init__(self, bot):
+        super().__init__(ws=object())
+        self._bot = bot
+        self._status = Status.in_game
+
+    def _queue(self, **kwargs):
+        pass
+
+    async def _execute(self, **kwargs):
+        response = sc_pb.Response(status=Status.in_game.value)
+        query = kwargs.get('query')
+        if query is None:
+            return response
+        for request in query.abilities:
+            entry = response.query.abilities.add(unit_tag=request.unit_tag)
+            unit = self._bot.all_units.find_by_tag(request.unit_tag)
+            if unit is None:
+                continue
+            entry.unit_type_id = unit.type_id.value
+            for ability in UNIT_ABILITIES.get(unit.type_id, ()):
+                entry.abilities.add(ability_id=ability.value)
+        for request in query.pathing:
+            start = self._bot.all_units.find_by_tag(request.unit_tag)
+            start = (start.position.x, start.position.y) if start else (request.start_pos.x, request.start_pos.y)
+            distance = ((start[0] - request.end_pos.x) ** 2 + (start[1] - request.end_pos.y) ** 2) ** 0.5
+            response.query.pathing.add(distance=distance)
+        for _ in query.placements:
+            response.query.placements.add(result=1)
+        return response
+
+
+async def _drive(bot, fixture, steps):
+    data, game_info, observation, player_id = fixture
+    client = StubClient(bot)
+    bot._initialize_variables()
+    bot._prepare_start(client, player_id, GameInfo(game_info), GameData(data))
+    proto_game_info = sc_pb.Response(game_info=game_info)
+    bot._prepare_step(GameState(observation), proto_game_info)
+    await bot.on_before_start()
+    bot._prepare_first_step()
+    await bot.on_start()
+    for iteration in range(steps):
+        bot._prepare_step(GameState(observation), proto_game_info)
+        await bot.issue_events()
+        await bot.on_step(iteration)
+        await bot._after_step()
+
+
+def _drive_in_child(bot, fixture, steps, sender):
+    """子进程中驱动 bot，把 (预检类型, traceback) 发回父进程"""
+    try:
+        asyncio.run(_drive(bot, fixture, steps))
+    except DEFINITE_BUGS:
+        sender.send(('bug', traceback.format_exc()))
+    except Exception:
+        sender.send(('unknown', traceback.format_exc()))
+    else:
+        sender.send(('pass', ''))
+
+
+def _drive_isolated(bot, fixture, steps, timeout):
+    """
+    在子进程中驱动生成的代码，死循环或阻塞调用不会卡住训练进程
+
+    Returns:
+        tuple: (预检类型, 信息)，超过 timeout 秒时结束子进程并判定为 bug
+    """
+    receiver, sender = Pipe(duplex=False)
+    p = Process(target=_drive_in_child, args=(bot, fixture, steps, sender), daemon=True)
+    p.start()
+    sender.close()
+    try:
+        if not receiver.poll(timeout):
+            return 'bug', 'on_start/on_step did not return within {}s in the preflight check, ' \
+                          'the code probably contains an infinite loop or a blocking call'.format(timeout)
+        return receiver.recv()
+    except EOFError:
+        # 子进程没有发回结果就退出了，例如代码调用了 sys.exit
+        p.join()
+        return 'unknown', 'preflight process exited with code {}'.format(p.exitcode)
+    finally:
+        receiver.close()
+        if p.is_alive():
+            p.kill()
+        p.join()
+
+
+def preflight(code, map_name=None, steps=preflight_steps, path='res-temp.py', timeout=game_wall_timeout):
+    """
+    不启动 SC2，快速检查生成代码：编译、导入 BattleBot，若有录制数据则在子进程中驱动 on_start/on_step 若干步
+
+    Args:
+        code: res-temp.py 的完整代码
+        map_name: 地图名称，默认使用 config.map_name
+        steps: 驱动 on_step 的次数
+        path: 代码所在的文件，见 rollout.load_bot_module
+        timeout: 驱动 on_start/on_step 的最长秒数，超时判定为 bug
+
+    Returns:
+        dict: {'type': 'bug' | 'pass' | 'unknown', 'message': ..., 'driven': 是否真正运行了 on_step}
+    """
+    from rollout import load_bot_module
+    if map_name is None:
+        import config
+        map_name = config.map_name
+
+    try:
+        module = load_bot_module(code, path)
+        bot = module.BattleBot()
+    except Exception:
+        return {'type': 'bug', 'message': traceback.format_exc(), 'driven': False}
+
+    try:
+        fixture = load_fixture(fixture_path(map_name))
+    except Exception:
+        fixture = None
+    if fixture is None:
+        return {'type': 'pass', 'message': 'no preflight fixture for {}'.format(map_name), 'driven': False}
+
+    verdict, message = _drive_isolated(bot, fixture, steps, timeout)
+    return {'type': verdict, 'message': message, 'driven': verdict != 'unknown'}
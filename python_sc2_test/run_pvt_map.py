@@ -34,6 +34,7 @@ class ProtossBot(BotAI):
         self.sentry_guardian_shields = {}  # 记录守护之盾使用时间
         self.dt_blink_cooldowns = {}  # 记录暗黑圣堂武士闪烁冷却
         self.tempest_last_target = {}  # 记录风暴战舰最后攻击目标
+        self.rng = random.Random()  # 独立的随机数，评估时按对局种子重新设定，不受对手 bot 的随机调用影响
 
     async def on_step(self, iteration: int):
         if iteration == 0:
@@ -494,7 +495,7 @@ class ProtossBot(BotAI):
                     else:
                         # 绕后偷袭
                         flank_pos = closest_detector.position + Point2((
-                            random.uniform(-3, 3), random.uniform(-3, 3)
+                            self.rng.uniform(-3, 3), self.rng.uniform(-3, 3)
                         ))
                         dt.move(flank_pos)
                 else:
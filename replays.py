@@ -0,0 +1,144 @@
+import hashlib
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from configs.rollout_config import replay_policy, replay_sample_every, replay_keep
+from sc2.data import Result
+
+replay_dir = 'replay'
+# 'final' 策略先把录像暂存在这里，代码最终被接受时才移到 replay_dir
+pending_dir = os.path.join(replay_dir, 'pending')
+
+# 录像在后台线程写入磁盘，对局结束后不用等待写文件
+_writer = ThreadPoolExecutor(max_workers=1)
+# 抽样使用独立的随机数，不影响按对局种子固定的 random
+_sampler = random.Random()
+
+
+def should_save_replay(result, policy=replay_policy):
+    """
+    根据录像策略判断是否保存本局录像
+
+    Args:
+        result: 我方的 Result，代码在对局中报错时为 'bug'
+        policy: 'never' | 'final' | 'victory' | 'sample' | 'bug'
+
+    Returns:
+        bool: 是否保存，'final' 策略每局都先暂存，见 keep_final_replays
+    """
+    if policy == 'final':
+        return True
+    if policy == 'victory':
+        return result == Result.Victory
+    if policy == 'sample':
+        return _sampler.randrange(replay_sample_every) == 0
+    if policy == 'bug':
+        return result == 'bug'
+    return False
+
+
+def replay_tag(code):
+    """代码的短摘要，'final' 策略用它把暂存的录像和产生录像的代码对应起来"""
+    return hashlib.sha1(code.encode('utf-8', errors='ignore')).hexdigest()[:12]
+
+
+def prune_replays(keep=replay_keep, directory=replay_dir):
+    """只保留目录中最新的 keep 个录像"""
+    files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.SC2Replay')]
+    files.sort(key=os.path.getmtime)
+    for path in files[:max(len(files) - keep, 0)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _write_replay(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    prune_replays(directory=directory)
+
+
+async def save_replay(bot, label, directory=replay_dir):
+    """向 SC2 请求本局录像，交给后台线程写入 directory，文件名带上结果标签"""
+    try:
+        response = await bot.client._execute(save_replay=sc_pb.RequestSaveReplay())
+    except Exception as e:
+        print('Failed to save replay: {}'.format(e))
+        return
+    name = '{}-{}-{}.SC2Replay'.format(datetime.now().strftime("%Y-%m-%d_%H-%M-%S"), label, os.getpid())
+    _writer.submit(_write_replay, os.path.join(directory, name), response.save_replay.data)
+
+
+def attach_replay_saver(bot, policy=replay_policy, code=None):
+    """
+    按录像策略包装 bot：对局结束时在 on_end 中保存录像，'bug' 策略在 on_start/on_step 抛出异常时保存，
+    'final' 策略把录像暂存到 pending_dir，文件名带上 replay_tag(code)
+
+    Args:
+        bot: 我方 bot
+        policy: 录像策略，见 should_save_replay
+        code: bot 的完整代码，'final' 策略需要
+    """
+    if policy == 'never' or (policy == 'final' and code is None):
+        return
+
+    def saving_on_bug(handler):
+        async def wrapped(*args):
+            try:
+                await handler(*args)
+            except Exception:
+                await save_replay(bot, 'bug')
+                raise
+
+        return wrapped
+
+    if policy == 'bug':
+        bot.on_start = saving_on_bug(bot.on_start)
+        bot.on_step = saving_on_bug(bot.on_step)
+        return
+
+    on_end = bot.on_end
+
+    async def saving_on_end(game_result):
+        await on_end(game_result)
+        if policy == 'final':
+            await save_replay(bot, '{}-{}'.format(replay_tag(code), game_result.name), pending_dir)
+        elif should_save_replay(game_result, policy):
+            await save_replay(bot, game_result.name)
+
+    bot.on_end = saving_on_end
+
+
+def flush_replays():
+    """等待后台线程写完所有录像，worker 进程退出前调用"""
+    _writer.shutdown(wait=True)
+
+
+def keep_final_replays(code, policy=replay_policy):
+    """
+    'final' 策略：代码最终被接受时调用，把这份代码暂存的录像移到 replay 目录，丢弃其余暂存的录像
+
+    Args:
+        code: 被接受的完整代码，与评估时传给 attach_replay_saver 的代码相同
+        policy: 录像策略
+    """
+    if policy != 'final' or not os.path.isdir(pending_dir):
+        return
+    tag = replay_tag(code)
+    for name in os.listdir(pending_dir):
+        path = os.path.join(pending_dir, name)
+        try:
+            if '-{}-'.format(tag) in name:
+                os.replace(path, os.path.join(replay_dir, name))
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+    prune_replays()
@@ -0,0 +1,524 @@
+import asyncio
+import atexit
+import json
+import math
+import os
+import queue
+import random
+import time
+import traceback
+import types
+from collections import Counter
+from multiprocessing import Array, Process, Queue, Value
+
+import numpy as np
+import psutil
+
+from configs.rollout_config import (pool_size, agent_name, run_times, wining_rate, early_stop, max_run_times,
+                                    sprt_delta, sprt_alpha, sprt_beta, base_seed, game_time_limit,
+                                    game_wall_timeout, max_games_in_flight, coarse_game_step, engage_distance,
+                                    pathing_grid_refresh, pipeline_requests, coalesce_actions, diff_commands, lazy_units)
+from preflight import attach_recorder
+from replays import attach_replay_saver, flush_replays
+from sc2 import maps
+from sc2.data import Race, Result
+from sc2.main import GameMatch, a_run_match_nokill
+from sc2.player import Bot
+from sc2.sc2process import kill_switch
+
+# res-temp.py 把结构化的结果记录写到这个环境变量指定的文件
+RESULT_PATH_ENV = 'EVOCURR_RESULT_PATH'
+# res-temp.py 从这个环境变量读取本局的随机种子
+SEED_ENV = 'EVOCURR_SEED'
+
+
+def load_bot_module(code, path='res-temp.py', module_name='res_temp'):
+    """
+    将生成的完整代码（prefix_code + code + post_code）加载为模块，不执行 __main__ 部分
+
+    Args:
+        code: res-temp.py 的完整代码
+        path: 代码所在的文件，traceback 从这个文件读取出错的代码行，候选代码传入 res-cand{i}.py
+        module_name: 模块名称
+
+    Returns:
+        module: 包含 BattleBot 和敌方 bot 类的模块
+    """
+    module = types.ModuleType(module_name)
+    module.__file__ = path
+    exec(compile(code, path, 'exec'), module.__dict__)
+    return module
+
+
+def rollout_seed(index):
+    """第 index 局对战的随机种子，同一任务所有候选的第 index 局使用相同的种子，base_seed 为 None 时不固定"""
+    if base_seed is None:
+        return None
+    return base_seed + index
+
+
+def seed_everything(seed):
+    """固定 random 和 numpy 的随机数；双方 bot 运行在同一进程内，敌方 bot 的随机行为也随之固定"""
+    if seed is None:
+        return
+    random.seed(seed)
+    np.random.seed(seed)
+
+
+def seed_enemy(enemy, seed):
+    """敌方 bot 有自己的 rng 时单独设定种子，敌方行为不会因为我方代码消耗的随机数不同而改变"""
+    if seed is not None and hasattr(enemy, 'rng'):
+        enemy.rng.seed(seed)
+
+
+def configure_stepping(*bots):
+    """为双方 bot 打开自适应步长（见 BotAI.next_game_step）、按需刷新寻路网格（见 BotAI.pathing_grid_refresh）、请求流水线（见 Protocol._queue）、动作合并（见 action.coalesce_unit_commands）、重复指令过滤（见 command_diff.CommandDiff）和按需创建单位（见 UnitSnapshot.from_raw），bot 代码里自己设置过的值保持不变"""
+    for bot in bots:
+        if getattr(bot, 'coarse_game_step', None) is None:
+            bot.coarse_game_step = coarse_game_step
+        if not hasattr(bot, 'engage_distance'):
+            bot.engage_distance = engage_distance
+        if not hasattr(bot, 'pathing_grid_refresh'):
+            bot.pathing_grid_refresh = pathing_grid_refresh
+        if not hasattr(bot, 'pipeline_requests'):
+            bot.pipeline_requests = pipeline_requests
+        if not hasattr(bot, 'coalesce_actions'):
+            bot.coalesce_actions = coalesce_actions
+        if not hasattr(bot, 'diff_commands'):
+            bot.diff_commands = diff_commands
+        if not hasattr(bot, 'lazy_units'):
+            bot.lazy_units = lazy_units
+
+
+def game_seed():
+    """res-temp.py 启动时调用：读取 SEED_ENV 指定的种子并固定随机数，未指定时返回 None"""
+    seed = os.environ.get(SEED_ENV)
+    seed = int(seed) if seed else None
+    seed_everything(seed)
+    return seed
+
+
+def game_record(bot, result, seed=None):
+    """
+    把一局结束后的 bot 状态整理成结构化的结果记录，worker 和 res-temp.py 都使用这个格式
+
+    Args:
+        bot: 我方 BattleBot 实例
+        result: 我方的 Result
+        seed: 本局使用的随机种子
+
+    Returns:
+        dict: 可以直接 json 序列化的结果记录
+    """
+    score = bot.state.score
+    units_num = len(bot.units)
+    enemy_num = len(bot.enemy_units) + len(bot.enemy_structures)
+    survivors = Counter(unit.type_id.name for unit in bot.units)
+    enemy_survivors = Counter(unit.type_id.name for unit in bot.enemy_units | bot.enemy_structures)
+    if result == Result.Victory:
+        enemy_num = 0
+        enemy_survivors.clear()
+    elif result == Result.Defeat:
+        units_num = 0
+        survivors.clear()
+    step_min, step_avg, step_max, step_last = bot.step_time
+    return {
+        'result': result.name if isinstance(result, Result) else str(result),
+        'seed': seed,
+        'game_loop': bot.state.game_loop,
+        'score': score.score,
+        'damage_dealt': score.total_damage_dealt_life,
+        'damage_dealt_shields': score.total_damage_dealt_shields,
+        'damage_taken': score.total_damage_taken_life,
+        'damage_shield': score.total_damage_taken_shields,
+        'killed_value_units': score.killed_value_units,
+        'lost_minerals_army': score.lost_minerals_army,
+        'lost_vespene_army': score.lost_vespene_army,
+        'units_num': units_num,
+        'enemy_num': enemy_num,
+        'survivors': dict(survivors),
+        'enemy_survivors': dict(enemy_survivors),
+        'step_time': {'min': step_min if step_min != float('inf') else 0, 'avg': step_avg, 'max': step_max,
+                      'last': step_last, 'iterations': bot._total_steps_iterations},
+        'commands': {'sent': sum(bot.command_diff.sent.values()),
+                     'suppressed': sum(bot.command_diff.suppressed.values())},
+    }
+
+
+def timeout_record(seed=None):
+    """对局超过 game_wall_timeout 被强制结束时的结果记录，按平局计算"""
+    return {
+        'result': 'Tie',
+        'seed': seed,
+        'timeout': True,
+        'game_loop': 0,
+        'score': 0,
+        'damage_dealt': 0,
+        'damage_dealt_shields': 0,
+        'damage_taken': 0,
+        'damage_shield': 0,
+        'killed_value_units': 0,
+        'lost_minerals_army': 0,
+        'lost_vespene_army': 0,
+        'units_num': 0,
+        'enemy_num': 0,
+        'survivors': {},
+        'enemy_survivors': {},
+        'step_time': {'min': 0, 'avg': 0, 'max': 0, 'last': 0, 'iterations': 0},
+        'commands': {'sent': 0, 'suppressed': 0},
+    }
+
+
+def kill_process_tree(pid, include_parent=True):
+    """
+    结束 pid 及其所有子进程；kill_switch 只能清理本进程启动的 SC2，卡住的对局需要由父进程连同 SC2 客户端一起结束
+
+    Args:
+        pid: 运行对局的进程（res-temp.py 子进程或评估服务的 worker）
+        include_parent: False 时只结束子进程，pid 是 multiprocessing.Process 时由调用方 kill 和 join，
+            这里回收它会让 join 拿不到退出码
+    """
+    try:
+        parent = psutil.Process(pid)
+        processes = parent.children(recursive=True) + ([parent] if include_parent else [])
+    except psutil.NoSuchProcess:
+        return
+    for p in processes:
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            pass
+    psutil.wait_procs(processes, timeout=10)
+
+
+def write_game_record(bot, result, seed=None):
+    """res-temp.py 结束时调用：把结果记录写到 RESULT_PATH_ENV 指定的文件，未指定时打印到 stdout"""
+    record = game_record(bot, result, seed)
+    path = os.environ.get(RESULT_PATH_ENV)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+    else:
+        print(json.dumps(record, indent=2))
+
+
+async def play_pooled_game(controllers, code, map_name, enemy_name, seed=None, path='res-temp.py'):
+    """在常驻的 SC2 进程上用给定的种子跑一局，返回 {'result': 'data', 'content': 结果记录} 或 bug 信息，path 见 load_bot_module"""
+    seed_everything(seed)
+    try:
+        module = load_bot_module(code, path)
+        bot = module.BattleBot()
+        enemy = getattr(module, enemy_name)()
+        seed_enemy(enemy, seed)
+        configure_stepping(bot, enemy)
+    except Exception:
+        return {'result': 'bug', 'content': traceback.format_exc()}
+    attach_recorder(bot, map_name)
+    attach_replay_saver(bot, code=code)
+
+    match = GameMatch(maps.get(map_name), [Bot(Race.Random, bot), Bot(Race.Random, enemy)], random_seed=seed,
+                      game_time_limit=game_time_limit)
+    results = await a_run_match_nokill(controllers, match)
+    if results is None:
+        return {'result': 'bug', 'content': "result disappear !!!"}
+
+    result = results[match.players[0]]
+    if isinstance(result, BaseException):
+        return {'result': 'bug',
+                'content': ''.join(traceback.format_exception(type(result), result, result.__traceback__))}
+    return {'result': 'data', 'content': game_record(bot, result, seed)}
+
+
+def planned_games(mode=early_stop):
+    """返回一次评估最多需要的对局数，sprt 模式下为 max_run_times"""
+    return max_run_times if mode == 'sprt' else run_times
+
+
+def stop_decision(records, planned, threshold=wining_rate, mode=early_stop):
+    """
+    根据已经结束的对局判断是否可以提前停止，平局按失败计算
+
+    Args:
+        records: 已结束对局的 {'result': ..., 'content': 结果记录} 列表
+        planned: 计划的总对局数
+        threshold: 需要达到的胜率
+        mode: 'off' | 'bound' | 'sprt'
+
+    Returns:
+        None 表示继续；否则返回 'bug' / 'pass' / 'fail'
+    """
+    if any(data['result'] == 'bug' for data in records):
+        return 'bug'
+    if mode == 'off':
+        return None
+
+    played = len(records)
+    wins = sum(data['content']['result'] == 'Victory' for data in records)
+    if mode == 'bound':
+        # 剩下的全输也能达到阈值，或者剩下的全赢也达不到阈值
+        if wins >= threshold * planned:
+            return 'pass'
+        if wins + planned - played < threshold * planned:
+            return 'fail'
+        return None
+
+    # Wald SPRT：H0 胜率 <= p0，H1 胜率 >= p1
+    p0 = max(threshold - sprt_delta, 1e-3)
+    p1 = min(threshold + sprt_delta, 1 - 1e-3)
+    llr = wins * math.log(p1 / p0) + (played - wins) * math.log((1 - p1) / (1 - p0))
+    if llr >= math.log((1 - sprt_beta) / sprt_alpha):
+        return 'pass'
+    if llr <= math.log(sprt_beta / (1 - sprt_alpha)):
+        return 'fail'
+    return None
+
+
+def _is_cancelled(cancelled, job_id):
+    with cancelled.get_lock():
+        return job_id in cancelled[:]
+
+
+async def _serve(task_queue, result_queue, generation, cancelled):
+    controllers = []
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            job = await loop.run_in_executor(None, task_queue.get)
+            if job is None:
+                break
+            job_id, job_generation, code, path, map_name, enemy_name, seed = job
+            if job_generation != generation.value or _is_cancelled(cancelled, job_id):
+                # 所属的评估已经提前结束，或者结果已经确定
+                result_queue.put((job_id, {'result': 'skipped'}))
+                continue
+            result_queue.put((job_id, {'result': 'started', 'pid': os.getpid(), 'seed': seed}))
+            data = await play_pooled_game(controllers, code, map_name, enemy_name, seed, path=path)
+            result_queue.put((job_id, data))
+    finally:
+        for c in controllers:
+            await c._process._close_connection()
+        kill_switch.kill_all()
+
+
+def _pool_worker(task_queue, result_queue, generation, cancelled):
+    asyncio.run(_serve(task_queue, result_queue, generation, cancelled))
+    flush_replays()
+
+
+class EvaluationService:
+    """
+    常驻的评估服务：每个 worker 进程维护一对 SC2 客户端，在不同候选代码和课程任务之间复用，
+    避免每局都重新启动和关闭 StarCraft II
+    """
+
+    # 共享的已取消对局编号的个数，更早取消的编号被覆盖后只是不能在开始前跳过，结果仍然会被丢弃
+    cancelled_capacity = 64
+
+    def __init__(self, size=pool_size):
+        self.size = size
+        self.task_queue = Queue()
+        self.result_queue = Queue()
+        self.workers = []
+        self.job_count = 0
+        # job_id -> (开始时间, worker pid, 种子)，用来发现超过 game_wall_timeout 的对局
+        self.running = {}
+        # 每次评估递增，worker 跳过旧一代还在排队的对局
+        self.generation = Value('i', 0)
+        # 最近取消的对局编号，worker 开始一局前检查，被取消的对局直接跳过
+        self.shared_cancelled = Array('q', self.cancelled_capacity)
+        self.cancelled_count = 0
+        # 已经取消、结果还没有返回的对局，返回的结果直接丢弃
+        self.cancelled = set()
+
+    def start(self):
+        for slot in range(self.size):
+            self.workers.append(self._spawn(slot))
+
+    def _spawn(self, slot):
+        p = Process(target=_pool_worker, args=(self.task_queue, self.result_queue, self.generation, self.shared_cancelled),
+                    daemon=True)
+        p.start()
+        return p
+
+    def _restart_worker(self, slot):
+        """结束 slot 上的 worker 及其 SC2 客户端，并启动新的 worker 代替它"""
+        kill_process_tree(self.workers[slot].pid, include_parent=False)
+        self.workers[slot].kill()
+        self.workers[slot].join(timeout=10)
+        self.workers[slot] = self._spawn(slot)
+
+    def cancel(self, job_ids):
+        """
+        取消对局：还在排队的对局由 worker 直接跳过；已经开始的对局继续打完，worker 和 SC2 客户端留在池中，结果到达时丢弃。
+        只有超过 game_wall_timeout 的对局才会结束 worker，见 _expire_hung_job
+        """
+        with self.shared_cancelled.get_lock():
+            for job_id in job_ids:
+                self.shared_cancelled[self.cancelled_count % self.cancelled_capacity] = job_id
+                self.cancelled_count += 1
+        self.cancelled.update(job_ids)
+
+    def _next_generation(self):
+        with self.generation.get_lock():
+            self.generation.value += 1
+            return self.generation.value
+
+    def _submit(self, generation, code, path, map_name, enemy_name, seed):
+        self.job_count += 1
+        self.task_queue.put((self.job_count, generation, code, path, map_name, enemy_name, seed))
+        return self.job_count
+
+    def _receive(self):
+        """取出下一局的结果；等待期间检查正在进行的对局，超过 game_wall_timeout 的对局按平局返回"""
+        while True:
+            expired = self._expire_hung_job()
+            if expired is not None:
+                return expired
+            try:
+                job_id, data = self.result_queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            if data['result'] == 'started':
+                # 已取消的对局也要计时，卡住时同样需要结束 worker
+                self.running[job_id] = (time.time(), data['pid'], data['seed'])
+                continue
+            self.running.pop(job_id, None)
+            if job_id in self.cancelled:
+                self.cancelled.discard(job_id)
+                continue
+            return job_id, data
+
+    def _expire_hung_job(self):
+        """结束一个超时的对局所在的 worker 及其 SC2 客户端，并启动新的 worker 代替它"""
+        now = time.time()
+        for job_id, (started, pid, seed) in list(self.running.items()):
+            if now - started <= game_wall_timeout:
+                continue
+            del self.running[job_id]
+            print('Game {} exceeded {}s, restarting its worker'.format(job_id, game_wall_timeout))
+            for slot, p in enumerate(self.workers):
+                if p.pid == pid:
+                    self._restart_worker(slot)
+            if job_id in self.cancelled:
+                self.cancelled.discard(job_id)
+                continue
+            return job_id, {'result': 'data', 'content': timeout_record(seed)}
+        return None
+
+    def evaluate(self, code, times, map_name=None, enemy_name=agent_name):
+        """
+        把 times 局对战分发给常驻 worker，返回每局的数据
+
+        Args:
+            code: res-temp.py 的完整代码
+            times: 对战局数
+            map_name: 地图名称，默认使用 config.map_name
+            enemy_name: 敌方 bot 类名
+
+        Returns:
+            list: 每局的 {'result': ..., 'content': ...}
+        """
+        return self.evaluate_many([code], times, lambda records: None, map_name, enemy_name)[0]
+
+    def evaluate_until(self, code, max_games, decide, map_name=None, enemy_name=agent_name, first_index=0):
+        """
+        逐局调度对战，同时最多进行 max_games_in_flight 局，每结束一局调用 decide(records)，返回值不为 None 时停止并取消其余对局
+
+        Args:
+            code: res-temp.py 的完整代码
+            max_games: 最多对战局数
+            decide: 判断是否停止的函数，例如 stop_decision
+            map_name: 地图名称，默认使用 config.map_name
+            enemy_name: 敌方 bot 类名
+            first_index: 第一局的编号，决定各局使用的随机种子，补充对局时从已有的局数开始
+
+        Returns:
+            list: 已结束对局的 {'result': ..., 'content': ...}，按结束顺序排列
+        """
+        return self.evaluate_many([code], max_games, decide, map_name, enemy_name, first_index)[0]
+
+    def evaluate_many(self, codes, max_games, decide, map_name=None, enemy_name=agent_name, first_index=0, paths=None):
+        """
+        同时评估多份候选代码：所有候选轮流占用空闲的 worker，每份候选同时最多进行 max_games_in_flight 局，
+        各自按 decide 提前停止，停止时取消这份候选还在进行的对局；
+        每份候选的第 i 局使用相同的种子，候选之间的比较是成对的
+
+        Args:
+            codes: 候选代码列表
+            max_games: 每份候选最多对战局数
+            decide: 判断是否停止的函数，例如 stop_decision
+            map_name: 地图名称，默认使用 config.map_name
+            enemy_name: 敌方 bot 类名
+            first_index: 第一局的编号，决定各局使用的随机种子
+            paths: 与 codes 对应的代码文件，见 load_bot_module，默认都是 res-temp.py
+
+        Returns:
+            list: 与 codes 对应的已结束对局数据列表
+        """
+        if map_name is None:
+            import config
+            map_name = config.map_name
+        if paths is None:
+            paths = ['res-temp.py'] * len(codes)
+        generation = self._next_generation()
+        records = [[] for _ in codes]
+        submitted = [0 for _ in codes]
+        decided = [False for _ in codes]
+        # job_id -> 候选编号
+        pending = {}
+
+        def in_flight(i):
+            return sum(candidate == i for candidate in pending.values())
+
+        def fill():
+            while len(pending) < self.size:
+                waiting = [i for i in range(len(codes))
+                           if not decided[i] and submitted[i] < max_games and in_flight(i) < max_games_in_flight]
+                if not waiting:
+                    return
+                i = min(waiting, key=lambda idx: submitted[idx])
+                seed = rollout_seed(first_index + submitted[i])
+                pending[self._submit(generation, codes[i], paths[i], map_name, enemy_name, seed)] = i
+                submitted[i] += 1
+
+        fill()
+        while not all(decided) and pending:
+            job_id, data = self._receive()
+            if job_id not in pending:
+                continue
+            i = pending.pop(job_id)
+            records[i].append(data)
+            if decide(records[i]) is not None or len(records[i]) == max_games:
+                decided[i] = True
+                # 结果已经确定，其余对局不再计入结果，还没开始的对局直接跳过
+                outdated = [job for job, candidate in pending.items() if candidate == i]
+                for job in outdated:
+                    del pending[job]
+                self.cancel(outdated)
+            fill()
+
+        # 让还在排队的对局直接跳过
+        self._next_generation()
+        return records
+
+    def close(self):
+        for _ in self.workers:
+            self.task_queue.put(None)
+        for p in self.workers:
+            p.join(timeout=60)
+            if p.is_alive():
+                p.terminate()
+        self.workers = []
+
+
+_service = None
+
+
+def get_evaluation_service():
+    """返回全局唯一的评估服务，第一次调用时启动 worker"""
+    global _service
+    if _service is None:
+        _service = EvaluationService()
+        _service.start()
+        atexit.register(_service.close)
+    return _service
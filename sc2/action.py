@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from itertools import groupby
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Dict, Iterable, List, Tuple, Union
 
 from s2clientprotocol import raw_pb2 as raw_pb
 
+from sc2.constants import ORDER_REPLACING_ABILITIES
 from sc2.position import Point2
 from sc2.unit import Unit
 
@@ -13,6 +14,81 @@ if TYPE_CHECKING:
     from sc2.unit_command import UnitCommand
 
 
+def coalesce_unit_commands(actions: List[UnitCommand]) -> List[List[UnitCommand]]:
+    """
+    Splits the unit commands of one frame into groups that combine_action_groups turns into as few
+    ActionRawUnitCommands as possible. combine_actions only merges adjacent commands, so a bot that loops over
+    marines, then marauders, then marines again would otherwise send three actions for two groups.
+
+    - A command without queue whose ability replaces all orders of the unit (see ORDER_REPLACING_ABILITIES)
+      drops the earlier commands of the same unit with such an ability, the server would overwrite them anyway.
+    - Combineable commands with the same (ability, target, queue) are moved together across the whole frame.
+      A command only joins an earlier group if no other command of its unit comes in between,
+      so the commands of each unit keep their order. Other commands keep their position.
+
+    Example input:
+    [
+        UnitCommand(AbilityId.ATTACK, Unit(name='Marine', tag=1), Point2((50, 50)), False),
+        UnitCommand(AbilityId.ATTACK, Unit(name='Marauder', tag=2), Point2((40, 40)), False),
+        UnitCommand(AbilityId.ATTACK, Unit(name='Marine', tag=3), Point2((50, 50)), False),
+        UnitCommand(AbilityId.MOVE, Unit(name='Marauder', tag=2), Point2((30, 30)), False),
+    ]
+    Output:
+    [
+        [
+            UnitCommand(AbilityId.ATTACK, Unit(name='Marine', tag=1), Point2((50, 50)), False),
+            UnitCommand(AbilityId.ATTACK, Unit(name='Marine', tag=3), Point2((50, 50)), False),
+        ],
+        [UnitCommand(AbilityId.MOVE, Unit(name='Marauder', tag=2), Point2((30, 30)), False)],
+    ]
+
+    :param actions:
+    """
+    # Index of the last command of each unit that replaces its orders
+    last_replacing: Dict[int, int] = {}
+    for index, action in enumerate(actions):
+        if not action.queue and action.ability in ORDER_REPLACING_ABILITIES:
+            last_replacing[action.unit.tag] = index
+
+    groups: List[List[UnitCommand]] = []
+    # Latest group of each combining tuple, and the group and input run of the latest command of each unit.
+    # A run is a sequence of adjacent commands with the same combining tuple, which groupby in combine_actions merges
+    open_groups: Dict[Tuple, int] = {}
+    unit_last_group: Dict[int, Tuple[int, int]] = {}
+    run = 0
+    previous_key = None
+    for index, action in enumerate(actions):
+        key = action.combining_tuple
+        if key != previous_key:
+            run += 1
+            previous_key = key
+        tag = action.unit.tag
+        if action.ability in ORDER_REPLACING_ABILITIES and index < last_replacing.get(tag, -1):
+            continue
+        group_index = open_groups.get(key, -1) if key[3] else -1
+        last_group, last_run = unit_last_group.get(tag, (-1, 0))
+        # The same command twice in one run is sent once by combine_actions, so it stays in the group of the first one
+        if key[3] and last_run == run:
+            group_index = last_group
+        # A unit that is already in the group only joins it again from the same run, like before coalescing
+        elif group_index < 0 or group_index < last_group or (group_index == last_group and last_run != run):
+            group_index = len(groups)
+            groups.append([])
+            open_groups[key] = group_index
+        groups[group_index].append(action)
+        unit_last_group[tag] = (group_index, run)
+    return groups
+
+
+def combine_action_groups(groups: Iterable[Iterable[UnitCommand]]):
+    """Combines each group of coalesce_unit_commands on its own, so adjacent groups of the same command are not merged.
+
+    :param groups:
+    """
+    for group in groups:
+        yield from combine_actions(group)
+
+
 # pylint: disable=R0912
 def combine_actions(action_iter):
     """
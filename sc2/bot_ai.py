@@ -6,8 +6,10 @@ import random
 import warnings
 from collections import Counter
 from functools import cached_property
+from itertools import chain
 from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from loguru import logger
 
 from sc2.bot_ai_internal import BotAIInternal
@@ -20,6 +22,7 @@ from sc2.constants import (
     TERRAN_TECH_REQUIREMENT,
     ZERG_TECH_REQUIREMENT,
 )
+from sc2.damage_matrix import damage_matrix
 from sc2.data import Alert, Race, Result, Target
 from sc2.dicts.unit_research_abilities import RESEARCH_INFO
 from sc2.dicts.unit_train_build_abilities import TRAIN_INFO
@@ -31,6 +34,7 @@ from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
 from sc2.position import Point2
 from sc2.unit import Unit
+from sc2.unit_snapshot import UnitSnapshot
 from sc2.units import Units
 
 if TYPE_CHECKING:
@@ -233,9 +237,37 @@ class BotAI(BotAIInternal):
 
             units_abilities = await self.get_available_abilities([self.units.random])
 
+        Abilities are queried in one batch for all own units the first time they are needed in a frame
+        and served from memory for the rest of the frame, so calling this once per unit does not cost a round trip per unit.
+
         :param units:
         :param ignore_resource_requirements:"""
-        return await self.client.query_available_abilities(units, ignore_resource_requirements)
+        if isinstance(units, Unit):
+            # Deprecated single unit call, see Client.query_available_abilities
+            return (await self.get_available_abilities([units], ignore_resource_requirements))[0]
+        cache = self._available_abilities.setdefault(ignore_resource_requirements, {})
+        missing = [unit for unit in units if unit.tag not in cache]
+        if missing:
+            if not cache:
+                missing_tags = {unit.tag for unit in missing}
+                missing.extend(unit for unit in self.units if unit.tag not in missing_tags)
+            abilities = await self.client.query_available_abilities(missing, ignore_resource_requirements)
+            for unit, unit_abilities in zip(missing, abilities):
+                cache[unit.tag] = unit_abilities
+        return [cache[unit.tag] for unit in units]
+
+    @property_cache_once_per_frame
+    def unit_snapshot(self) -> UnitSnapshot:
+        """Struct-of-arrays (numpy columns) view of self.all_units for this frame, built on first access. See unit_snapshot.py
+        With lazy_units this is the snapshot _prepare_units built from the raw units."""
+        if self._frame_snapshot is not None:
+            return self._frame_snapshot
+        return UnitSnapshot(self)
+
+    @property_cache_once_per_frame
+    def _available_abilities(self) -> Dict[bool, Dict[int, List[AbilityId]]]:
+        """ Available abilities of this frame: {ignore_resource_requirements: {unit tag: abilities}}, filled by get_available_abilities """
+        return {}
 
     async def expand_now(self, building: UnitTypeId = None, max_distance: int = 10, location: Optional[Point2] = None):
         """Finds the next possible expansion via 'self.get_next_expansion()'. If the target expansion is blocked (e.g. an enemy unit), it will misplace the expansion.
@@ -518,6 +550,71 @@ class BotAI(BotAIInternal):
             cost = self.game_data.calculate_ability_cost(item_id)
         return cost
 
+    def calculate_damage_matrix(
+        self,
+        attackers: Units,
+        targets: Units,
+        ignore_armor: bool = False,
+        include_overkill_damage: bool = True,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Batched Unit.calculate_damage_vs_target: returns the (damage, attack speed, attack range) matrices
+        of shape (len(attackers), len(targets)), row i belongs to attackers[i] and column j to targets[j].
+
+        Example::
+
+            damage, _, _ = self.calculate_damage_matrix(self.units, self.enemy_units)
+            # Enemy that takes the most damage from one volley of the whole army
+            target = self.enemy_units[int(damage.sum(axis=0).argmax())]
+
+        :param attackers:
+        :param targets:
+        :param ignore_armor:
+        :param include_overkill_damage:
+        """
+        return damage_matrix(self, attackers, targets, ignore_armor, include_overkill_damage)
+
+    def calculate_dps_matrix(
+        self,
+        attackers: Units,
+        targets: Units,
+        ignore_armor: bool = False,
+        include_overkill_damage: bool = True,
+    ) -> np.ndarray:
+        """Batched Unit.calculate_dps_vs_target, shape (len(attackers), len(targets)).
+
+        :param attackers:
+        :param targets:
+        :param ignore_armor:
+        :param include_overkill_damage:
+        """
+        damage, speed, _ = damage_matrix(self, attackers, targets, ignore_armor, include_overkill_damage)
+        return np.divide(damage, speed, out=np.zeros_like(damage), where=speed > 0)
+
+    def calculate_time_to_kill_matrix(self, attackers: Units, targets: Units, ignore_armor: bool = False) -> np.ndarray:
+        """Seconds (game time) each attacker alone needs to kill each target, shape (len(attackers), len(targets)).
+        Estimated as the targets health plus shield divided by the dps of the attacker, np.inf if it can't damage the target.
+        The time for a group to kill a target is estimated with 1 / (1 / matrix[rows, j]).sum().
+
+        Example::
+
+            ttk = self.calculate_time_to_kill_matrix(self.units, self.enemy_units)
+            group_ttk = 1 / (1 / ttk).sum(axis=0)
+            # Focus the enemy that dies fastest
+            target = self.enemy_units[int(group_ttk.argmin())]
+
+        :param attackers:
+        :param targets:
+        :param ignore_armor:
+        """
+        dps = self.calculate_dps_matrix(attackers, targets, ignore_armor)
+        if not targets:
+            return dps
+        hit_points = np.fromiter(
+            (unit._proto.health + unit._proto.shield for unit in targets), dtype=float, count=len(targets)
+        )
+        with np.errstate(divide="ignore"):
+            return np.where(dps > 0, hit_points[None, :] / np.where(dps > 0, dps, 1), np.inf)
+
     def can_afford(self, item_id: Union[UnitTypeId, UpgradeId, AbilityId], check_supply_cost: bool = True) -> bool:
         """Tests if the player has enough resources to build a unit or structure.
 
@@ -1366,6 +1463,39 @@ class BotAI(BotAIInternal):
         """
         raise NotImplementedError
 
+    def next_game_step(self) -> Optional[int]:
+        """Override this in your bot class to choose how many game loops pass until the next on_step call.
+        Returning None keeps self.client.game_step. Only used if the game is not played in realtime.
+
+        The default implementation is a distance based policy: if self.coarse_game_step is set,
+        the game advances coarse_game_step loops at once while every visible enemy unit is further away from every own unit
+        than the largest weapon range of all these units plus both radii plus self.engage_distance,
+        which includes the approach while all enemies are still in the fog of war,
+        and falls back to self.client.game_step as soon as the armies get close.
+        engage_distance is the margin for the distance the units can close during one coarse step, and for ranges
+        that are not in the weapon data (upgrades, abilities like the cyclone lock on).
+
+        Example::
+
+            def __init__(self):
+                super().__init__()
+                self.coarse_game_step = 16
+                self.engage_distance = 8
+        """
+        if not self.coarse_game_step:
+            return None
+        if not self.units or not self.enemy_units:
+            return self.coarse_game_step
+        # One unit per type is enough to look up the weapon ranges, e.g. a sieged tank or a tempest on either side
+        types = {unit._proto.unit_type: unit for unit in chain(self.units, self.enemy_units)}
+        reach = max(max(unit.ground_range, unit.air_range) for unit in types.values()) + self.engage_distance
+        own, enemy = self.units._positions, self.enemy_units._positions
+        distances = np.sqrt(((own[:, None, :] - enemy[None, :, :])**2).sum(axis=2))
+        gaps = distances - self.units._radii[:, None] - self.enemy_units._radii[None, :]
+        if gaps.min() <= reach:
+            return None
+        return self.coarse_game_step
+
     async def on_end(self, game_result: Result):
         """Override this in your bot class. This function is called at the end of a game.
         Unsure if this function will be called on the laddermanager client as the bot process may forcefully be terminated.
@@ -10,17 +10,20 @@ from collections import Counter
 from contextlib import suppress
 from typing import TYPE_CHECKING, Any
 from typing import Counter as CounterType
-from typing import Dict, Generator, Iterable, List, Set, Tuple, Union, final
+from typing import Dict, FrozenSet, Generator, Iterable, List, Optional, Set, Tuple, Union, final
 
 import numpy as np
 from loguru import logger
 from s2clientprotocol import sc2api_pb2 as sc_pb
 
+from sc2.action import coalesce_unit_commands
 from sc2.cache import property_cache_once_per_frame
+from sc2.command_diff import CommandDiff
 from sc2.constants import (
     ALL_GAS,
     CREATION_ABILITY_FIX,
     IS_PLACEHOLDER,
+    IS_STRUCTURE,
     TERRAN_STRUCTURES_REQUIRE_SCV,
     FakeEffectID,
     abilityid_to_unittypeid,
@@ -35,9 +38,11 @@ from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.upgrade_id import UpgradeId
 from sc2.pixel_map import PixelMap
 from sc2.position import Point2
+from sc2.spatial_index import SpatialIndex
 from sc2.unit import Unit
 from sc2.unit_command import UnitCommand
-from sc2.units import Units
+from sc2.unit_snapshot import SnapshotRows, UnitSnapshot
+from sc2.units import IndexedUnits, Units
 
 with warnings.catch_warnings():
     warnings.simplefilter("ignore")
@@ -48,9 +53,71 @@ if TYPE_CHECKING:
     from sc2.game_info import GameInfo
 
 
+# Unit collections that are built on first access with BotAI.lazy_units
+_LAZY_UNIT_GROUPS = (
+    "all_units",
+    "units",
+    "workers",
+    "larva",
+    "structures",
+    "townhalls",
+    "gas_buildings",
+    "all_own_units",
+    "enemy_units",
+    "enemy_structures",
+    "all_enemy_units",
+    "resources",
+    "destructables",
+    "watchtowers",
+    "mineral_field",
+    "vespene_geyser",
+    "placeholders",
+    "techlab_tags",
+    "reactor_tags",
+)
+
+
+class _LazyUnitGroup:
+    """Builds a unit collection from the snapshot of the frame on first access and stores it on the bot.
+    Without lazy_units the collection set in _prepare_units shadows this descriptor, so nothing changes."""
+
+    def __set_name__(self, owner, name: str):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        snapshot = instance.__dict__.get("_frame_snapshot")
+        if snapshot is None:
+            raise AttributeError(self.name)
+        group = snapshot.group(self.name)
+        instance.__dict__[self.name] = group
+        return group
+
+
 class BotAIInternal(ABC):
     """Base class for bots."""
 
+    all_units = _LazyUnitGroup()
+    units = _LazyUnitGroup()
+    workers = _LazyUnitGroup()
+    larva = _LazyUnitGroup()
+    structures = _LazyUnitGroup()
+    townhalls = _LazyUnitGroup()
+    gas_buildings = _LazyUnitGroup()
+    all_own_units = _LazyUnitGroup()
+    enemy_units = _LazyUnitGroup()
+    enemy_structures = _LazyUnitGroup()
+    all_enemy_units = _LazyUnitGroup()
+    resources = _LazyUnitGroup()
+    destructables = _LazyUnitGroup()
+    watchtowers = _LazyUnitGroup()
+    mineral_field = _LazyUnitGroup()
+    vespene_geyser = _LazyUnitGroup()
+    placeholders = _LazyUnitGroup()
+    techlab_tags = _LazyUnitGroup()
+    reactor_tags = _LazyUnitGroup()
+
     @final
     def _initialize_variables(self):
         """ Called from main.py internally """
@@ -67,6 +134,45 @@ class BotAIInternal(ABC):
         # Select if the Unit.command should return UnitCommand objects. Set this to True if your bot uses 'self.do(unit(ability, target))'
         if not hasattr(self, "unit_command_uses_self_do"):
             self.unit_command_uses_self_do: bool = False
+        # Adaptive stepping, see BotAI.next_game_step: while no enemy is within the largest weapon range plus the radii plus
+        # engage_distance, step coarse_game_step game loops at once
+        if not hasattr(self, "coarse_game_step"):
+            self.coarse_game_step: Optional[int] = None
+        if not hasattr(self, "engage_distance"):
+            self.engage_distance: float = 8
+        # When the pathing grid is requested again (it is only available through GameInfo), see _game_info_for_step:
+        # "always", "on_change" (structures or neutral units appeared, died, lifted off or landed), an int N (every N game loops) or "never".
+        # "on_change" misses changes that no structure or neutral unit causes, e.g. force fields
+        if not hasattr(self, "pathing_grid_refresh"):
+            self.pathing_grid_refresh: Union[str, int] = "always"
+        # Queue the actions and debug draws of a step and send them together with the following RequestStep (or RequestObservation),
+        # so one socket round trip is paid per step instead of one per request. Action errors are then not returned, see Protocol._queue
+        if not hasattr(self, "pipeline_requests"):
+            self.pipeline_requests: bool = False
+        # Merge the combineable commands of a step across the whole frame and drop commands that a later command of the
+        # same unit overwrites, see action.coalesce_unit_commands
+        if not hasattr(self, "coalesce_actions"):
+            self.coalesce_actions: bool = False
+        # Leave out commands that repeat the last command of a unit within the tolerance of CommandDiff.policies
+        if not hasattr(self, "diff_commands"):
+            self.diff_commands: bool = False
+        if not hasattr(self, "command_diff"):
+            self.command_diff: CommandDiff = CommandDiff()
+        # Fields of GameState.LAZY_FIELDS that are computed in _prepare_step instead of on first access, e.g. ("visibility", "creep")
+        if not hasattr(self, "prefetch_state"):
+            self.prefetch_state: Tuple[str, ...] = ()
+        # Build only the UnitSnapshot columns in _prepare_units, Unit objects and the unit collections (self.units,
+        # self.enemy_structures, ...) are created on first access, see UnitSnapshot.from_raw
+        if not hasattr(self, "lazy_units"):
+            self.lazy_units: bool = False
+        # Snapshot of this and of the previous frame if lazy_units is set
+        self._frame_snapshot: Optional[UnitSnapshot] = None
+        self._previous_snapshot: Optional[UnitSnapshot] = None
+        self._pathing_blockers: Optional[FrozenSet[Tuple[int, bool]]] = None
+        self._pathing_grid_loop: int = -1
+        self._structure_type_cache: Dict[int, bool] = {}
+        # Weapons with upgrades applied per (unit type, attack upgrade level, blueflame), see damage_matrix.weapon_profiles
+        self._weapon_profiles: Dict[Tuple[int, int, bool], tuple] = {}
         # This value will be set to True by main.py in self._prepare_start if game is played in realtime (if true, the bot will have limited time per step)
         self.realtime: bool = False
         self.base_build: int = -1
@@ -87,6 +193,7 @@ class BotAIInternal(ABC):
         self.mineral_field: Units = Units([], self)
         self.vespene_geyser: Units = Units([], self)
         self.placeholders: Units = Units([], self)
+        self.spatial_index: SpatialIndex = SpatialIndex(self)
         self.techlab_tags: Set[int] = set()
         self.reactor_tags: Set[int] = set()
         self.minerals: int = 50
@@ -106,11 +213,9 @@ class BotAIInternal(ABC):
         self._generated_frame = -100
         self._units_created: Counter = Counter()
         self._unit_tags_seen_this_game: Set[int] = set()
-        self._units_previous_map: Dict[int, Unit] = {}
-        self._structures_previous_map: Dict[int, Unit] = {}
-        self._enemy_units_previous_map: Dict[int, Unit] = {}
-        self._enemy_structures_previous_map: Dict[int, Unit] = {}
-        self._all_units_previous_map: Dict[int, Unit] = {}
+        # Unit collections of the previous frame, the *_previous_map dicts are only built from them when used, see _previous_map
+        self._previous_groups: Dict[str, Units] = {}
+        self._previous_maps: Dict[str, Dict[int, Unit]] = {}
         self._previous_upgrades: Set[UpgradeId] = set()
         self._expansion_positions_list: List[Point2] = []
         self._resource_location_to_expansion_position_dict: Dict[Point2, Point2] = {}
@@ -411,16 +516,40 @@ class BotAIInternal(ABC):
         return r
 
     @final
-    async def _do_actions(self, actions: List[UnitCommand], prevent_double: bool = True):
+    async def _do_actions(
+        self,
+        actions: List[UnitCommand],
+        prevent_double: bool = True,
+        queue: bool = False,
+        coalesce: bool = False,
+        diff: bool = False,
+    ):
         """Used internally by main.py automatically, use self.do() instead!
 
         :param actions:
-        :param prevent_double:"""
+        :param prevent_double:
+        :param queue: Send the actions together with the next request and return None, see Client.actions
+        :param coalesce: Group the actions across the whole list and drop overwritten ones first, see action.coalesce_unit_commands
+        :param diff: Leave out actions that repeat the last action of their unit, see self.command_diff"""
         if not actions:
             return None
+        filters = []
         if prevent_double:
-            actions = list(filter(self.prevent_double_actions, actions))
-        result = await self.client.actions(actions)
+            filters.append(self.prevent_double_actions)
+        if diff:
+            game_loop = self.state.game_loop
+            filters.append(lambda action: self.command_diff.keep(action, game_loop))
+
+        def keep(action: UnitCommand) -> bool:
+            return all(action_filter(action) for action_filter in filters)
+
+        # Before the filters, otherwise an overwritten command could be sent while the command replacing it is filtered out
+        if coalesce:
+            groups = coalesce_unit_commands(actions)
+            groups = [group for group in (list(filter(keep, group)) for group in groups) if group]
+            return await self.client.actions(groups, queue=queue, grouped=True)
+        actions = list(filter(keep, actions))
+        result = await self.client.actions(actions, queue=queue)
         return result
 
     @final
@@ -504,26 +633,37 @@ class BotAIInternal(ABC):
             self.game_info.start_locations = [pos for pos in self.game_info.start_locations]
 
     @final
-    def _prepare_step(self, state, proto_game_info):
+    def _prepare_step(self, state, proto_game_info=None):
         """
         :param state:
-        :param proto_game_info:
+        :param proto_game_info: GameInfo response to refresh the pathing grid from, None keeps the current pathing grid
         """
         # Set attributes from new state before on_step."""
         self.state: GameState = state  # See game_state.py
+        if self.prefetch_state:
+            state.prefetch(*self.prefetch_state)
         # update pathing grid, which unfortunately is in GameInfo instead of GameState
-        self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
+        if proto_game_info is not None:
+            self.game_info.pathing_grid = PixelMap(proto_game_info.game_info.start_raw.pathing_grid, in_bits=True)
         # Required for events, needs to be before self.units are initialized so the old units are stored
-        self._units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.units}
-        self._structures_previous_map: Dict[int, Unit] = {structure.tag: structure for structure in self.structures}
-        self._enemy_units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.enemy_units}
-        self._enemy_structures_previous_map: Dict[int, Unit] = {
-            structure.tag: structure
-            for structure in self.enemy_structures
-        }
-        self._all_units_previous_map: Dict[int, Unit] = {unit.tag: unit for unit in self.all_units}
-
-        self._prepare_units()
+        if self.lazy_units:
+            # Keeps the collections that were not used in the previous frame unbuilt
+            self._previous_snapshot = self._frame_snapshot
+            self._previous_groups = {}
+        else:
+            self._previous_groups = {
+                "units": self.units,
+                "structures": self.structures,
+                "enemy_units": self.enemy_units,
+                "enemy_structures": self.enemy_structures,
+                "all_units": self.all_units,
+            }
+        self._previous_maps = {}
+
+        if self.lazy_units:
+            self._prepare_units_lazy()
+        else:
+            self._prepare_units()
         self.minerals: int = state.common.minerals
         self.vespene: int = state.common.vespene
         self.supply_army: int = state.common.food_army
@@ -545,21 +685,67 @@ class BotAIInternal(ABC):
         if self.enemy_race == Race.Random and self.all_enemy_units:
             self.enemy_race = Race(self.all_enemy_units.first.race)
 
+    @final
+    def _pathing_grid_outdated(self, state: GameState) -> bool:
+        """Decides according to self.pathing_grid_refresh if the pathing grid has to be requested again for this state.
+
+        :param state:
+        """
+        policy = self.pathing_grid_refresh
+        if policy == "always":
+            return True
+        if policy == "never":
+            return False
+        if isinstance(policy, int):
+            if state.game_loop - self._pathing_grid_loop < policy and self._pathing_grid_loop >= 0:
+                return False
+            self._pathing_grid_loop = state.game_loop
+            return True
+        # Only structures (of any player) and neutral units like rocks and minerals change the pathing grid
+        blockers = frozenset(
+            (unit.tag, unit.is_flying)
+            for unit in state.observation_raw.units
+            if unit.alliance == 3 or self._is_structure_type(unit.unit_type)
+        )
+        if blockers == self._pathing_blockers:
+            return False
+        self._pathing_blockers = blockers
+        return True
+
+    @final
+    def _is_structure_type(self, unit_type: int) -> bool:
+        is_structure = self._structure_type_cache.get(unit_type)
+        if is_structure is None:
+            type_data = self.game_data.units.get(unit_type)
+            is_structure = type_data is not None and IS_STRUCTURE in type_data.attributes
+            self._structure_type_cache[unit_type] = is_structure
+        return is_structure
+
+    @final
+    async def _game_info_for_step(self, state: GameState):
+        """Requests GameInfo for the pathing grid only if _pathing_grid_outdated, saves one round trip per step otherwise.
+
+        :param state:
+        """
+        if self._pathing_grid_outdated(state):
+            return await self.client._execute(game_info=sc_pb.RequestGameInfo())
+        return None
+
     @final
     def _prepare_units(self):
         # Set of enemy units detected by own sensor tower, as blips have less unit information than normal visible units
         self.blips: Set[Blip] = set()
-        self.all_units: Units = Units([], self)
-        self.units: Units = Units([], self)
+        self.all_units: Units = IndexedUnits([], self)
+        self.units: Units = IndexedUnits([], self)
         self.workers: Units = Units([], self)
         self.larva: Units = Units([], self)
-        self.structures: Units = Units([], self)
+        self.structures: Units = IndexedUnits([], self)
         self.townhalls: Units = Units([], self)
         self.gas_buildings: Units = Units([], self)
-        self.all_own_units: Units = Units([], self)
-        self.enemy_units: Units = Units([], self)
-        self.enemy_structures: Units = Units([], self)
-        self.all_enemy_units: Units = Units([], self)
+        self.all_own_units: Units = IndexedUnits([], self)
+        self.enemy_units: Units = IndexedUnits([], self)
+        self.enemy_structures: Units = IndexedUnits([], self)
+        self.all_enemy_units: Units = IndexedUnits([], self)
         self.resources: Units = Units([], self)
         self.destructables: Units = Units([], self)
         self.watchtowers: Units = Units([], self)
@@ -643,7 +829,9 @@ class BotAIInternal(ABC):
                     else:
                         self.enemy_units.append(unit_obj)
         
-        self.units = Units(sorted(self.units, key=lambda u: u.tag), self)
+        self.units = IndexedUnits(sorted(self.units, key=lambda u: u.tag), self)
+        # KD-trees of this frame, built lazily on first query
+        self.spatial_index = SpatialIndex(self)
 
         # Force distance calculation and caching on all units using scipy pdist or cdist
         if self.distance_calculation_method == 1:
@@ -651,6 +839,27 @@ class BotAIInternal(ABC):
         elif self.distance_calculation_method in {2, 3}:
             _ = self._cdist
 
+    @final
+    def _prepare_units_lazy(self):
+        """_prepare_units for lazy_units: only fills the columns of a UnitSnapshot from the raw units,
+        the unit collections are built from it on first access, see _LazyUnitGroup"""
+        self.blips: Set[Blip] = set()
+        protos = []
+        for unit in self.state.observation_raw.units:
+            if unit.is_blip:
+                self.blips.add(Blip(unit))
+            elif unit.unit_type in FakeEffectID:
+                # Convert these units to effects: reaper grenade, parasitic bomb dummy, forcefield
+                self.state.effects.add(EffectData(unit, fake=True))
+            else:
+                protos.append(unit)
+        self._frame_snapshot = UnitSnapshot.from_raw(self, protos)
+        # Drop the collections of the previous frame so the next access builds them from the new snapshot
+        for name in _LAZY_UNIT_GROUPS:
+            self.__dict__.pop(name, None)
+        # KD-trees of this frame, built lazily on first query
+        self.spatial_index = SpatialIndex(self)
+
     @final
     async def _after_step(self) -> int:
         """ Executed by main.py after each on_step function. """
@@ -664,12 +873,14 @@ class BotAIInternal(ABC):
         self._total_steps_iterations += 1
         # Commit and clear bot actions
         if self.actions:
-            await self._do_actions(self.actions)
+            await self._do_actions(
+                self.actions, queue=self.pipeline_requests, coalesce=self.coalesce_actions, diff=self.diff_commands
+            )
             self.actions.clear()
         # Clear set of unit tags that were given an order this frame by self.do()
         self.unit_tags_received_action.clear()
         # Commit debug queries
-        await self.client._send_debug()
+        await self.client._send_debug(queue=self.pipeline_requests)
 
         return self.state.game_loop
 
@@ -682,10 +893,126 @@ class BotAIInternal(ABC):
         await self.client.step(steps)
         state = await self.client.observation()
         gs = GameState(state.observation)
-        proto_game_info = await self.client._execute(game_info=sc_pb.RequestGameInfo())
-        self._prepare_step(gs, proto_game_info)
+        self._prepare_step(gs, await self._game_info_for_step(gs))
         await self.issue_events()
 
+    @final
+    def _previous_map(self, group: str) -> Dict[int, Unit]:
+        """{tag: unit} of a unit collection of the previous frame, built on first use in a frame
+
+        :param group: "units", "structures", "enemy_units", "enemy_structures" or "all_units"
+        """
+        previous_map = self._previous_maps.get(group)
+        if previous_map is None:
+            previous_map = {unit.tag: unit for unit in self._previous_group(group)}
+            self._previous_maps[group] = previous_map
+        return previous_map
+
+    @final
+    def _previous_group(self, group: str) -> Units:
+        """Unit collection of the previous frame, empty in the first frame
+
+        :param group: "units", "structures", "enemy_units", "enemy_structures" or "all_units"
+        """
+        previous_group = self._previous_groups.get(group)
+        if previous_group is None and self._previous_snapshot is not None:
+            previous_group = self._previous_snapshot.group(group)
+            self._previous_groups[group] = previous_group
+        return Units([], self) if previous_group is None else previous_group
+
+    @final
+    def _event_group(self, group: str, previous: bool = False) -> Union[Units, SnapshotRows]:
+        """The unit collection the events are detected on. With lazy_units these are rows of the snapshot,
+        so only the units that an event is dispatched for are created.
+
+        :param group: "units", "structures", "enemy_units", "enemy_structures" or "all_units"
+        :param previous: The collection of the previous frame
+        """
+        snapshot = self._previous_snapshot if previous else self._frame_snapshot
+        if self.lazy_units and snapshot is not None:
+            return snapshot.rows_view(group)
+        return self._previous_group(group) if previous else getattr(self, group)
+
+    @final
+    @property
+    def _units_previous_map(self) -> Dict[int, Unit]:
+        return self._previous_map("units")
+
+    @final
+    @property
+    def _structures_previous_map(self) -> Dict[int, Unit]:
+        return self._previous_map("structures")
+
+    @final
+    @property
+    def _enemy_units_previous_map(self) -> Dict[int, Unit]:
+        return self._previous_map("enemy_units")
+
+    @final
+    @property
+    def _enemy_structures_previous_map(self) -> Dict[int, Unit]:
+        return self._previous_map("enemy_structures")
+
+    @final
+    @property
+    def _all_units_previous_map(self) -> Dict[int, Unit]:
+        return self._previous_map("all_units")
+
+    @final
+    def _handles_event(self, name: str) -> bool:
+        """True if the event handler 'name' (e.g. "on_unit_took_damage") is overridden by the bot class or set on the instance.
+        Events without a handler are not dispatched, the defaults in BotAI do nothing."""
+        if name in self.__dict__:
+            return True
+        # pylint: disable=C0415
+        from sc2.bot_ai import BotAI
+        return getattr(type(self), name) is not getattr(BotAI, name)
+
+    @final
+    def _diff_previous(self, group: str, current: Union[Units, SnapshotRows]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Matches the units of this frame with the previous frame by tag.
+        Returns (is_new, current_indices, previous_indices): a mask over current of units that were not in the previous frame,
+        and the indices of the units that are in both frames.
+
+        :param group:
+        :param current:
+        """
+        tags = current._state_columns[0]
+        previous_tags = self._event_group(group, previous=True)._state_columns[0]
+        _, current_indices, previous_indices = np.intersect1d(
+            tags, previous_tags, assume_unique=True, return_indices=True
+        )
+        is_new = np.ones(len(tags), dtype=bool)
+        is_new[current_indices] = False
+        return is_new, current_indices, previous_indices
+
+    @final
+    def _damage_and_type_changes(
+        self, group: str, current: Union[Units, SnapshotRows], current_indices: np.ndarray, previous_indices: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Compares the units that are in both frames. Returns (took damage, damage amount, type changed, previous index)
+        arrays over current. A unit took damage if its health or its shield dropped, like the per unit check before.
+
+        :param group:
+        :param current:
+        :param current_indices:
+        :param previous_indices:
+        """
+        _, types, health, shield, _ = current._state_columns
+        _, previous_types, previous_health, previous_shield, _ = self._event_group(group, previous=True)._state_columns
+        n = len(current)
+        took_damage = np.zeros(n, dtype=bool)
+        damage = np.zeros(n)
+        type_changed = np.zeros(n, dtype=bool)
+        previous_index = np.full(n, -1)
+        previous_index[current_indices] = previous_indices
+        health_now, health_before = health[current_indices], previous_health[previous_indices]
+        shield_now, shield_before = shield[current_indices], previous_shield[previous_indices]
+        took_damage[current_indices] = (health_now < health_before) | (shield_now < shield_before)
+        damage[current_indices] = health_before - health_now + shield_before - shield_now
+        type_changed[current_indices] = types[current_indices] != previous_types[previous_indices]
+        return took_damage, damage, type_changed, previous_index
+
     @final
     async def issue_events(self):
         """This function will be automatically run from main.py and triggers the following functions:
@@ -694,6 +1021,9 @@ class BotAIInternal(ABC):
         - on_building_construction_started
         - on_building_construction_complete
         - on_upgrade_complete
+
+        The units of this frame are matched with the previous frame by array operations on their tag, type, health,
+        shield and build progress columns, and events are only dispatched if the bot overrides the handler.
         """
         await self._issue_unit_dead_events()
         await self._issue_unit_added_events()
@@ -703,23 +1033,44 @@ class BotAIInternal(ABC):
 
     @final
     async def _issue_unit_added_events(self):
-        for unit in self.units:
-            if unit.tag not in self._units_previous_map and unit.tag not in self._unit_tags_seen_this_game:
-                self._unit_tags_seen_this_game.add(unit.tag)
-                self._units_created[unit.type_id] += 1
-                await self.on_unit_created(unit)
-            elif unit.tag in self._units_previous_map:
-                previous_frame_unit: Unit = self._units_previous_map[unit.tag]
-                # Check if a unit took damage this frame and then trigger event
-                if unit.health < previous_frame_unit.health or unit.shield < previous_frame_unit.shield:
-                    damage_amount = previous_frame_unit.health - unit.health + previous_frame_unit.shield - unit.shield
-                    await self.on_unit_took_damage(unit, damage_amount)
-                # Check if a unit type has changed
-                if previous_frame_unit.type_id != unit.type_id:
-                    await self.on_unit_type_changed(unit, previous_frame_unit.type_id)
+        units = self._event_group("units")
+        is_new, current_indices, previous_indices = self._diff_previous("units", units)
+        handles_created = self._handles_event("on_unit_created")
+        handles_damage = self._handles_event("on_unit_took_damage")
+        handles_type_change = self._handles_event("on_unit_type_changed")
+        if handles_damage or handles_type_change:
+            took_damage, damage, type_changed, previous_index = self._damage_and_type_changes(
+                "units", units, current_indices, previous_indices
+            )
+            took_damage &= handles_damage
+            type_changed &= handles_type_change
+            relevant = is_new | took_damage | type_changed
+        else:
+            relevant = is_new
+        tags, types = units._state_columns[:2]
+        previous_types = self._event_group("units", previous=True)._state_columns[1]
+        # The unit of a row is only looked up if an event is dispatched for it
+        for index in np.flatnonzero(relevant).tolist():
+            if is_new[index]:
+                # Units that reappear, e.g. after leaving a bunker, were created before
+                tag = int(tags[index])
+                if tag not in self._unit_tags_seen_this_game:
+                    self._unit_tags_seen_this_game.add(tag)
+                    self._units_created[UnitTypeId(int(types[index]))] += 1
+                    if handles_created:
+                        await self.on_unit_created(units[index])
+                continue
+            unit: Unit = units[index]
+            if took_damage[index]:
+                await self.on_unit_took_damage(unit, float(damage[index]))
+            if type_changed[index]:
+                await self.on_unit_type_changed(unit, UnitTypeId(int(previous_types[previous_index[index]])))
 
     @final
     async def _issue_upgrade_events(self):
+        # Upgrades are never lost, the same count means no upgrade finished and the set does not have to be built
+        if len(self.state.observation_raw.player.upgrade_ids) == len(self._previous_upgrades):
+            return
         difference = self.state.upgrades - self._previous_upgrades
         for upgrade_completed in difference:
             await self.on_upgrade_complete(upgrade_completed)
@@ -727,55 +1078,72 @@ class BotAIInternal(ABC):
 
     @final
     async def _issue_building_events(self):
-        for structure in self.structures:
-            if structure.tag not in self._structures_previous_map:
-                if structure.build_progress < 1:
-                    await self.on_building_construction_started(structure)
+        structures = self._event_group("structures")
+        is_new, current_indices, previous_indices = self._diff_previous("structures", structures)
+        took_damage, damage, type_changed, previous_index = self._damage_and_type_changes(
+            "structures", structures, current_indices, previous_indices
+        )
+        took_damage &= self._handles_event("on_unit_took_damage")
+        type_changed &= self._handles_event("on_unit_type_changed")
+        # Structure completed this frame, this also counts for _units_created, so it is always checked
+        _, types, _, _, progress = structures._state_columns
+        _, previous_types, _, _, previous_progress = self._event_group("structures", previous=True)._state_columns
+        completed = np.zeros(len(structures), dtype=bool)
+        completed[current_indices] = (progress[current_indices] == 1) & (previous_progress[previous_indices] < 1)
+        handles_started = self._handles_event("on_building_construction_started")
+        handles_complete = self._handles_event("on_building_construction_complete")
+        for index in np.flatnonzero(is_new | took_damage | type_changed | completed).tolist():
+            if is_new[index]:
+                if progress[index] < 1:
+                    if handles_started:
+                        await self.on_building_construction_started(structures[index])
                 else:
                     # Include starting townhall
-                    self._units_created[structure.type_id] += 1
-                    await self.on_building_construction_complete(structure)
-            elif structure.tag in self._structures_previous_map:
-                # Check if a structure took damage this frame and then trigger event
-                previous_frame_structure: Unit = self._structures_previous_map[structure.tag]
-                if (
-                    structure.health < previous_frame_structure.health
-                    or structure.shield < previous_frame_structure.shield
-                ):
-                    damage_amount = (
-                        previous_frame_structure.health - structure.health + previous_frame_structure.shield -
-                        structure.shield
-                    )
-                    await self.on_unit_took_damage(structure, damage_amount)
-                # Check if a structure changed its type
-                if previous_frame_structure.type_id != structure.type_id:
-                    await self.on_unit_type_changed(structure, previous_frame_structure.type_id)
-                # Check if structure completed
-                if structure.build_progress == 1 and previous_frame_structure.build_progress < 1:
-                    self._units_created[structure.type_id] += 1
-                    await self.on_building_construction_complete(structure)
+                    self._units_created[UnitTypeId(int(types[index]))] += 1
+                    if handles_complete:
+                        await self.on_building_construction_complete(structures[index])
+                continue
+            if took_damage[index]:
+                await self.on_unit_took_damage(structures[index], float(damage[index]))
+            if type_changed[index]:
+                await self.on_unit_type_changed(
+                    structures[index], UnitTypeId(int(previous_types[previous_index[index]]))
+                )
+            if completed[index]:
+                self._units_created[UnitTypeId(int(types[index]))] += 1
+                if handles_complete:
+                    await self.on_building_construction_complete(structures[index])
 
     @final
     async def _issue_vision_events(self):
-        # Call events for enemy unit entered vision
-        for enemy_unit in self.enemy_units:
-            if enemy_unit.tag not in self._enemy_units_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_unit)
-        for enemy_structure in self.enemy_structures:
-            if enemy_structure.tag not in self._enemy_structures_previous_map:
-                await self.on_enemy_unit_entered_vision(enemy_structure)
-
-        # Call events for enemy unit left vision
-        enemy_units_left_vision: Set[int] = set(self._enemy_units_previous_map) - self.enemy_units.tags
-        for enemy_unit_tag in enemy_units_left_vision:
-            await self.on_enemy_unit_left_vision(enemy_unit_tag)
-        enemy_structures_left_vision: Set[int] = set(self._enemy_structures_previous_map) - self.enemy_structures.tags
-        for enemy_structure_tag in enemy_structures_left_vision:
-            await self.on_enemy_unit_left_vision(enemy_structure_tag)
+        handles_entered = self._handles_event("on_enemy_unit_entered_vision")
+        handles_left = self._handles_event("on_enemy_unit_left_vision")
+        if not handles_entered and not handles_left:
+            return
+        groups = ("enemy_units", "enemy_structures")
+        currents = [self._event_group(group) for group in groups]
+        diffs = [self._diff_previous(group, current) for group, current in zip(groups, currents)]
+        # Call events for enemy unit entered vision, units before structures
+        if handles_entered:
+            for current, (is_new, _, _) in zip(currents, diffs):
+                for index in np.flatnonzero(is_new).tolist():
+                    await self.on_enemy_unit_entered_vision(current[index])
+        # Call events for enemy unit left vision after all entered events, units before structures
+        if handles_left:
+            for group, (_, _, previous_indices) in zip(groups, diffs):
+                previous_tags = self._event_group(group, previous=True)._state_columns[0]
+                left_vision = np.ones(len(previous_tags), dtype=bool)
+                left_vision[previous_indices] = False
+                for unit_tag in previous_tags[left_vision].tolist():
+                    await self.on_enemy_unit_left_vision(unit_tag)
 
     @final
     async def _issue_unit_dead_events(self):
-        for unit_tag in self.state.dead_units & set(self._all_units_previous_map):
+        if not self.state.dead_units or not self._handles_event("on_unit_destroyed"):
+            return
+        previous_tags = self._event_group("all_units", previous=True)._state_columns[0]
+        dead_tags = np.fromiter(self.state.dead_units, dtype=np.uint64, count=len(self.state.dead_units))
+        for unit_tag in dead_tags[np.isin(dead_tags, previous_tags)].tolist():
             await self.on_unit_destroyed(unit_tag)
 
     # DISTANCE CALCULATION
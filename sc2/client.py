@@ -9,7 +9,7 @@ from s2clientprotocol import raw_pb2 as raw_pb
 from s2clientprotocol import sc2api_pb2 as sc_pb
 from s2clientprotocol import spatial_pb2 as spatial_pb
 
-from sc2.action import combine_actions
+from sc2.action import combine_action_groups, combine_actions
 from sc2.data import ActionResult, ChatChannel, Race, Result, Status
 from sc2.game_data import AbilityData, GameData
 from sc2.game_info import GameInfo
@@ -185,16 +185,26 @@ class Client(Protocol):
         result = await self._execute(game_info=sc_pb.RequestGameInfo())
         return GameInfo(result.game_info)
 
-    async def actions(self, actions, return_successes=False):
+    async def actions(self, actions, return_successes=False, queue=False, grouped=False):
+        """
+        :param actions:
+        :param return_successes:
+        :param queue: Send the actions together with the next request (see Protocol._queue) and return None instead of the action results
+        :param grouped: 'actions' is a list of command groups from action.coalesce_unit_commands
+        """
         if not actions:
             return None
         if not isinstance(actions, list):
             actions = [actions]
+        raw_actions = combine_action_groups(actions) if grouped else combine_actions(actions)
 
+        if queue:
+            self._queue(action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in raw_actions)))
+            return None
         # On realtime=True, might get an error here: sc2.protocol.ProtocolError: ['Not in a game']
         try:
             res = await self._execute(
-                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in combine_actions(actions)))
+                action=sc_pb.RequestAction(actions=(sc_pb.Action(action_raw=a) for a in raw_actions))
             )
         except ProtocolError:
             return []
@@ -577,9 +587,11 @@ class Client(Protocol):
         assert isinstance(p, Point3)
         self._debug_spheres.append(DrawItemSphere(start_point=p, radius=r, color=color))
 
-    async def _send_debug(self):
+    async def _send_debug(self, queue: bool = False):
         """Sends the debug draw execution. This is run by main.py now automatically, if there is any items in the list. You do not need to run this manually any longer.
         Check examples/terran/ramp_wall.py for example drawing. Each draw request needs to be sent again in every single on_step iteration.
+
+        :param queue: Send the draw request together with the next request, see Protocol._queue
         """
         debug_hash = (
             sum(hash(item) for item in self._debug_texts),
@@ -591,27 +603,26 @@ class Client(Protocol):
             if debug_hash != self._debug_hash_tuple_last_iteration:
                 # Something has changed, either more or less is to be drawn, or a position of a drawing changed (e.g. when drawing on a moving unit)
                 self._debug_hash_tuple_last_iteration = debug_hash
-                try:
-                    await self._execute(
-                        debug=sc_pb.RequestDebug(
-                            debug=[
-                                debug_pb.DebugCommand(
-                                    draw=debug_pb.DebugDraw(
-                                        text=[text.to_proto()
-                                              for text in self._debug_texts] if self._debug_texts else None,
-                                        lines=[line.to_proto()
-                                               for line in self._debug_lines] if self._debug_lines else None,
-                                        boxes=[box.to_proto()
-                                               for box in self._debug_boxes] if self._debug_boxes else None,
-                                        spheres=[sphere.to_proto()
-                                                 for sphere in self._debug_spheres] if self._debug_spheres else None,
-                                    )
-                                )
-                            ]
+                request = sc_pb.RequestDebug(
+                    debug=[
+                        debug_pb.DebugCommand(
+                            draw=debug_pb.DebugDraw(
+                                text=[text.to_proto() for text in self._debug_texts] if self._debug_texts else None,
+                                lines=[line.to_proto() for line in self._debug_lines] if self._debug_lines else None,
+                                boxes=[box.to_proto() for box in self._debug_boxes] if self._debug_boxes else None,
+                                spheres=[sphere.to_proto()
+                                         for sphere in self._debug_spheres] if self._debug_spheres else None,
+                            )
                         )
-                    )
-                except ProtocolError:
-                    return
+                    ]
+                )
+                if queue:
+                    self._queue(debug=request)
+                else:
+                    try:
+                        await self._execute(debug=request)
+                    except ProtocolError:
+                        return
             self._debug_draw_last_frame = True
             self._debug_texts.clear()
             self._debug_lines.clear()
@@ -620,13 +631,13 @@ class Client(Protocol):
         elif self._debug_draw_last_frame:
             # Clear drawing if we drew last frame but nothing to draw this frame
             self._debug_hash_tuple_last_iteration = (0, 0, 0, 0)
-            await self._execute(
-                debug=sc_pb.RequestDebug(
-                    debug=[
-                        debug_pb.DebugCommand(draw=debug_pb.DebugDraw(text=None, lines=None, boxes=None, spheres=None))
-                    ]
-                )
+            request = sc_pb.RequestDebug(
+                debug=[debug_pb.DebugCommand(draw=debug_pb.DebugDraw(text=None, lines=None, boxes=None, spheres=None))]
             )
+            if queue:
+                self._queue(debug=request)
+            else:
+                await self._execute(debug=request)
             self._debug_draw_last_frame = False
 
     async def debug_leave(self):
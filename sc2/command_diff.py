@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Counter, Dict, NamedTuple, Optional, Tuple, Union
+
+from sc2.ids.ability_id import AbilityId
+from sc2.position import Point2
+from sc2.unit import Unit
+
+if TYPE_CHECKING:
+    from sc2.unit_command import UnitCommand
+
+
+class CommandPolicy(NamedTuple):
+    """When a command repeats the last command of the same unit and may be left out.
+    distance: the new target point may be this far away from the last sent target point (unit targets have to be the same unit)
+    frames: the command is sent again at the latest this many game loops after it was last sent"""
+
+    distance: float
+    frames: int
+
+
+# About one second for commands that are re-issued every step, see CommandDiff
+DEFAULT_COMMAND_POLICIES: Dict[AbilityId, CommandPolicy] = {
+    AbilityId.MOVE: CommandPolicy(distance=0.5, frames=22),
+    AbilityId.ATTACK: CommandPolicy(distance=0.5, frames=22),
+    AbilityId.SCAN_MOVE: CommandPolicy(distance=0.5, frames=22),
+    AbilityId.PATROL: CommandPolicy(distance=0.5, frames=22),
+    AbilityId.HARVEST_GATHER: CommandPolicy(distance=0, frames=22),
+}
+
+
+class CommandDiff:
+    """Remembers the last command sent to each unit and leaves out commands that repeat it,
+    available as BotAI.command_diff and used by _do_actions if BotAI.diff_commands is set.
+
+    prevent_double_actions only removes a command if its target is exactly the target of the current order,
+    so a bot that calls unit.move(formation_center) or unit.attack(closest_enemy.position) every step with slightly
+    different float targets still sends a new command every step, and every move makes the server path again.
+
+    A command without queue is left out if
+    - its ability has a policy,
+    - the last command sent to the unit had the same ability, no queue and was sent at most policy.frames game loops ago,
+    - the target is the same unit, or a point at most policy.distance away from the last sent point,
+    - and the unit is still executing that ability.
+
+    The last sent target is kept while commands are left out, so a slowly drifting target is sent again once it moved
+    more than policy.distance.
+
+    Example::
+
+        # Allow a bit more slack for moves, never leave out attack commands
+        self.command_diff.policies[AbilityId.MOVE] = CommandPolicy(distance=1, frames=44)
+        del self.command_diff.policies[AbilityId.ATTACK]
+    """
+
+    def __init__(self, policies: Optional[Dict[AbilityId, CommandPolicy]] = None):
+        """
+        :param policies: Defaults to DEFAULT_COMMAND_POLICIES
+        """
+        self.policies: Dict[AbilityId, CommandPolicy] = dict(
+            DEFAULT_COMMAND_POLICIES if policies is None else policies
+        )
+        # Per ability: commands that were let through and commands that were left out
+        self.sent: Counter[AbilityId] = Counter()
+        self.suppressed: Counter[AbilityId] = Counter()
+        # unit tag: (ability, target, game loop) of the last command without queue that was sent to the unit
+        self._last: Dict[int, Tuple[AbilityId, Union[None, Point2, Unit], int]] = {}
+        self._last_pruned: int = 0
+
+    def __repr__(self) -> str:
+        return f"CommandDiff(sent={sum(self.sent.values())}, suppressed={sum(self.suppressed.values())})"
+
+    def keep(self, action: UnitCommand, game_loop: int) -> bool:
+        """Returns False if the command repeats the last command of its unit and is left out, see the class docstring.
+        Commands that are kept are remembered as the last command of the unit.
+
+        :param action:
+        :param game_loop:
+        """
+        tag = action.unit.tag
+        if action.queue:
+            # The unit will have more orders afterwards, the next command without queue has to be sent
+            self._last.pop(tag, None)
+        elif self._repeats_last(action, game_loop):
+            self.suppressed[action.ability] += 1
+            return False
+        else:
+            self._last[tag] = (action.ability, action.target, game_loop)
+        self.sent[action.ability] += 1
+        self._prune(game_loop)
+        return True
+
+    def _repeats_last(self, action: UnitCommand, game_loop: int) -> bool:
+        policy = self.policies.get(action.ability)
+        last = self._last.get(action.unit.tag)
+        if policy is None or last is None:
+            return False
+        ability, target, sent_loop = last
+        if ability != action.ability or game_loop - sent_loop > policy.frames:
+            return False
+        if isinstance(action.target, Unit):
+            if not isinstance(target, Unit) or target.tag != action.target.tag:
+                return False
+        elif isinstance(action.target, Point2):
+            if not isinstance(target, Point2) or action.target.distance_to_point2(target) > policy.distance:
+                return False
+        elif target is not None:
+            return False
+        # The unit finished or dropped the order, e.g. it arrived or its target died
+        orders = action.unit.orders
+        return bool(orders) and action.ability in {orders[0].ability.id, orders[0].ability.exact_id}
+
+    def _prune(self, game_loop: int):
+        """Forgets units that got no command for longer than any policy keeps it, e.g. dead units"""
+        max_frames = max((policy.frames for policy in self.policies.values()), default=0)
+        if game_loop - self._last_pruned <= max_frames:
+            return
+        self._last = {tag: last for tag, last in self._last.items() if game_loop - last[2] <= max_frames}
+        self._last_pruned = game_loop
@@ -328,6 +328,19 @@ COMBINEABLE_ABILITIES: Set[AbilityId] = {
     AbilityId.EFFECT_BLINK,
     AbilityId.MORPH_ARCHON,
 }
+# Abilities that replace all orders of a unit when they are not queued, see action.coalesce_unit_commands
+ORDER_REPLACING_ABILITIES: Set[AbilityId] = {
+    AbilityId.SMART,
+    AbilityId.MOVE,
+    AbilityId.ATTACK,
+    AbilityId.SCAN_MOVE,
+    AbilityId.STOP,
+    AbilityId.HOLDPOSITION,
+    AbilityId.PATROL,
+    AbilityId.HARVEST_GATHER,
+    AbilityId.HARVEST_RETURN,
+    AbilityId.EFFECT_REPAIR,
+}
 FakeEffectRadii: Dict[int, float] = {
     UnitTypeId.KD8CHARGE.value: 2,
     UnitTypeId.PARASITICBOMBDUMMY.value: 3,
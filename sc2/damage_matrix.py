@@ -0,0 +1,251 @@
+# pylint: disable=W0212
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+
+from sc2.constants import DAMAGE_BONUS_PER_UPGRADE, IS_LIGHT, TARGET_AIR, TARGET_GROUND
+from sc2.ids.buff_id import BuffId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+if TYPE_CHECKING:
+    from sc2.bot_ai import BotAI
+
+
+class WeaponProfile(NamedTuple):
+    """ One weapon of a unit type at a given attack upgrade level, upgrades already added to damage and bonus """
+    type: int
+    damage: float
+    attacks: int
+    speed: float
+    range: float
+    bonus: Tuple[Tuple[int, float], ...]
+
+
+def weapon_profiles(bot_object: BotAI, unit: Unit) -> Tuple[WeaponProfile, ...]:
+    """Returns the weapons of the unit with its upgrades applied, see Unit.calculate_damage_vs_target.
+    The profiles only depend on the unit type, the attack upgrade level and blueflame, and are cached in BotAI._weapon_profiles.
+
+    :param bot_object:
+    :param unit:
+    """
+    blueflame = unit.type_id == UnitTypeId.HELLION and UpgradeId.HIGHCAPACITYBARRELS in bot_object.state.upgrades
+    key = (unit._proto.unit_type, unit.attack_upgrade_level, blueflame)
+    profiles = bot_object._weapon_profiles.get(key)
+    if profiles is not None:
+        return profiles
+    level = unit.attack_upgrade_level
+    upgrade_bonus = DAMAGE_BONUS_PER_UPGRADE.get(unit.type_id, {})
+    profiles_list: List[WeaponProfile] = []
+    for weapon in unit._weapons:
+        weapon_bonus = upgrade_bonus.get(weapon.type, {})
+        damage = weapon.damage + level * (weapon_bonus.get(None, 1) if level else 0)
+        bonus: List[Tuple[int, float]] = []
+        for damage_bonus in weapon.damage_bonus:
+            per_upgrade = weapon_bonus.get(damage_bonus.attribute, 0) if level else 0
+            if damage_bonus.attribute == IS_LIGHT and blueflame:
+                per_upgrade += 5
+            bonus.append((damage_bonus.attribute, damage_bonus.bonus + level * per_upgrade))
+        profiles_list.append(
+            WeaponProfile(weapon.type, damage, weapon.attacks, weapon.speed, weapon.range, tuple(bonus))
+        )
+    profiles = tuple(profiles_list)
+    bot_object._weapon_profiles[key] = profiles
+    return profiles
+
+
+def _speed_and_range_modifier(bot_object: BotAI, unit: Unit) -> Tuple[float, float]:
+    """ Returns (attack speed divisor, range bonus) of the unit, the same modifiers as in Unit.calculate_damage_vs_target """
+    upgrades = bot_object.state.upgrades
+    type_id = unit.type_id
+    if type_id == UnitTypeId.ZERGLING and unit.is_mine and UpgradeId.ZERGLINGATTACKSPEED in upgrades:
+        return 1.4, 0
+    if type_id == UnitTypeId.ADEPT and unit.is_mine and UpgradeId.ADEPTPIERCINGATTACK in upgrades:
+        return 1.45, 0
+    if type_id == UnitTypeId.MARINE and BuffId.STIMPACK in unit.buffs:
+        return 1.5, 0
+    if type_id == UnitTypeId.MARAUDER and BuffId.STIMPACKMARAUDER in unit.buffs:
+        return 1.5, 0
+    if type_id == UnitTypeId.HYDRALISK and unit.is_mine and UpgradeId.EVOLVEGROOVEDSPINES in upgrades:
+        return 1, 1
+    if type_id == UnitTypeId.PHOENIX and unit.is_mine and UpgradeId.PHOENIXRANGEUPGRADE in upgrades:
+        return 1, 2
+    if (
+        type_id in {UnitTypeId.PLANETARYFORTRESS, UnitTypeId.MISSILETURRET, UnitTypeId.AUTOTURRET} and unit.is_mine
+        and UpgradeId.HISECAUTOTRACKING in upgrades
+    ):
+        return 1, 1
+    return 1, 0
+
+
+class _TargetColumns:
+    """ Per target numpy columns needed by the damage formula """
+
+    def __init__(self, bot_object: BotAI, targets: Units, ignore_armor: bool):
+        n = len(targets)
+        self._targets = targets
+        self._attributes: Dict[int, np.ndarray] = {}
+        self.health = np.fromiter((unit._proto.health for unit in targets), dtype=float, count=n)
+        self.shield = np.fromiter((unit._proto.shield for unit in targets), dtype=float, count=n)
+        self.is_flying = np.fromiter((unit._proto.is_flying for unit in targets), dtype=bool, count=n)
+        self.is_colossus = np.fromiter(
+            (unit._proto.unit_type == UnitTypeId.COLOSSUS.value for unit in targets), dtype=bool, count=n
+        )
+        if ignore_armor:
+            self.armor = np.zeros(n)
+            self.shield_armor = np.zeros(n)
+            self.guardian_shield = np.zeros(n, dtype=bool)
+            return
+        chitinous_plating = UpgradeId.CHITINOUSPLATING in bot_object.state.upgrades
+        armor: List[float] = []
+        shield_armor: List[float] = []
+        guardian_shield: List[bool] = []
+        for unit in targets:
+            unit_armor = unit.armor + unit.armor_upgrade_level
+            unit_shield_armor = unit.shield_upgrade_level
+            if (
+                chitinous_plating and unit.type_id in {UnitTypeId.ULTRALISK, UnitTypeId.ULTRALISKBURROWED}
+                and unit.is_mine
+            ):
+                unit_armor += 2
+            buffs = unit._proto.buff_ids
+            if BuffId.RAVENSHREDDERMISSILETINT.value in buffs:
+                unit_armor -= 2
+                unit_shield_armor -= 2
+            armor.append(unit_armor)
+            shield_armor.append(unit_shield_armor)
+            guardian_shield.append(BuffId.GUARDIANSHIELD.value in buffs)
+        self.armor = np.array(armor, dtype=float)
+        self.shield_armor = np.array(shield_armor, dtype=float)
+        self.guardian_shield = np.array(guardian_shield, dtype=bool)
+
+    def has_attribute(self, attribute: int) -> np.ndarray:
+        mask = self._attributes.get(attribute)
+        if mask is None:
+            mask = np.fromiter(
+                (attribute in unit._type_data.attributes for unit in self._targets),
+                dtype=bool,
+                count=len(self._targets),
+            )
+            self._attributes[attribute] = mask
+        return mask
+
+    def can_be_hit_by(self, weapon_type: int) -> np.ndarray:
+        """ Colossi can be hit by ground and air weapons """
+        return self.is_colossus | np.where(self.is_flying, weapon_type in TARGET_AIR, weapon_type in TARGET_GROUND)
+
+
+def _weapon_damage(weapon: WeaponProfile, columns: _TargetColumns, include_overkill_damage: bool) -> np.ndarray:
+    """ Damage of one full attack of the weapon against every target, the vectorized weapon loop of Unit.calculate_damage_vs_target """
+    damage = np.full(len(columns.health), float(weapon.damage))
+    if weapon.bonus:
+        best_bonus = np.full(len(damage), -np.inf)
+        for attribute, bonus in weapon.bonus:
+            best_bonus = np.where(columns.has_attribute(attribute), np.maximum(best_bonus, bonus), best_bonus)
+        damage += np.where(np.isfinite(best_bonus), best_bonus, 0)
+    # Guardian shield only reduces the damage of ranged weapons
+    guardian = 2 * columns.guardian_shield if weapon.range >= 2 else 0
+    armor = columns.armor + guardian
+    shield_armor = columns.shield_armor + guardian
+
+    # Attacks are spent on the shield first, the overflow of the last one hits the health
+    shield_hit = np.maximum(0.5, damage - shield_armor)
+    has_shield = columns.shield > 0
+    shield_attacks = np.where(has_shield, np.minimum(weapon.attacks, np.ceil(columns.shield / shield_hit)), 0)
+    shield = columns.shield - shield_attacks * shield_hit
+    remaining_damage = np.where(has_shield & (shield < 0), -shield, 0)
+    shield = np.where(has_shield & (shield < 0), 0, shield)
+    health = columns.health - np.where(remaining_damage > 0, np.maximum(0.5, remaining_damage - armor), 0)
+
+    health_hit = np.maximum(0.5, damage - armor)
+    health_attacks = weapon.attacks - shield_attacks
+    if include_overkill_damage:
+        health = health - health_attacks * health_hit
+    else:
+        health_attacks = np.where(health > 0, np.minimum(health_attacks, np.ceil(health / health_hit)), 0)
+        health = np.maximum(0, health - health_attacks * health_hit)
+        shield = np.maximum(0, shield)
+    return columns.health + columns.shield - health - shield
+
+
+def _attacker_row(bot_object: BotAI, unit: Unit, columns: _TargetColumns,
+                  include_overkill_damage: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ (damage, attack speed, attack range) of one attacker against every target, before speed and range modifiers """
+    m = len(columns.health)
+    damage = np.zeros(m)
+    speed = np.zeros(m)
+    weapon_range = np.zeros(m)
+    if not unit.is_ready:
+        return damage, speed, weapon_range
+    if unit.type_id == UnitTypeId.BATTLECRUISER:
+        # Hard coded, battlecruisers have no weapon in the API
+        guardian = 2 * columns.guardian_shield
+        damage = np.where(columns.is_flying, 5, 8) + unit.attack_upgrade_level - np.where(
+            columns.shield > 0, columns.shield_armor + guardian, columns.armor + guardian
+        )
+        return damage.astype(float), np.full(m, 0.224), np.full(m, 6.0)
+    if unit.type_id == UnitTypeId.BUNKER and unit.is_enemy:
+        # Expect fully loaded bunker with marines
+        if unit.is_active:
+            return np.full(m, 24.0), np.full(m, 0.854), np.full(m, 6.0)
+        return damage, speed, weapon_range
+    found = np.zeros(m, dtype=bool)
+    for weapon in weapon_profiles(bot_object, unit):
+        hits = columns.can_be_hit_by(weapon.type)
+        if not hits.any():
+            continue
+        weapon_damage = _weapon_damage(weapon, columns, include_overkill_damage)
+        # Keep the first weapon with the highest damage, like max() in calculate_damage_vs_target
+        better = hits & (~found | (weapon_damage > damage))
+        damage = np.where(better, weapon_damage, damage)
+        speed = np.where(better, weapon.speed, speed)
+        weapon_range = np.where(better, weapon.range, weapon_range)
+        found |= hits
+    return damage, speed, weapon_range
+
+
+def damage_matrix(
+    bot_object: BotAI,
+    attackers: Units,
+    targets: Units,
+    ignore_armor: bool = False,
+    include_overkill_damage: bool = True,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Returns the (damage, attack speed, attack range) matrices of shape (len(attackers), len(targets)),
+    entry [i, j] equals attackers[i].calculate_damage_vs_target(targets[j], ignore_armor, include_overkill_damage).
+    The armor, shield and bonus math runs as numpy operations over all targets once per distinct attacker
+    (type, attack upgrade level, is_ready), the per-unit speed and range modifiers are applied per row afterwards.
+
+    :param bot_object:
+    :param attackers:
+    :param targets:
+    :param ignore_armor:
+    :param include_overkill_damage:
+    """
+    shape = (len(attackers), len(targets))
+    damage = np.zeros(shape)
+    speed = np.zeros(shape)
+    weapon_range = np.zeros(shape)
+    if not attackers or not targets:
+        return damage, speed, weapon_range
+    columns = _TargetColumns(bot_object, targets, ignore_armor)
+    rows_by_key: Dict[tuple, List[int]] = {}
+    for row, unit in enumerate(attackers):
+        key = (
+            unit._proto.unit_type,
+            unit.attack_upgrade_level,
+            unit.is_ready,
+            unit.type_id == UnitTypeId.BUNKER and unit.is_enemy and unit.is_active,
+        )
+        rows_by_key.setdefault(key, []).append(row)
+    for rows in rows_by_key.values():
+        row_damage, row_speed, row_range = _attacker_row(bot_object, attackers[rows[0]], columns, include_overkill_damage)
+        modifiers = np.array([_speed_and_range_modifier(bot_object, attackers[row]) for row in rows])
+        damage[rows] = row_damage
+        speed[rows] = row_speed[None, :] / modifiers[:, :1]
+        weapon_range[rows] = np.where(row_speed > 0, row_range[None, :] + modifiers[:, 1:], row_range[None, :])
+    return damage, speed, weapon_range
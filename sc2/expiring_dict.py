@@ -1,8 +1,9 @@
 from __future__ import annotations
 
 from collections import OrderedDict
+from contextlib import nullcontext
 from threading import RLock
-from typing import TYPE_CHECKING, Any, Iterable, Union
+from typing import TYPE_CHECKING, Any, Iterable, Optional, Union
 
 if TYPE_CHECKING:
     from sc2.bot_ai import BotAI
@@ -11,6 +12,8 @@ if TYPE_CHECKING:
 class ExpiringDict(OrderedDict):
     """
     An expiring dict that uses the bot.state.game_loop to only return items that are valid for a specific amount of time.
+    Expired items are dropped in bulk from the front of the frame ordered dict whenever it is used, so len() is O(1)
+    and the dict does not grow with items that are never read again.
 
     Example usages::
 
@@ -29,55 +32,70 @@ class ExpiringDict(OrderedDict):
                     print("test is not anymore in dict")
     """
 
-    def __init__(self, bot: BotAI, max_age_frames: int = 1):
+    def __init__(
+        self, bot: BotAI, max_age_frames: int = 1, max_size: Optional[int] = None, thread_safe: bool = False
+    ):
+        """
+        :param bot:
+        :param max_age_frames:
+        :param max_size: If set, the oldest items are dropped when more items are added
+        :param thread_safe: Guard every access with a lock, only needed if the dict is shared with other threads
+        """
         assert max_age_frames >= -1
         assert bot
+        assert max_size is None or max_size > 0
 
         OrderedDict.__init__(self)
         self.bot: BotAI = bot
         self.max_age: Union[int, float] = max_age_frames
-        self.lock: RLock = RLock()
+        self.max_size: Optional[int] = max_size
+        self.lock: Union[RLock, nullcontext] = RLock() if thread_safe else nullcontext()
 
     @property
     def frame(self) -> int:
         return self.bot.state.game_loop
 
+    def _evict(self):
+        """Items are kept in the order they were set, which is also the order of their frames,
+        so all expired items are at the front and are dropped here in bulk. Amortized O(1) per item."""
+        frame = self.frame
+        while OrderedDict.__len__(self):
+            key = next(OrderedDict.__iter__(self))
+            if frame - OrderedDict.__getitem__(self, key)[1] < self.max_age:
+                break
+            OrderedDict.__delitem__(self, key)
+
     def __contains__(self, key) -> bool:
         """ Return True if dict has key, else False, e.g. 'key in dict' """
         with self.lock:
-            if OrderedDict.__contains__(self, key):
-                # Each item is a list of [value, frame time]
-                item = OrderedDict.__getitem__(self, key)
-                if self.frame - item[1] < self.max_age:
-                    return True
-                del self[key]
-        return False
+            self._evict()
+            return OrderedDict.__contains__(self, key)
 
     def __getitem__(self, key, with_age=False) -> Any:
         """ Return the item of the dict using d[key] """
         with self.lock:
-            # Each item is a list of [value, frame time]
+            self._evict()
+            # Each item is a tuple of (value, frame time)
             item = OrderedDict.__getitem__(self, key)
-            if self.frame - item[1] < self.max_age:
-                if with_age:
-                    return item[0], item[1]
-                return item[0]
-            OrderedDict.__delitem__(self, key)
-        raise KeyError(key)
+            if with_age:
+                return item[0], item[1]
+            return item[0]
 
     def __setitem__(self, key, value):
         """ Set d[key] = value """
         with self.lock:
+            self._evict()
             OrderedDict.__setitem__(self, key, (value, self.frame))
+            # Keep the items ordered by frame
+            self.move_to_end(key)
+            if self.max_size is not None and OrderedDict.__len__(self) > self.max_size:
+                self.popitem(last=False)
 
     def __repr__(self):
         """ Printable version of the dict instead of getting memory adress """
-        print_list = []
         with self.lock:
-            for key, value in OrderedDict.items(self):
-                if self.frame - value[1] < self.max_age:
-                    print_list.append(f"{repr(key)}: {repr(value)}")
-        print_str = ", ".join(print_list)
+            self._evict()
+            print_str = ", ".join(f"{repr(key)}: {repr(value)}" for key, value in OrderedDict.items(self))
         return f"ExpiringDict({print_str})"
 
     def __str__(self):
@@ -85,30 +103,24 @@ class ExpiringDict(OrderedDict):
 
     def __iter__(self):
         """ Override 'for key in dict:' """
-        with self.lock:
-            return self.keys()
+        return self.keys()
 
-    # TODO find a way to improve len
     def __len__(self):
-        """Override len method as key value pairs aren't instantly being deleted, but only on __get__(item).
-        This function is slow because it has to check if each element is not expired yet."""
+        """ Number of items that are not expired yet """
         with self.lock:
-            count = 0
-            for _ in self.values():
-                count += 1
-            return count
+            self._evict()
+            return OrderedDict.__len__(self)
 
     def pop(self, key, default=None, with_age=False):
         """ Return the item and remove it """
         with self.lock:
+            self._evict()
             if OrderedDict.__contains__(self, key):
                 item = OrderedDict.__getitem__(self, key)
-                if self.frame - item[1] < self.max_age:
-                    del self[key]
-                    if with_age:
-                        return item[0], item[1]
-                    return item[0]
-                del self[key]
+                OrderedDict.__delitem__(self, key)
+                if with_age:
+                    return item[0], item[1]
+                return item[0]
             if default is None:
                 raise KeyError(key)
             if with_age:
@@ -118,18 +130,17 @@ class ExpiringDict(OrderedDict):
     def get(self, key, default=None, with_age=False):
         """ Return the value for key if key is in dict, else default """
         with self.lock:
+            self._evict()
             if OrderedDict.__contains__(self, key):
                 item = OrderedDict.__getitem__(self, key)
-                if self.frame - item[1] < self.max_age:
-                    if with_age:
-                        return item[0], item[1]
-                    return item[0]
+                if with_age:
+                    return item[0], item[1]
+                return item[0]
             if default is None:
                 raise KeyError(key)
             if with_age:
                 return default, self.frame
             return None
-        return None
 
     def update(self, other_dict: dict):
         with self.lock:
@@ -139,20 +150,20 @@ class ExpiringDict(OrderedDict):
     def items(self) -> Iterable:
         """ Return iterator of zipped list [keys, values] """
         with self.lock:
-            for key, value in OrderedDict.items(self):
-                if self.frame - value[1] < self.max_age:
-                    yield key, value[0]
+            self._evict()
+            items = [(key, value[0]) for key, value in OrderedDict.items(self)]
+        return iter(items)
 
     def keys(self) -> Iterable:
         """ Return iterator of keys """
         with self.lock:
-            for key, value in OrderedDict.items(self):
-                if self.frame - value[1] < self.max_age:
-                    yield key
+            self._evict()
+            keys = list(OrderedDict.keys(self))
+        return iter(keys)
 
     def values(self) -> Iterable:
         """ Return iterator of values """
         with self.lock:
-            for value in OrderedDict.values(self):
-                if self.frame - value[1] < self.max_age:
-                    yield value[0]
+            self._evict()
+            values = [value[0] for value in OrderedDict.values(self)]
+        return iter(values)
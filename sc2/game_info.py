@@ -1,17 +1,21 @@
 from __future__ import annotations
 
 import heapq
-from collections import deque
+import warnings
 from dataclasses import dataclass
 from functools import cached_property
-from typing import Deque, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple, Union
 
 import numpy as np
 
-from sc2.pixel_map import PixelMap
+from sc2.pixel_map import PixelMap, groups_of_labels, label_groups
 from sc2.player import Player, Race
 from sc2.position import Point2, Rect, Size
 
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy import ndimage
+
 
 @dataclass
 class Ramp:
@@ -216,6 +220,36 @@ class Ramp:
         return sorted_depots[0].negative_offset(direction)
 
 
+@dataclass(eq=False)
+class Region:
+    """ A connected area of walkable cells, see GameInfo.regions """
+    index: int
+    game_info: GameInfo
+    size: int
+    center: Point2
+    height: float
+
+    @cached_property
+    def points(self) -> FrozenSet[Point2]:
+        ys, xs = np.nonzero(self.game_info.region_labels == self.index + 1)
+        return frozenset(Point2((x, y)) for x, y in zip(xs.tolist(), ys.tolist()))
+
+    @cached_property
+    def ramps(self) -> List[Ramp]:
+        """ Ramps that touch this region """
+        return [ramp for ramp in self.game_info.map_ramps or [] if self in self.game_info.ramp_regions(ramp)]
+
+    @cached_property
+    def neighbours(self) -> List[Region]:
+        """ Regions reachable from this region over one ramp """
+        indices = {region.index for ramp in self.ramps for region in self.game_info.ramp_regions(ramp)}
+        indices.discard(self.index)
+        return [self.game_info.regions[index] for index in sorted(indices)]
+
+    def __contains__(self, point: Union[Point2, Tuple[float, float]]) -> bool:
+        return self.game_info.region_at(point) is self
+
+
 class GameInfo:
 
     def __init__(self, proto):
@@ -234,6 +268,7 @@ class GameInfo:
         self.playable_area = Rect.from_proto(self._proto.start_raw.playable_area)
         self.map_center = self.playable_area.center
         self.map_ramps: List[Ramp] = None  # Filled later by BotAI._prepare_first_step
+        self._ramp_labels: np.ndarray = None  # Filled together with map_ramps, the ramp points labeled by connected group
         self.vision_blockers: FrozenSet[Point2] = None  # Filled later by BotAI._prepare_first_step
         self.player_races: Dict[int, Race] = {
             p.player_id: p.race_actual or p.race_requested
@@ -244,72 +279,136 @@ class GameInfo:
         ]
         self.player_start_location: Point2 = None  # Filled later by BotAI._prepare_first_step
 
+    @cached_property
+    def _playable_mask(self) -> np.ndarray:
+        """ Boolean (height, width) array of the cells inside the playable area """
+        area = self.playable_area
+        mask = np.zeros((self.map_size.height, self.map_size.width), dtype=bool)
+        mask[int(area.y):int(area.y + area.height), int(area.x):int(area.x + area.width)] = True
+        return mask
+
+    @cached_property
+    def _walkable_mask(self) -> np.ndarray:
+        """Pathable or placeable cells of the playable area. Taken when first used (at the latest by
+        _find_ramps_and_vision_blockers in the first step), later pathing grid refreshes don't change it."""
+        return ((self.pathing_grid.data_numpy == 1) | (self.placement_grid.data_numpy == 1)) & self._playable_mask
+
     def _find_ramps_and_vision_blockers(self) -> Tuple[List[Ramp], FrozenSet[Point2]]:
         """Calculate points that are pathable but not placeable.
         Then divide them into ramp points if not all points around the points are equal height
         and into vision blockers if they are."""
-
-        def equal_height_around(tile):
-            # mask to slice array 1 around tile
-            sliced = self.terrain_height.data_numpy[tile[1] - 1:tile[1] + 2, tile[0] - 1:tile[0] + 2]
-            return len(np.unique(sliced)) == 1
-
-        map_area = self.playable_area
+        heights = self.terrain_height.data_numpy
+        # Take the walkable cells for the regions before structures change the pathing grid
+        _ = self._walkable_mask
         # all points in the playable area that are pathable but not placable
-        points = [
-            Point2((a, b)) for (b, a), value in np.ndenumerate(self.pathing_grid.data_numpy)
-            if value == 1 and map_area.x <= a < map_area.x + map_area.width and map_area.y <= b < map_area.y +
-            map_area.height and self.placement_grid[(a, b)] == 0
-        ]
-        # divide points into ramp points and vision blockers
-        ramp_points = [point for point in points if not equal_height_around(point)]
-        vision_blockers = frozenset(point for point in points if equal_height_around(point))
-        ramps = [Ramp(group, self) for group in self._find_groups(ramp_points)]
+        points = (self.pathing_grid.data_numpy == 1) & (self.placement_grid.data_numpy == 0) & self._playable_mask
+        # divide points into ramp points and vision blockers by the height difference in the 3x3 block around them
+        uneven = ndimage.maximum_filter(heights, size=3, mode="nearest") != ndimage.minimum_filter(
+            heights, size=3, mode="nearest"
+        )
+        self._ramp_labels, amount = label_groups(points & uneven)
+        ramps = [Ramp(group, self) for group in groups_of_labels(self._ramp_labels, amount, minimum_size=8)]
+        ys, xs = np.nonzero(points & ~uneven)
+        vision_blockers = frozenset(Point2((x, y)) for x, y in zip(xs.tolist(), ys.tolist()))
         return ramps, vision_blockers
 
-    def _find_groups(self, points: FrozenSet[Point2], minimum_points_per_group: int = 8) -> Iterable[FrozenSet[Point2]]:
+    def _find_groups(self,
+                     points: Union[np.ndarray, Iterable[Point2]],
+                     minimum_points_per_group: int = 8) -> Iterable[FrozenSet[Point2]]:
         """
-        From a set of points, this function will try to group points together by
-        painting clusters of points in a rectangular map using flood fill algorithm.
+        From a set of points (or a boolean (height, width) mask), this function will group points together
+        that touch each other, including diagonally, by connected component labeling.
         Returns groups of points as list, like [{p1, p2, p3}, {p4, p5, p6, p7, p8}]
         """
-        # TODO do we actually need colors here? the ramps will never touch anyways.
-        NOT_COLORED_YET = -1
-        map_width = self.pathing_grid.width
-        map_height = self.pathing_grid.height
-        current_color: int = NOT_COLORED_YET
-        picture: List[List[int]] = [[-2 for _ in range(map_width)] for _ in range(map_height)]
-
-        def paint(pt: Point2) -> None:
-            picture[pt.y][pt.x] = current_color
-
-        nearby: List[Tuple[int, int]] = [(a, b) for a in [-1, 0, 1] for b in [-1, 0, 1] if a != 0 or b != 0]
-
-        remaining: Set[Point2] = set(points)
-        for point in remaining:
-            paint(point)
-        current_color = 1
-        queue: Deque[Point2] = deque()
-        while remaining:
-            current_group: Set[Point2] = set()
-            if not queue:
-                start = remaining.pop()
-                paint(start)
-                queue.append(start)
-                current_group.add(start)
-            while queue:
-                base: Point2 = queue.popleft()
-                for offset in nearby:
-                    px, py = base.x + offset[0], base.y + offset[1]
-                    # Do we ever reach out of map bounds?
-                    if not (0 <= px < map_width and 0 <= py < map_height):
-                        continue
-                    if picture[py][px] != NOT_COLORED_YET:
-                        continue
-                    point: Point2 = Point2((px, py))
-                    remaining.discard(point)
-                    paint(point)
-                    queue.append(point)
-                    current_group.add(point)
-            if len(current_group) >= minimum_points_per_group:
-                yield frozenset(current_group)
+        if not isinstance(points, np.ndarray):
+            mask = np.zeros((self.pathing_grid.height, self.pathing_grid.width), dtype=bool)
+            for point in points:
+                mask[point[1], point[0]] = True
+            points = mask
+        labels, amount = label_groups(points)
+        return groups_of_labels(labels, amount, minimum_size=minimum_points_per_group)
+
+    @cached_property
+    def region_labels(self) -> np.ndarray:
+        """(height, width) array with the index + 1 of the region of each cell in self.regions, 0 for cells outside of any region.
+        Regions are the connected areas of walkable (pathable or placeable) cells of the playable area, separated by ramps and cliffs.
+        Uses the grids of game start, so structures built later don't split regions."""
+        walkable = self._walkable_mask
+        if self.map_ramps is not None:
+            walkable = walkable & (self._ramp_labels == 0)
+        labels, _ = label_groups(walkable)
+        return labels
+
+    @cached_property
+    def regions(self) -> List[Region]:
+        """All regions of the map, see region_labels.
+
+        Example::
+
+            my_region = self.game_info.region_at(self.start_location)
+            for ramp in my_region.ramps:
+                ...
+        """
+        labels = self.region_labels
+        amount = int(labels.max())
+        if not amount:
+            return []
+        ys, xs = np.nonzero(labels)
+        cell_labels = labels[ys, xs]
+        sizes = np.bincount(cell_labels, minlength=amount + 1)[1:]
+        center_x = np.bincount(cell_labels, weights=xs + 0.5, minlength=amount + 1)[1:] / sizes
+        center_y = np.bincount(cell_labels, weights=ys + 0.5, minlength=amount + 1)[1:] / sizes
+        heights = np.bincount(
+            cell_labels, weights=self.terrain_height.data_numpy[ys, xs], minlength=amount + 1
+        )[1:] / sizes
+        return [
+            Region(index, self, int(sizes[index]), Point2((center_x[index], center_y[index])), float(heights[index]))
+            for index in range(amount)
+        ]
+
+    @cached_property
+    def _ramp_regions(self) -> Dict[int, FrozenSet[int]]:
+        """ {ramp label: indices of the regions the ramp touches}, found by shifting the ramp labels onto the region labels """
+        if self.map_ramps is None:
+            return {}
+        ramp_labels = self._ramp_labels
+        region_labels = self.region_labels
+        height, width = ramp_labels.shape
+        pairs = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                if dx == 0 and dy == 0:
+                    continue
+                ramps = ramp_labels[max(0, dy):height + min(0, dy), max(0, dx):width + min(0, dx)]
+                regions = region_labels[max(0, -dy):height + min(0, -dy), max(0, -dx):width + min(0, -dx)]
+                touching = (ramps > 0) & (regions > 0)
+                pairs.append(np.stack((ramps[touching], regions[touching]), axis=1))
+        result: Dict[int, Set[int]] = {}
+        for ramp_label, region_label in np.unique(np.concatenate(pairs), axis=0).tolist():
+            result.setdefault(ramp_label, set()).add(region_label - 1)
+        return {ramp_label: frozenset(indices) for ramp_label, indices in result.items()}
+
+    def ramp_regions(self, ramp: Ramp) -> List[Region]:
+        """Regions connected by the ramp, usually the upper and the lower one.
+
+        :param ramp:
+        """
+        point = next(iter(ramp.points))
+        indices = self._ramp_regions.get(int(self._ramp_labels[point[1], point[0]]), frozenset())
+        return [self.regions[index] for index in sorted(indices)]
+
+    @cached_property
+    def chokes(self) -> List[Ramp]:
+        """ Ramps that connect at least two regions """
+        return [ramp for ramp in self.map_ramps or [] if len(self.ramp_regions(ramp)) >= 2]
+
+    def region_at(self, point: Union[Point2, Tuple[float, float]]) -> Optional[Region]:
+        """Returns the region that contains the point, or None (ramps, cliffs, outside of the playable area).
+
+        :param point:
+        """
+        x, y = int(point[0]), int(point[1])
+        if not (0 <= x < self.map_size.width and 0 <= y < self.map_size.height):
+            return None
+        label = self.region_labels[y, x]
+        return self.regions[label - 1] if label else None
@@ -194,6 +194,12 @@ class ActionError(AbilityLookupTemplateClass):
 
 
 class GameState:
+    """Observation of one frame, available as BotAI.state.
+    Fields that need a conversion of the observation (psionic_matrix, score, upgrades, visibility, creep, effects)
+    are computed on first access and then cached for the frame, see prefetch()."""
+
+    # Fields computed on first access
+    LAZY_FIELDS = ("psionic_matrix", "score", "upgrades", "visibility", "creep", "effects")
 
     def __init__(self, response_observation, previous_observation=None):
         """
@@ -210,29 +216,60 @@ class GameState:
         self.player_result = response_observation.player_result
         self.common: Common = Common(self.observation.player_common)
 
-        # Area covered by Pylons and Warpprisms
-        self.psionic_matrix: PsionicMatrix = PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
         # 22.4 per second on faster game speed
         self.game_loop: int = self.observation.game_loop
-
-        # https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31
-        self.score: ScoreDetails = ScoreDetails(self.observation.score)
         self.abilities = self.observation.abilities  # abilities of selected units
-        self.upgrades: Set[UpgradeId] = {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
-
-        # self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible
-        self.visibility: PixelMap = PixelMap(self.observation_raw.map_state.visibility)
-        # self.creep[point]: 0=No creep, 1=creep
-        self.creep: PixelMap = PixelMap(self.observation_raw.map_state.creep, in_bits=True)
-
-        # Effects like ravager bile shot, lurker attack, everything in effect_id.py
-        self.effects: Set[EffectData] = {EffectData(effect) for effect in self.observation_raw.effects}
-        """ Usage:
-        for effect in self.state.effects:
-            if effect.id == EffectId.RAVAGERCORROSIVEBILECP:
-                positions = effect.positions
-                # dodge the ravager biles
+
+    def prefetch(self, *fields: str):
+        """Computes the given lazy fields now instead of on first access, all of LAZY_FIELDS if none are given.
+
+        Example::
+
+            # Pay for the maps before on_step starts
+            self.state.prefetch("visibility", "creep")
+
+        :param fields:
+        """
+        for field in fields or self.LAZY_FIELDS:
+            assert field in self.LAZY_FIELDS, f"{field} is not one of {self.LAZY_FIELDS}"
+            getattr(self, field)
+
+    @cached_property
+    def psionic_matrix(self) -> PsionicMatrix:
+        """ Area covered by Pylons and Warpprisms """
+        return PsionicMatrix.from_proto(self.observation_raw.player.power_sources)
+
+    @cached_property
+    def score(self) -> ScoreDetails:
+        """ https://github.com/Blizzard/s2client-proto/blob/33f0ecf615aa06ca845ffe4739ef3133f37265a9/s2clientprotocol/score.proto#L31 """
+        return ScoreDetails(self.observation.score)
+
+    @cached_property
+    def upgrades(self) -> Set[UpgradeId]:
+        return {UpgradeId(upgrade) for upgrade in self.observation_raw.player.upgrade_ids}
+
+    @cached_property
+    def visibility(self) -> PixelMap:
+        """ self.visibility[point]: 0=Hidden, 1=Fogged, 2=Visible """
+        return PixelMap(self.observation_raw.map_state.visibility)
+
+    @cached_property
+    def creep(self) -> PixelMap:
+        """ self.creep[point]: 0=No creep, 1=creep """
+        return PixelMap(self.observation_raw.map_state.creep, in_bits=True)
+
+    @cached_property
+    def effects(self) -> Set[EffectData]:
+        """Effects like ravager bile shot, lurker attack, everything in effect_id.py
+
+        Usage::
+
+            for effect in self.state.effects:
+                if effect.id == EffectId.RAVAGERCORROSIVEBILECP:
+                    positions = effect.positions
+                    # dodge the ravager biles
         """
+        return {EffectData(effect) for effect in self.observation_raw.effects}
 
     @cached_property
     def dead_units(self) -> Set[int]:
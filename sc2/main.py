@@ -128,7 +128,7 @@ async def _play_game_ai(
             await ai.on_end(client._game_result[player_id])
             return client._game_result[player_id]
         gs = GameState(state.observation)
-        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        proto_game_info = await ai._game_info_for_step(gs)
         try:
             ai._prepare_step(gs, proto_game_info)
             await ai.on_before_start()
@@ -185,12 +185,12 @@ async def _play_game_ai(
             return client._game_result[player_id]
         gs = GameState(state.observation, previous_state_observation)
         previous_state_observation = None
-        logger.debug(f"Score: {gs.score.score}")
+        logger.opt(lazy=True).debug("Score: {}", lambda: gs.score.score)
 
         if game_time_limit and gs.game_loop / 22.4 > game_time_limit:
             await ai.on_end(Result.Tie)
             return Result.Tie
-        proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+        proto_game_info = await ai._game_info_for_step(gs)
         ai._prepare_step(gs, proto_game_info)
 
         await run_bot_iteration(iteration)  # Main bot loop
@@ -201,7 +201,7 @@ async def _play_game_ai(
                 return client._game_result[player_id]
 
             # TODO: In bot vs bot, if the other bot ends the game, this bot gets stuck in requesting an observation when using main.py:run_multiple_games
-            await client.step()
+            await client.step(ai.next_game_step())
     return Result.Undecided
 
 
@@ -251,7 +251,7 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
         await ai.on_end(client._game_result[player_id])
         return client._game_result[player_id]
     gs = GameState(state.observation)
-    proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+    proto_game_info = await ai._game_info_for_step(gs)
     ai._prepare_step(gs, proto_game_info)
     ai._prepare_first_step()
     try:
@@ -280,9 +280,9 @@ async def _play_replay(client, ai, realtime=False, player_id=0):
                     return client._game_result[player_id]
                 return client._game_result[player_id]
             gs = GameState(state.observation)
-            logger.debug(f"Score: {gs.score.score}")
+            logger.opt(lazy=True).debug("Score: {}", lambda: gs.score.score)
 
-            proto_game_info = await client._execute(game_info=sc_pb.RequestGameInfo())
+            proto_game_info = await ai._game_info_for_step(gs)
             ai._prepare_step(gs, proto_game_info)
 
         logger.debug(f"Running AI step, it={iteration} {gs.game_loop * 0.725 * (1 / 16):.2f}s")
@@ -738,27 +738,7 @@ async def a_run_multiple_games_nokill(matches: List[GameMatch]) -> List[Dict[Abs
     controllers = []
     for m in matches:
         logger.info(f"Starting match {1 + len(results)} / {len(matches)}: {m}")
-        result = None
-        try:
-            await maintain_SCII_count(m.needed_sc2_count, controllers, m.sc2_config)
-            result = await run_match(controllers, m, close_ws=False)
-        except SystemExit as e:
-            logger.critical(f"Game sys.exit'ed as {e} during match {m}")
-        except Exception as e:
-            logger.exception(f"Caught unknown exception: {e}")
-            logger.info(f"Exception {e} thrown in match {m}")
-        finally:
-            for c in controllers:
-                try:
-                    await c.ping()
-                    if c._status != Status.launched:
-                        await c._execute(leave_game=sc_pb.RequestLeaveGame())
-                except Exception as e:
-                    logger.exception(f"Caught unknown exception: {e}")
-                    if not (isinstance(e, ProtocolError) and e.is_game_over_error):
-                        logger.info(f"controller {c.__dict__} threw {e}")
-
-            results.append(result)
+        results.append(await a_run_match_nokill(controllers, m))
 
     # Fire the killswitch manually, instead of letting the winning player fire it.
     await asyncio.wait_for(asyncio.gather(*(c._process._close_connection() for c in controllers)), timeout=50)
@@ -766,3 +746,33 @@ async def a_run_multiple_games_nokill(matches: List[GameMatch]) -> List[Dict[Abs
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
     return results
+
+
+# TODO Catching too general exception Exception (broad-except)
+# pylint: disable=W0703
+async def a_run_match_nokill(controllers: List[Controller], match: GameMatch) -> Optional[Dict[AbstractPlayer, Result]]:
+    """Run a single match on the given controllers and leave them alive afterwards.
+    The list of controllers is topped up (or trimmed) to the amount the match needs,
+    so the same list can be fed match after match to keep a warm pool of SCII processes.
+    Returns None if the match crashed.
+    """
+    result = None
+    try:
+        await maintain_SCII_count(match.needed_sc2_count, controllers, match.sc2_config)
+        result = await run_match(controllers, match, close_ws=False)
+    except SystemExit as e:
+        logger.critical(f"Game sys.exit'ed as {e} during match {match}")
+    except Exception as e:
+        logger.exception(f"Caught unknown exception: {e}")
+        logger.info(f"Exception {e} thrown in match {match}")
+    finally:
+        for c in controllers:
+            try:
+                await c.ping()
+                if c._status != Status.launched:
+                    await c._execute(leave_game=sc_pb.RequestLeaveGame())
+            except Exception as e:
+                logger.exception(f"Caught unknown exception: {e}")
+                if not (isinstance(e, ProtocolError) and e.is_game_over_error):
+                    logger.info(f"controller {c.__dict__} threw {e}")
+    return result
@@ -1,3 +1,4 @@
+import warnings
 from pathlib import Path
 from typing import Callable, FrozenSet, List, Set, Tuple, Union
 
@@ -5,6 +6,41 @@ import numpy as np
 
 from sc2.position import Point2
 
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy import ndimage
+
+# Pixels touching at an edge or a corner belong to the same group, like the 8 neighbours of the old flood fill
+EIGHT_CONNECTIVITY = np.ones((3, 3), dtype=bool)
+
+
+def label_groups(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Connected component labeling of a boolean (height, width) mask with 8-connectivity.
+    Returns (labels, amount), labels is 0 outside of the mask and 1..amount for the groups.
+
+    :param mask:
+    """
+    return ndimage.label(mask, structure=EIGHT_CONNECTIVITY)
+
+
+def groups_of_labels(labels: np.ndarray, amount: int, minimum_size: int = 1) -> List[FrozenSet[Point2]]:
+    """Returns the points of each label 1..amount in label order, skipping groups smaller than minimum_size.
+
+    :param labels:
+    :param amount:
+    :param minimum_size:
+    """
+    ys, xs = np.nonzero(labels)
+    group_labels = labels[ys, xs]
+    order = np.argsort(group_labels, kind="stable")
+    bounds = np.searchsorted(group_labels[order], np.arange(1, amount + 2))
+    xs, ys = xs[order].tolist(), ys[order].tolist()
+    return [
+        frozenset(Point2((x, y)) for x, y in zip(xs[start:end], ys[start:end]))
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end - start >= minimum_size
+    ]
+
 
 class PixelMap:
 
@@ -66,36 +102,28 @@ class PixelMap:
     def copy(self) -> "PixelMap":
         return PixelMap(self._proto, in_bits=self._in_bits)
 
-    def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
-        nodes: Set[Point2] = set()
-        queue: List[Point2] = [start_point]
-
-        while queue:
-            x, y = queue.pop()
+    def mask(self, pred: Callable[[int], bool]) -> np.ndarray:
+        """Boolean (height, width) array of the pixels whose value satisfies pred. pred is called once per distinct value.
 
-            if not (0 <= x < self.width and 0 <= y < self.height):
-                continue
-
-            if Point2((x, y)) in nodes:
-                continue
+        :param pred:
+        """
+        values = np.unique(self.data_numpy)
+        return np.isin(self.data_numpy, [value for value in values if pred(int(value))])
 
-            if pred(self[x, y]):
-                nodes.add(Point2((x, y)))
-                queue += [Point2((x + a, y + b)) for a in [-1, 0, 1] for b in [-1, 0, 1] if not (a == 0 and b == 0)]
-        return nodes
+    def flood_fill(self, start_point: Point2, pred: Callable[[int], bool]) -> Set[Point2]:
+        x, y = int(start_point[0]), int(start_point[1])
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return set()
+        labels, _ = label_groups(self.mask(pred))
+        label = labels[y, x]
+        if not label:
+            return set()
+        ys, xs = np.nonzero(labels == label)
+        return {Point2((px, py)) for px, py in zip(xs.tolist(), ys.tolist())}
 
     def flood_fill_all(self, pred: Callable[[int], bool]) -> Set[FrozenSet[Point2]]:
-        groups: Set[FrozenSet[Point2]] = set()
-
-        for x in range(self.width):
-            for y in range(self.height):
-                if any((x, y) in g for g in groups):
-                    continue
-
-                if pred(self[x, y]):
-                    groups.add(frozenset(self.flood_fill(Point2((x, y)), pred)))
-
-        return groups
+        labels, amount = label_groups(self.mask(pred))
+        return set(groups_of_labels(labels, amount))
 
     def print(self, wide: bool = False) -> None:
         for y in range(self.height):
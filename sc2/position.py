@@ -3,11 +3,18 @@ from __future__ import annotations
 import itertools
 import math
 import random
-from typing import TYPE_CHECKING, Iterable, List, Set, Tuple, Union
+import warnings
+from typing import TYPE_CHECKING, Iterable, List, Optional, Set, Tuple, Union
 
+import numpy as np
 from s2clientprotocol import common_pb2 as common_pb
 
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy import ndimage
+
 if TYPE_CHECKING:
+    from sc2.pixel_map import PixelMap
     from sc2.unit import Unit
     from sc2.units import Units
 
@@ -421,3 +428,232 @@ class Rect(tuple):
 
     def offset(self, p):
         return self.__class__((self[0] + p[0], self[1] + p[1], self[2], self[3]))
+
+
+PointsLike = Union["Points", Point2, Tuple[float, float], "Unit"]
+
+
+class Points:
+    """Array-backed group of 2d points, stored as an (n, 2) float array in self.array.
+    Companion of Point2 for batch geometry: every operation works on all points in one numpy call
+    instead of creating one Point2 tuple per point. Iterating or indexing with an int returns Point2 objects.
+
+    Arguments of the operations can be a single point (Point2, tuple or Unit), which applies to all points,
+    or another Points object of the same length, which applies pairwise.
+
+    Example::
+
+        # 8 marines per row, 1.2 apart, the first row facing the enemy
+        direction = self.enemy_units.center - base
+        grid = Points.grid(columns=8, rows=3, spacing=1.2).rotate(math.atan2(direction.y, direction.x) - math.pi / 2)
+        for marine, position in zip(marines, grid + base):
+            marine.move(position)
+    """
+
+    __slots__ = ("array", )
+
+    def __init__(self, points: Union[np.ndarray, Iterable[Tuple[float, float]], Points] = ()):
+        """
+        :param points: (n, 2) array or iterable of Point2 or (x, y) tuples
+        """
+        if isinstance(points, Points):
+            points = points.array
+        elif not isinstance(points, np.ndarray):
+            points = [(p[0], p[1]) for p in points]
+        self.array: np.ndarray = np.asarray(points, dtype=float).reshape(-1, 2)
+
+    @classmethod
+    def from_units(cls, units: Units) -> Points:
+        """Positions of the units, shares the cached position array of Units.
+
+        :param units:
+        """
+        return cls(units._positions)
+
+    @classmethod
+    def grid(cls, columns: int, rows: int = 1, spacing: Union[float, Tuple[float, float]] = 1) -> Points:
+        """Row by row grid of columns * rows offsets centered on (0, 0), the first row at y = 0 and the others behind it (negative y).
+
+        :param columns:
+        :param rows:
+        :param spacing: distance between columns, or (column distance, row distance)
+        """
+        dx, dy = spacing if isinstance(spacing, tuple) else (spacing, spacing)
+        xs = (np.arange(columns) - (columns - 1) / 2) * dx
+        ys = -np.arange(rows) * dy
+        return cls(np.stack(np.meshgrid(xs, ys), axis=-1).reshape(-1, 2))
+
+    @staticmethod
+    def _operand(other: PointsLike) -> np.ndarray:
+        if isinstance(other, Points):
+            return other.array
+        if isinstance(other, np.ndarray):
+            return other
+        if isinstance(other, (int, float)):
+            return np.array((other, other), dtype=float)
+        if not isinstance(other, (tuple, list)):
+            # Unit
+            other = other.position
+        return np.array((other[0], other[1]), dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.array)
+
+    def __bool__(self) -> bool:
+        return len(self.array) > 0
+
+    def __iter__(self):
+        return (Point2(xy) for xy in self.array.tolist())
+
+    def __getitem__(self, item) -> Union[Point2, Points]:
+        """ An int returns a Point2, a slice, index array or boolean mask returns Points """
+        if isinstance(item, (int, np.integer)):
+            return Point2(self.array[item].tolist())
+        return Points(self.array[item])
+
+    def __repr__(self) -> str:
+        return f"Points({self.array.tolist()})"
+
+    def to_list(self) -> List[Point2]:
+        return list(self)
+
+    @property
+    def x(self) -> np.ndarray:
+        return self.array[:, 0]
+
+    @property
+    def y(self) -> np.ndarray:
+        return self.array[:, 1]
+
+    @property
+    def center(self) -> Point2:
+        """ Mean of all points """
+        assert self, "Points is empty"
+        return Point2(self.array.mean(axis=0).tolist())
+
+    def __add__(self, other: PointsLike) -> Points:
+        return Points(self.array + self._operand(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other: PointsLike) -> Points:
+        return Points(self.array - self._operand(other))
+
+    def __rsub__(self, other: PointsLike) -> Points:
+        return Points(self._operand(other) - self.array)
+
+    def __mul__(self, other: Union[int, float, PointsLike]) -> Points:
+        return Points(self.array * self._operand(other))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other: Union[int, float, PointsLike]) -> Points:
+        return Points(self.array / self._operand(other))
+
+    def __neg__(self) -> Points:
+        return Points(-self.array)
+
+    def offset(self, p: PointsLike) -> Points:
+        """
+        :param p:
+        """
+        return self + p
+
+    def distance_to(self, p: PointsLike) -> np.ndarray:
+        """Distances of all points to the point, or pairwise to the points of another Points object.
+
+        :param p:
+        """
+        difference = self.array - self._operand(p)
+        return np.hypot(difference[:, 0], difference[:, 1])
+
+    def distance_matrix(self, other: Union[Points, Units]) -> np.ndarray:
+        """(len(self), len(other)) array of the distances between all points and all other points or units.
+
+        :param other:
+        """
+        other_array = other.array if isinstance(other, Points) else other._positions
+        difference = self.array[:, None, :] - other_array[None, :, :]
+        return np.hypot(difference[..., 0], difference[..., 1])
+
+    def towards(self, p: PointsLike, distance: Union[float, np.ndarray] = 1, limit: bool = False) -> Points:
+        """Moves every point 'distance' towards the point (or the paired point), like Point2.towards.
+        Points that are equal to their target stay where they are.
+
+        :param p:
+        :param distance:
+        :param limit: Don't move further than the target
+        """
+        difference = self._operand(p) - self.array
+        d = np.hypot(difference[:, 0], difference[:, 1])
+        distance = np.broadcast_to(np.asarray(distance, dtype=float), d.shape)
+        if limit:
+            distance = np.minimum(d, distance)
+        scale = np.divide(distance, d, out=np.zeros_like(d), where=d > 0)
+        return Points(self.array + difference * scale[:, None])
+
+    def rotate(self, angle: Union[float, np.ndarray], center: Optional[PointsLike] = None) -> Points:
+        """Rotates the points counterclockwise by the angle (radians) around the center, default (0, 0).
+
+        :param angle:
+        :param center:
+        """
+        origin = self._operand(center) if center is not None else np.zeros(2)
+        cos, sin = np.cos(angle), np.sin(angle)
+        relative = self.array - origin
+        rotated = np.stack(
+            (relative[:, 0] * cos - relative[:, 1] * sin, relative[:, 0] * sin + relative[:, 1] * cos), axis=1
+        )
+        return Points(rotated + origin)
+
+    def circle_intersection(self, p: PointsLike, r: Union[float, np.ndarray]) -> Tuple[Points, Points]:
+        """Both intersections of the circles with radius r around each point and around p (or the paired point),
+        in the same order as the two results of Point2.circle_intersection. Like there, r has to be at least half the distance.
+
+        :param p:
+        :param r:
+        """
+        half = (self._operand(p) - self.array) / 2
+        half_distance = np.hypot(half[:, 0], half[:, 1])
+        assert np.all(half_distance > 0), "a point is equal to p"
+        assert np.all(r >= half_distance)
+        stretch = np.sqrt(r**2 - half_distance**2) / half_distance
+        center = self.array + half
+        rotated = np.stack((half[:, 1], -half[:, 0]), axis=1) * stretch[:, None]
+        return Points(center + rotated), Points(center - rotated)
+
+    def rounded(self) -> Points:
+        """ Rounds down like Point2.rounded """
+        return Points(np.floor(self.array))
+
+    def clamp(self, rect: Rect) -> Points:
+        """Moves the points into the rectangle, e.g. game_info.playable_area.
+
+        :param rect:
+        """
+        low = (rect.x, rect.y)
+        high = (rect.right - EPSILON, rect.top - EPSILON)
+        return Points(np.clip(self.array, low, high))
+
+    def clamp_to_pathing(self, pathing_grid: PixelMap) -> Points:
+        """Moves the points into the map and every point on an unpathable cell to the center of the closest pathable cell.
+        The closest cells come from one distance transform of the grid, which is only computed if a point needs it.
+
+        Example::
+
+            positions = Points.grid(8, 3, 1.2).rotate(angle) + base
+            positions = positions.clamp_to_pathing(self.game_info.pathing_grid)
+
+        :param pathing_grid:
+        """
+        pathable = pathing_grid.data_numpy != 0
+        height, width = pathable.shape
+        array = np.clip(self.array, (0, 0), (width - EPSILON, height - EPSILON))
+        cells = array.astype(int)
+        blocked = ~pathable[cells[:, 1], cells[:, 0]]
+        if blocked.any() and pathable.any():
+            _, (nearest_y, nearest_x) = ndimage.distance_transform_edt(~pathable, return_indices=True)
+            blocked_cells = cells[blocked]
+            array[blocked, 0] = nearest_x[blocked_cells[:, 1], blocked_cells[:, 0]] + 0.5
+            array[blocked, 1] = nearest_y[blocked_cells[:, 1], blocked_cells[:, 0]] + 0.5
+        return Points(array)
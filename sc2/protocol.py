@@ -1,6 +1,7 @@
 import asyncio
 import sys
 from contextlib import suppress
+from typing import List
 
 from aiohttp import ClientWebSocketResponse
 from loguru import logger
@@ -30,54 +31,89 @@ class Protocol:
         assert ws
         self._ws: ClientWebSocketResponse = ws
         self._status: Status = None
+        # Requests queued by _queue, sent in front of the next _execute
+        self._queued: List[sc_pb.Request] = []
 
     async def __request(self, request):
-        logger.debug(f"Sending request: {request !r}")
+        return (await self.__pipeline([request]))[0]
+
+    async def __pipeline(self, requests):
+        """Writes all requests back-to-back and then reads their responses, which SC2 sends in request order."""
+        logger.debug(f"Sending requests: {requests !r}")
         try:
-            await self._ws.send_bytes(request.SerializeToString())
+            for request in requests:
+                await self._ws.send_bytes(request.SerializeToString())
         except TypeError as exc:
             logger.exception("Cannot send: Connection already closed.")
             raise ConnectionAlreadyClosed("Connection already closed.") from exc
-        logger.debug("Request sent")
+        logger.debug("Requests sent")
 
-        response = sc_pb.Response()
-        try:
-            response_bytes = await self._ws.receive_bytes()
-        except TypeError as exc:
-            if self._status == Status.ended:
-                logger.info("Cannot receive: Game has already ended.")
-                raise ConnectionAlreadyClosed("Game has already ended") from exc
-            logger.error("Cannot receive: Connection already closed.")
-            raise ConnectionAlreadyClosed("Connection already closed.") from exc
-        except asyncio.CancelledError:
-            # If request is sent, the response must be received before reraising cancel
+        responses = []
+        while len(responses) < len(requests):
             try:
-                await self._ws.receive_bytes()
+                response_bytes = await self._ws.receive_bytes()
+            except TypeError as exc:
+                if self._status == Status.ended:
+                    logger.info("Cannot receive: Game has already ended.")
+                    raise ConnectionAlreadyClosed("Game has already ended") from exc
+                logger.error("Cannot receive: Connection already closed.")
+                raise ConnectionAlreadyClosed("Connection already closed.") from exc
             except asyncio.CancelledError:
-                logger.critical("Requests must not be cancelled multiple times")
-                sys.exit(2)
-            raise
-
-        response.ParseFromString(response_bytes)
-        logger.debug("Response received")
-        return response
-
-    async def _execute(self, **kwargs):
-        assert len(kwargs) == 1, "Only one request allowed by the API"
-
-        response = await self.__request(sc_pb.Request(**kwargs))
-
+                # If requests are sent, all their responses must be received before reraising cancel
+                try:
+                    for _ in range(len(requests) - len(responses)):
+                        await self._ws.receive_bytes()
+                except asyncio.CancelledError:
+                    logger.critical("Requests must not be cancelled multiple times")
+                    sys.exit(2)
+                raise
+
+            response = sc_pb.Response()
+            response.ParseFromString(response_bytes)
+            responses.append(response)
+        logger.debug("Responses received")
+        return responses
+
+    def _update_status(self, response):
         new_status = Status(response.status)
         if new_status != self._status:
             logger.info(f"Client status changed to {new_status} (was {self._status})")
         self._status = new_status
 
+    async def _execute(self, **kwargs):
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+
+        request = sc_pb.Request(**kwargs)
+        if self._queued:
+            # Send the queued requests in the same round trip, in front of this one
+            requests = self._queued + [request]
+            self._queued = []
+            responses = await self.__pipeline(requests)
+            for queued_response in responses[:-1]:
+                self._update_status(queued_response)
+                if queued_response.error:
+                    logger.debug(f"Response of a queued request contained an error: {queued_response.error}")
+            response = responses[-1]
+        else:
+            response = await self.__request(request)
+
+        self._update_status(response)
+
         if response.error:
             logger.debug(f"Response contained an error: {response.error}")
             raise ProtocolError(f"{response.error}")
 
         return response
 
+    def _queue(self, **kwargs):
+        """Queues a request whose response is not needed, e.g. RequestAction or RequestDebug.
+        It is written together with the next _execute call (usually RequestStep or RequestObservation),
+        so the socket round trip is paid once for all of them. Errors in its response are only logged.
+
+        :param kwargs:"""
+        assert len(kwargs) == 1, "Only one request allowed by the API"
+        self._queued.append(sc_pb.Request(**kwargs))
+
     async def ping(self):
         result = await self._execute(ping=sc_pb.RequestPing())
         return result
@@ -0,0 +1,159 @@
+# pylint: disable=W0212
+from __future__ import annotations
+
+import warnings
+from functools import cached_property
+from typing import TYPE_CHECKING, Optional, Tuple, Union
+
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore")
+    from scipy.spatial import cKDTree
+
+if TYPE_CHECKING:
+    from sc2.bot_ai import BotAI
+
+
+def _xy(position: Union[Unit, Point2, Tuple[float, float]]) -> Tuple[float, float]:
+    if isinstance(position, Unit):
+        return position.position_tuple
+    return position[0], position[1]
+
+
+class UnitsIndex:
+    """KD-tree over the positions of one Units group.
+    Radius and nearest neighbour queries cost O(log n) instead of a pass over the whole group.
+    Returned Units keep the order of the indexed group unless stated otherwise."""
+
+    def __init__(self, units: Units):
+        """
+        :param units:
+        """
+        self.units = units
+        self._tree: Optional[cKDTree] = cKDTree(units._positions) if units else None
+        self._max_radius: float = float(units._radii.max()) if units else 0
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    @cached_property
+    def _max_range(self) -> float:
+        """ Longest ground or air weapon range in the group, used to bound the search radius of threats_to() """
+        return max((max(unit.ground_range, unit.air_range) for unit in self.units), default=0)
+
+    def in_radius(self, position: Union[Unit, Point2, Tuple[float, float]], radius: float) -> Units:
+        """Returns all units of the group whose center is at most 'radius' away from the position.
+
+        Example::
+
+            close_enemies = self.spatial_index.enemy_units.in_radius(my_marine, 6)
+
+        :param position:
+        :param radius:
+        """
+        if self._tree is None:
+            return self.units
+        indices = self._tree.query_ball_point(_xy(position), radius)
+        return self.units.subgroup(self.units[index] for index in sorted(indices))
+
+    def closest_n(self, position: Union[Unit, Point2, Tuple[float, float]], n: int) -> Units:
+        """Returns the n closest units to the position, sorted by distance.
+
+        :param position:
+        :param n:
+        """
+        if self._tree is None or n < 1:
+            return self.units.subgroup([])
+        k = min(n, len(self.units))
+        _, indices = self._tree.query(_xy(position), k=k)
+        if k == 1:
+            indices = [indices]
+        return self.units.subgroup(self.units[int(index)] for index in indices)
+
+    def closest(self, position: Union[Unit, Point2, Tuple[float, float]]) -> Optional[Unit]:
+        """Returns the closest unit to the position, or None if the group is empty.
+
+        :param position:
+        """
+        if self._tree is None:
+            return None
+        _, index = self._tree.query(_xy(position))
+        return self.units[int(index)]
+
+    def in_attack_range_of(self, unit: Unit, bonus_distance: float = 0) -> Units:
+        """Returns the units of this group that 'unit' can attack right now, see Units.in_attack_range_of.
+        Only the units inside the bounding radius are checked exactly.
+
+        Example::
+
+            for stalker in self.units(UnitTypeId.STALKER):
+                targets = self.spatial_index.enemy_units.in_attack_range_of(stalker)
+
+        :param unit:
+        :param bonus_distance:
+        """
+        reach = unit.radius + max(unit.ground_range, unit.air_range) + bonus_distance + self._max_radius
+        return self.in_radius(unit, reach).in_attack_range_of(unit, bonus_distance)
+
+    def threats_to(self, unit: Unit, bonus_distance: float = 0) -> Units:
+        """Returns the units of this group that have 'unit' in their weapon range.
+
+        Example::
+
+            if self.spatial_index.enemy_units.threats_to(my_high_templar):
+                my_high_templar.move(self.start_location)
+
+        :param unit:
+        :param bonus_distance:
+        """
+        reach = unit.radius + self._max_range + bonus_distance + self._max_radius
+        return self.in_radius(unit, reach).filter(lambda other: other.target_in_range(unit, bonus_distance))
+
+
+class SpatialIndex:
+    """Spatial index of the current frame, available as BotAI.spatial_index.
+    Each group gets its own KD-tree, which is only built when the group is queried for the first time in a frame,
+    so bots that never use the index pay nothing."""
+
+    def __init__(self, bot_object: BotAI):
+        """
+        :param bot_object:
+        """
+        self._bot_object = bot_object
+
+    @cached_property
+    def units(self) -> UnitsIndex:
+        """ Own units without structures """
+        return UnitsIndex(self._bot_object.units)
+
+    @cached_property
+    def units_air(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.units.flying)
+
+    @cached_property
+    def units_ground(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.units.not_flying)
+
+    @cached_property
+    def structures(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.structures)
+
+    @cached_property
+    def enemy_units(self) -> UnitsIndex:
+        """ Visible enemy units without structures """
+        return UnitsIndex(self._bot_object.enemy_units)
+
+    @cached_property
+    def enemy_air(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.enemy_units.flying)
+
+    @cached_property
+    def enemy_ground(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.enemy_units.not_flying)
+
+    @cached_property
+    def enemy_structures(self) -> UnitsIndex:
+        return UnitsIndex(self._bot_object.enemy_structures)
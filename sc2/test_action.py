@@ -0,0 +1,93 @@
+import asyncio
+import random
+
+import pytest
+
+from sc2.action import coalesce_unit_commands, combine_action_groups, combine_actions
+from sc2.constants import COMBINEABLE_ABILITIES, ORDER_REPLACING_ABILITIES
+from sc2.ids.ability_id import AbilityId
+from sc2.position import Point2
+from sc2.test_bot_ai import make_bot, make_unit
+from sc2.unit_command import UnitCommand
+
+ABILITIES = [
+    AbilityId.MOVE, AbilityId.ATTACK, AbilityId.STOP, AbilityId.EFFECT_STIM, AbilityId.HOLDPOSITION,
+    AbilityId.BARRACKSTRAIN_MARINE, AbilityId.SIEGEMODE_SIEGEMODE
+]
+TARGETS = [Point2((10, 10)), Point2((20, 20)), None]
+
+
+def simulate(raw_actions):
+    """ The orders every unit ends up with and the instant abilities it used, like the server would apply them """
+    orders, instant = {}, {}
+    for action in raw_actions:
+        command = action.unit_command
+        if command.HasField("target_world_space_pos"):
+            target = (command.target_world_space_pos.x, command.target_world_space_pos.y)
+        else:
+            target = command.target_unit_tag
+        for tag in command.unit_tags:
+            if AbilityId(command.ability_id) in ORDER_REPLACING_ABILITIES:
+                if command.queue_command:
+                    orders.setdefault(tag, []).append((command.ability_id, target))
+                else:
+                    orders[tag] = [(command.ability_id, target)]
+            else:
+                instant.setdefault(tag, []).append((command.ability_id, target, command.queue_command))
+    return orders, instant
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_coalesced_commands_have_the_same_effect(seed):
+    """ 3000 random frames of commands over the seeds """
+    rng = random.Random(seed)
+    bot = make_bot()
+    units = [make_unit(bot, tag, 0, 0) for tag in range(1, 12)]
+    for _ in range(300):
+        commands = []
+        for _ in range(rng.randint(0, 30)):
+            ability = rng.choice(ABILITIES)
+            target = rng.choice(TARGETS) if ability in {AbilityId.MOVE, AbilityId.ATTACK} else None
+            commands.append(UnitCommand(ability, rng.choice(units), target, rng.random() < 0.2))
+        combined = list(combine_actions(commands))
+        groups = coalesce_unit_commands(commands)
+        coalesced = list(combine_action_groups(groups))
+        assert simulate(coalesced) == simulate(combined)
+        assert len(coalesced) <= len(combined)
+        # Commands that can not be combined keep their order
+        assert [id(command) for command in commands if command.ability not in COMBINEABLE_ABILITIES] == [
+            id(command) for group in groups for command in group if command.ability not in COMBINEABLE_ABILITIES
+        ]
+
+
+def test_interleaved_groups_are_merged():
+    bot = make_bot()
+    units = [make_unit(bot, tag, 0, 0) for tag in range(1, 12)]
+    commands = [UnitCommand(AbilityId.ATTACK, unit, Point2((50, 50))) for unit in units[:5]]
+    commands += [UnitCommand(AbilityId.ATTACK, unit, Point2((40, 40))) for unit in units[5:]]
+    commands += [UnitCommand(AbilityId.ATTACK, unit, Point2((50, 50))) for unit in units[5:]]
+    assert len(list(combine_actions(commands))) == 3
+    (action, ) = combine_action_groups(coalesce_unit_commands(commands))
+    assert list(action.unit_command.unit_tags) == list(range(1, 12))
+
+
+class QueueClient:
+    """ Collects the actions that are queued for the next request """
+
+    def __init__(self):
+        self.sent = []
+
+    async def actions(self, actions, queue=False, grouped=False):
+        self.sent.append((list(combine_action_groups(actions)) if grouped else list(combine_actions(actions)), queue))
+
+
+def test_do_actions_coalesces_before_filtering():
+    bot = make_bot()
+    bot.client = QueueClient()
+    units = [make_unit(bot, tag, 0, 0) for tag in range(1, 5)]
+    commands = [UnitCommand(AbilityId.ATTACK, unit, Point2((5, 5))) for unit in units[:2]]
+    commands.append(UnitCommand(AbilityId.MOVE, units[2], Point2((1, 1))))
+    commands += [UnitCommand(AbilityId.ATTACK, unit, Point2((5, 5))) for unit in units[2:]]
+    asyncio.run(bot._do_actions(commands, queue=True, coalesce=True, diff=True))
+    ((actions, queue), ) = bot.client.sent
+    assert queue and [list(action.unit_command.unit_tags) for action in actions] == [[1, 2, 3, 4]]
@@ -0,0 +1,119 @@
+import asyncio
+from types import SimpleNamespace
+
+from s2clientprotocol import raw_pb2, sc2api_pb2
+
+from sc2.bot_ai import BotAI
+from sc2.data import TargetType
+from sc2.game_data import GameData
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+class EmptyBot(BotAI):
+
+    async def on_step(self, iteration: int):
+        pass
+
+
+def make_bot() -> EmptyBot:
+    bot = EmptyBot()
+    bot._initialize_variables()
+    bot._distances_override_functions(0)
+    bot.state = SimpleNamespace(game_loop=0)
+    return bot
+
+
+def make_unit(
+    bot: BotAI, tag: int, x: float, y: float, alliance: int = 1, unit_type: UnitTypeId = UnitTypeId.MARINE, radius: float = 0
+):
+    proto = raw_pb2.Unit(tag=tag, unit_type=unit_type.value, alliance=alliance, radius=radius)
+    proto.pos.x, proto.pos.y = x, y
+    return Unit(proto, bot)
+
+
+def weapon_data() -> GameData:
+    """ Marines with range 5 and sieged tanks with range 13 """
+    data = sc2api_pb2.ResponseData()
+    for unit_type, weapon_range in ((UnitTypeId.MARINE, 5), (UnitTypeId.SIEGETANKSIEGED, 13)):
+        unit_data = data.units.add(unit_id=unit_type.value, name=unit_type.name, available=True)
+        unit_data.weapons.add(type=TargetType.Ground.value, damage=6, attacks=1, speed=0.61, range=weapon_range)
+    return GameData(data)
+
+
+def test_next_game_step():
+    bot = make_bot()
+    bot.game_data = weapon_data()
+    bot.units = Units([make_unit(bot, 1, 10, 10)], bot)
+    bot.enemy_units = Units([], bot)
+    assert bot.next_game_step() is None
+
+    bot.coarse_game_step = 16
+    bot.engage_distance = 8
+    # Own units and no visible enemy, e.g. while walking across the map
+    assert bot.next_game_step() == 16
+    # Further than the marine range plus the margin
+    bot.enemy_units = Units([make_unit(bot, 2, 24, 10, alliance=4)], bot)
+    assert bot.next_game_step() == 16
+    bot.enemy_units = Units([make_unit(bot, 2, 24, 10, alliance=4), make_unit(bot, 3, 20, 15, alliance=4)], bot)
+    assert bot.next_game_step() is None
+    bot.units = Units([], bot)
+    assert bot.next_game_step() == 16
+
+
+def test_next_game_step_with_long_range_units():
+    bot = make_bot()
+    bot.game_data = weapon_data()
+    bot.coarse_game_step = 16
+    bot.engage_distance = 2
+    bot.units = Units([make_unit(bot, 1, 10, 10)], bot)
+    bot.enemy_units = Units([make_unit(bot, 2, 24, 10, alliance=4)], bot)
+    assert bot.next_game_step() == 16
+    # A sieged tank 14 away is about to shoot, on either side
+    bot.enemy_units = Units([make_unit(bot, 2, 24, 10, alliance=4, unit_type=UnitTypeId.SIEGETANKSIEGED)], bot)
+    assert bot.next_game_step() is None
+    bot.units = Units([make_unit(bot, 1, 10, 10, unit_type=UnitTypeId.SIEGETANKSIEGED)], bot)
+    bot.enemy_units = Units([make_unit(bot, 2, 24, 10, alliance=4)], bot)
+    assert bot.next_game_step() is None
+    # The unit radii count as well
+    bot.units = Units([make_unit(bot, 1, 10, 10)], bot)
+    bot.enemy_units = Units([make_unit(bot, 2, 18.5, 10, alliance=4)], bot)
+    assert bot.next_game_step() == 16
+    bot.units = Units([make_unit(bot, 1, 10, 10, radius=1)], bot)
+    bot.enemy_units = Units([make_unit(bot, 2, 18.5, 10, alliance=4, radius=1)], bot)
+    assert bot.next_game_step() is None
+
+
+class AbilityClient:
+    """ Answers ability queries with the tag of the unit as its only ability and counts the round trips """
+
+    def __init__(self):
+        self.queries = []
+
+    async def query_available_abilities(self, units, ignore_resource_requirements=False):
+        self.queries.append(([unit.tag for unit in units], ignore_resource_requirements))
+        return [[unit.tag] for unit in units]
+
+
+def test_available_abilities_are_queried_once_per_frame():
+    bot = make_bot()
+    bot.client = AbilityClient()
+    own = [make_unit(bot, tag, tag, tag) for tag in (1, 2, 3)]
+    bot.units = Units(own, bot)
+
+    # The first query of a frame asks for all own units at once
+    assert asyncio.run(bot.get_available_abilities([own[1]])) == [[2]]
+    assert asyncio.run(bot.get_available_abilities(own)) == [[1], [2], [3]]
+    assert asyncio.run(bot.get_available_abilities(own[0])) == [1]
+    assert bot.client.queries == [([2, 1, 3], False)]
+    # Units that are not own units are queried on their own
+    enemy = make_unit(bot, 9, 0, 0, alliance=4)
+    assert asyncio.run(bot.get_available_abilities([enemy, own[2]])) == [[9], [3]]
+    assert bot.client.queries[-1] == ([9], False)
+    assert asyncio.run(bot.get_available_abilities(own, ignore_resource_requirements=True)) == [[1], [2], [3]]
+    assert len(bot.client.queries) == 3
+
+    bot.state.game_loop = 1
+    asyncio.run(bot.get_available_abilities(own))
+    assert len(bot.client.queries) == 4
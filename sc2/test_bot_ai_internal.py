@@ -0,0 +1,140 @@
+from types import SimpleNamespace
+
+import pytest
+from s2clientprotocol import sc2api_pb2
+
+from sc2.data import Attribute
+from sc2.game_data import GameData
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.test_bot_ai import make_bot
+
+STRUCTURE_TYPES = [
+    UnitTypeId.COMMANDCENTER, UnitTypeId.ORBITALCOMMAND, UnitTypeId.BARRACKS, UnitTypeId.BARRACKSTECHLAB,
+    UnitTypeId.BARRACKSREACTOR, UnitTypeId.REFINERY, UnitTypeId.SUPPLYDEPOT, UnitTypeId.HATCHERY,
+    UnitTypeId.MINERALFIELD, UnitTypeId.VESPENEGEYSER, UnitTypeId.XELNAGATOWER, UnitTypeId.DESTRUCTIBLEROCK6X6
+]
+UNIT_TYPES = [
+    UnitTypeId.MARINE, UnitTypeId.SCV, UnitTypeId.SIEGETANK, UnitTypeId.SIEGETANKSIEGED, UnitTypeId.ZERGLING,
+    UnitTypeId.LARVA, UnitTypeId.DRONE
+]
+
+
+def game_data() -> GameData:
+    data = sc2api_pb2.ResponseData()
+    for unit_type in STRUCTURE_TYPES + UNIT_TYPES:
+        data.units.add(
+            unit_id=unit_type.value,
+            name=unit_type.name,
+            available=True,
+            attributes=[Attribute.Structure.value] if unit_type in STRUCTURE_TYPES else [],
+        )
+    return GameData(data)
+
+
+def raw_state(*units):
+    """ State with the raw units (tag, unit type, alliance, x, y, is_flying) for _pathing_grid_outdated """
+    observation = sc2api_pb2.ResponseObservation()
+    for tag, unit_type, alliance, x, y, is_flying in units:
+        unit = observation.observation.raw_data.units.add(
+            tag=tag, unit_type=unit_type.value, alliance=alliance, is_flying=is_flying
+        )
+        unit.pos.x, unit.pos.y = x, y
+    return SimpleNamespace(game_loop=0, observation_raw=observation.observation.raw_data)
+
+
+def test_pathing_grid_refresh_on_change():
+    bot = make_bot()
+    bot.game_data = game_data()
+    # Force fields change the pathing grid without a structure, so the library default stays "always"
+    assert bot.pathing_grid_refresh == "always"
+    bot.pathing_grid_refresh = "on_change"
+    barracks = (1, UnitTypeId.BARRACKS, 1, 10, 10, False)
+    rock = (2, UnitTypeId.DESTRUCTIBLEROCK6X6, 3, 20, 20, False)
+    marine = (3, UnitTypeId.MARINE, 1, 5, 5, False)
+    assert bot._pathing_grid_outdated(raw_state(barracks, rock, marine))
+    # Units moving around do not change the pathing grid
+    assert not bot._pathing_grid_outdated(raw_state(barracks, rock, (3, UnitTypeId.MARINE, 1, 6, 6, False)))
+    assert not bot._pathing_grid_outdated(raw_state(barracks, rock))
+    # A structure lifting off, a rock dying, a new structure
+    assert bot._pathing_grid_outdated(raw_state((1, UnitTypeId.BARRACKS, 1, 10, 10, True), rock))
+    assert bot._pathing_grid_outdated(raw_state((1, UnitTypeId.BARRACKS, 1, 10, 10, True)))
+    assert bot._pathing_grid_outdated(raw_state(barracks, (4, UnitTypeId.SUPPLYDEPOT, 4, 30, 30, False)))
+
+
+def test_pathing_grid_refresh_policies():
+    bot = make_bot()
+    bot.game_data = game_data()
+    state = raw_state()
+    bot.pathing_grid_refresh = "always"
+    assert bot._pathing_grid_outdated(state) and bot._pathing_grid_outdated(state)
+    bot.pathing_grid_refresh = "never"
+    assert not bot._pathing_grid_outdated(state)
+    bot.pathing_grid_refresh = 10
+    refreshed = []
+    for game_loop in range(0, 40, 4):
+        state.game_loop = game_loop
+        if bot._pathing_grid_outdated(state):
+            refreshed.append(game_loop)
+    assert refreshed == [0, 12, 24, 36]
+
+
+def reference_events(bot, previous, seen):
+    """ The events of a frame from per unit lookups of the previous frame's units by tag """
+    events = []
+    previous_maps = {group: {unit.tag: unit for unit in units} for group, units in previous.items()}
+    events += [("on_unit_destroyed", tag) for tag in bot.state.dead_units if tag in previous_maps["all_units"]]
+    for unit in bot.units:
+        before = previous_maps["units"].get(unit.tag)
+        if before is None:
+            if unit.tag not in seen:
+                seen.add(unit.tag)
+                events.append(("on_unit_created", (unit.tag, unit.type_id)))
+            continue
+        if unit.health < before.health or unit.shield < before.shield:
+            damage = before.health - unit.health + before.shield - unit.shield
+            events.append(("on_unit_took_damage", (unit.tag, unit.type_id), damage))
+        if unit.type_id != before.type_id:
+            events.append(("on_unit_type_changed", (unit.tag, unit.type_id), before.type_id))
+    for structure in bot.structures:
+        before = previous_maps["structures"].get(structure.tag)
+        if before is None:
+            name = "on_building_construction_started" if structure.build_progress < 1 else "on_building_construction_complete"
+            events.append((name, (structure.tag, structure.type_id)))
+            continue
+        if structure.health < before.health or structure.shield < before.shield:
+            damage = before.health - structure.health + before.shield - structure.shield
+            events.append(("on_unit_took_damage", (structure.tag, structure.type_id), damage))
+        if structure.type_id != before.type_id:
+            events.append(("on_unit_type_changed", (structure.tag, structure.type_id), before.type_id))
+        if structure.build_progress == 1 and before.build_progress < 1:
+            events.append(("on_building_construction_complete", (structure.tag, structure.type_id)))
+    for group in ("enemy_units", "enemy_structures"):
+        events += [("on_enemy_unit_entered_vision", (unit.tag, unit.type_id))
+                   for unit in getattr(bot, group) if unit.tag not in previous_maps[group]]
+    for group in ("enemy_units", "enemy_structures"):
+        tags = getattr(bot, group).tags
+        events += [("on_enemy_unit_left_vision", unit.tag) for unit in previous[group] if unit.tag not in tags]
+    return events
+
+
+def rounded(events):
+    return [tuple(round(arg, 3) if isinstance(arg, float) else arg for arg in event) for event in events]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_events_match_per_unit_reference(seed):
+    # pylint: disable=C0415
+    from sc2.test_unit_snapshot import make_bot as make_event_bot
+    from sc2.test_unit_snapshot import random_frames, step
+
+    bot = make_event_bot(False)
+    groups = ("all_units", "units", "structures", "enemy_units", "enemy_structures")
+    previous = {group: [] for group in groups}
+    seen = set()
+    for response in random_frames(seed, 100):
+        logged = len(bot.log)
+        step(bot, response)
+        assert rounded(bot.log[logged:]) == rounded(reference_events(bot, previous, seen))
+        previous = {group: list(getattr(bot, group)) for group in groups}
+    names = {event[0] for event in bot.log}
+    assert {"on_enemy_unit_entered_vision", "on_enemy_unit_left_vision", "on_unit_type_changed"} <= names
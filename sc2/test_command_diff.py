@@ -0,0 +1,83 @@
+from typing import Optional
+
+from s2clientprotocol import raw_pb2, sc2api_pb2
+
+from sc2.command_diff import CommandDiff, CommandPolicy
+from sc2.game_data import GameData
+from sc2.ids.ability_id import AbilityId
+from sc2.position import Point2
+from sc2.test_bot_ai import make_bot
+from sc2.unit import Unit
+from sc2.unit_command import UnitCommand
+
+
+def make_diff_bot():
+    bot = make_bot()
+    data = sc2api_pb2.ResponseData()
+    for ability in (AbilityId.MOVE, AbilityId.ATTACK, AbilityId.EFFECT_STIM):
+        data.abilities.add(ability_id=ability.value, available=True)
+    data.abilities.add(ability_id=AbilityId.MOVE_MOVE.value, available=True, remaps_to_ability_id=AbilityId.MOVE.value)
+    bot.game_data = GameData(data)
+    return bot
+
+
+def marine(bot, order: Optional[AbilityId] = None, x: float = 0, y: float = 0, tag: int = 1) -> Unit:
+    proto = raw_pb2.Unit(tag=tag, unit_type=48)
+    if order:
+        proto_order = proto.orders.add(ability_id=order.value)
+        proto_order.target_world_space_pos.x, proto_order.target_world_space_pos.y = x, y
+    return Unit(proto, bot)
+
+
+def test_repeated_moves_are_left_out():
+    bot = make_diff_bot()
+    diff = CommandDiff()
+    moving = marine(bot, AbilityId.MOVE_MOVE, 10, 10)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, marine(bot), Point2((10, 10))), 0)
+    assert not diff.keep(UnitCommand(AbilityId.MOVE, moving, Point2((10.3, 10))), 2)
+    # Still compared with the sent target, not the last left out one
+    assert not diff.keep(UnitCommand(AbilityId.MOVE, moving, Point2((10.4, 10.2))), 4)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, moving, Point2((10.6, 10))), 6)
+    assert diff.sent[AbilityId.MOVE] == 2 and diff.suppressed[AbilityId.MOVE] == 2
+
+
+def test_commands_that_are_sent_again():
+    bot = make_diff_bot()
+    diff = CommandDiff()
+    moving = marine(bot, AbilityId.MOVE_MOVE, 10, 10)
+    target = Point2((10, 10))
+    assert diff.keep(UnitCommand(AbilityId.MOVE, moving, target), 0)
+    # The unit is idle, e.g. it arrived
+    assert diff.keep(UnitCommand(AbilityId.MOVE, marine(bot), target), 1)
+    # The last command is too old
+    assert diff.keep(UnitCommand(AbilityId.MOVE, moving, target), 30)
+    # Another ability, a queued command and the command after it
+    assert diff.keep(UnitCommand(AbilityId.ATTACK, moving, target), 31)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, moving, target, queue=True), 32)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, moving, target), 33)
+    # Abilities without a policy
+    stimmed = marine(bot, AbilityId.EFFECT_STIM)
+    assert diff.keep(UnitCommand(AbilityId.EFFECT_STIM, stimmed), 34)
+    assert diff.keep(UnitCommand(AbilityId.EFFECT_STIM, stimmed), 34)
+    assert sum(diff.suppressed.values()) == 0
+
+
+def test_unit_targets_and_policies():
+    bot = make_diff_bot()
+    diff = CommandDiff({AbilityId.ATTACK: CommandPolicy(distance=0, frames=10)})
+    attacking = marine(bot, AbilityId.ATTACK)
+    enemy, other_enemy = marine(bot, tag=2), marine(bot, tag=3)
+    assert diff.keep(UnitCommand(AbilityId.ATTACK, attacking, enemy), 0)
+    assert not diff.keep(UnitCommand(AbilityId.ATTACK, attacking, enemy), 5)
+    assert diff.keep(UnitCommand(AbilityId.ATTACK, attacking, other_enemy), 6)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, marine(bot, AbilityId.MOVE_MOVE), Point2((1, 1))), 7)
+    assert diff.keep(UnitCommand(AbilityId.MOVE, marine(bot, AbilityId.MOVE_MOVE), Point2((1, 1))), 8)
+
+
+def test_units_without_commands_are_forgotten():
+    bot = make_diff_bot()
+    diff = CommandDiff()
+    for tag in range(1, 20):
+        diff.keep(UnitCommand(AbilityId.MOVE, marine(bot, tag=tag), Point2((1, 1))), 0)
+    diff.keep(UnitCommand(AbilityId.MOVE, marine(bot), Point2((1, 1))), 1000)
+    assert list(diff._last) == [1]
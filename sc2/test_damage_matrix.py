@@ -0,0 +1,111 @@
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from s2clientprotocol import raw_pb2, sc2api_pb2
+
+from sc2.data import Attribute, TargetType
+from sc2.game_data import GameData
+from sc2.ids.buff_id import BuffId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.test_bot_ai import make_bot
+from sc2.unit import Unit
+from sc2.units import Units
+
+LIGHT, ARMORED, BIOLOGICAL, MECHANICAL = (
+    Attribute.Light.value, Attribute.Armored.value, Attribute.Biological.value, Attribute.Mechanical.value
+)
+GROUND, AIR, ANY = TargetType.Ground.value, TargetType.Air.value, TargetType.Any.value
+# unit type: (armor, attributes, [(target type, damage, attacks, speed, range, [(bonus attribute, bonus)])])
+UNIT_TYPES = {
+    UnitTypeId.MARINE: (0, [BIOLOGICAL], [(ANY, 6, 1, 0.61, 5, [])]),
+    UnitTypeId.MARAUDER: (1, [ARMORED, BIOLOGICAL], [(GROUND, 10, 1, 1.07, 6, [(ARMORED, 10)])]),
+    UnitTypeId.STALKER: (1, [ARMORED, MECHANICAL], [(ANY, 13, 1, 1.34, 6, [(ARMORED, 5)])]),
+    UnitTypeId.ZEALOT: (1, [LIGHT, BIOLOGICAL], [(GROUND, 8, 2, 0.86, 0.1, [])]),
+    UnitTypeId.COLOSSUS: (1, [ARMORED, MECHANICAL], [(GROUND, 10, 2, 1.07, 7, [(LIGHT, 5)])]),
+    UnitTypeId.VIKINGFIGHTER: (0, [ARMORED, MECHANICAL], [(AIR, 10, 2, 1.43, 9, [(ARMORED, 4)])]),
+    UnitTypeId.THOR: (1, [ARMORED, MECHANICAL], [(GROUND, 30, 2, 0.91, 7, []), (AIR, 6, 4, 2.14, 10, [(LIGHT, 6)])]),
+    UnitTypeId.QUEEN: (1, [BIOLOGICAL], [(GROUND, 4, 2, 0.71, 5, []), (AIR, 9, 1, 0.71, 7, [])]),
+    UnitTypeId.BATTLECRUISER: (3, [ARMORED, MECHANICAL], []),
+    UnitTypeId.BUNKER: (1, [ARMORED, MECHANICAL], []),
+    UnitTypeId.HELLION: (0, [LIGHT, MECHANICAL], [(GROUND, 8, 1, 1.79, 5, [(LIGHT, 6)])]),
+    UnitTypeId.ULTRALISK: (2, [ARMORED, BIOLOGICAL], [(GROUND, 35, 1, 0.61, 1, [])]),
+    UnitTypeId.ZERGLING: (0, [LIGHT, BIOLOGICAL], [(GROUND, 5, 1, 0.497, 0.1, [])]),
+    UnitTypeId.ARCHON: (0, [], [(ANY, 25, 1, 0.89, 3, [(BIOLOGICAL, 10)])]),
+    UnitTypeId.HYDRALISK: (0, [LIGHT, BIOLOGICAL], [(ANY, 12, 1, 0.59, 5, [])]),
+    UnitTypeId.ORACLE: (0, [ARMORED, MECHANICAL], []),
+}
+UPGRADES = [
+    UpgradeId.CHITINOUSPLATING, UpgradeId.HIGHCAPACITYBARRELS, UpgradeId.ZERGLINGATTACKSPEED,
+    UpgradeId.EVOLVEGROOVEDSPINES
+]
+BUFFS = [BuffId.GUARDIANSHIELD, BuffId.RAVENSHREDDERMISSILETINT, BuffId.STIMPACK, BuffId.STIMPACKMARAUDER]
+
+
+def game_data() -> GameData:
+    data = sc2api_pb2.ResponseData()
+    for unit_type, (armor, attributes, weapons) in UNIT_TYPES.items():
+        unit_data = data.units.add(unit_id=unit_type.value, name=unit_type.name, available=True, armor=armor)
+        unit_data.attributes.extend(attributes)
+        for target_type, damage, attacks, speed, weapon_range, bonuses in weapons:
+            weapon = unit_data.weapons.add(type=target_type, damage=damage, attacks=attacks, speed=speed, range=weapon_range)
+            for attribute, bonus in bonuses:
+                weapon.damage_bonus.add(attribute=attribute, bonus=bonus)
+    return GameData(data)
+
+
+def random_units(bot, rng, count, first_tag):
+    units = []
+    for tag in range(first_tag, first_tag + count):
+        unit_type = rng.choice(list(UNIT_TYPES))
+        proto = raw_pb2.Unit(
+            tag=tag,
+            unit_type=unit_type.value,
+            alliance=rng.choice([1, 4]),
+            is_flying=unit_type in {UnitTypeId.VIKINGFIGHTER, UnitTypeId.BATTLECRUISER} or rng.random() < 0.1,
+            health=rng.choice([0, 1, 5, 35, 45, 100, rng.uniform(0, 300)]),
+            shield=rng.choice([0, 0, 1, 5, 20, rng.uniform(0, 100)]),
+            attack_upgrade_level=rng.randint(0, 3),
+            armor_upgrade_level=rng.randint(0, 3),
+            shield_upgrade_level=rng.randint(0, 3),
+            build_progress=1 if rng.random() < 0.9 else 0.5,
+            is_active=rng.random() < 0.5,
+        )
+        proto.buff_ids.extend(buff.value for buff in BUFFS if rng.random() < 0.2)
+        units.append(Unit(proto, bot))
+    return Units(units, bot)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matrices_match_per_pair_calculations(seed):
+    rng = random.Random(seed)
+    bot = make_bot()
+    bot.game_data = game_data()
+    bot.state = SimpleNamespace(game_loop=0, upgrades={upgrade for upgrade in UPGRADES if rng.random() < 0.5})
+    attackers = random_units(bot, rng, rng.randint(0, 15), 1)
+    targets = random_units(bot, rng, rng.randint(0, 15), 1000)
+    for ignore_armor in (False, True):
+        for include_overkill_damage in (True, False):
+            matrices = bot.calculate_damage_matrix(attackers, targets, ignore_armor, include_overkill_damage)
+            for matrix in matrices:
+                assert matrix.shape == (len(attackers), len(targets))
+            for i, attacker in enumerate(attackers):
+                for j, target in enumerate(targets):
+                    expected = attacker.calculate_damage_vs_target(target, ignore_armor, include_overkill_damage)
+                    assert [matrix[i, j] for matrix in matrices] == pytest.approx(expected, abs=1e-6)
+
+    dps = bot.calculate_dps_matrix(attackers, targets)
+    for i, attacker in enumerate(attackers):
+        for j, target in enumerate(targets):
+            assert dps[i, j] == pytest.approx(attacker.calculate_dps_vs_target(target), abs=1e-6)
+
+    time_to_kill = bot.calculate_time_to_kill_matrix(attackers, targets)
+    hit_points = np.array([target.health + target.shield for target in targets])
+    for i in range(len(attackers)):
+        for j in range(len(targets)):
+            if dps[i, j] > 0:
+                assert time_to_kill[i, j] == pytest.approx(hit_points[j] / dps[i, j])
+            else:
+                assert time_to_kill[i, j] == np.inf
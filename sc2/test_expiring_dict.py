@@ -0,0 +1,80 @@
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from sc2.expiring_dict import ExpiringDict
+
+
+def make_bot():
+    return SimpleNamespace(state=SimpleNamespace(game_loop=0))
+
+
+def test_items_expire_after_max_age():
+    bot = make_bot()
+    expiring = ExpiringDict(bot, max_age_frames=20)
+    expiring["a"] = 1
+    bot.state.game_loop = 10
+    expiring["b"] = 2
+    # Setting a key again refreshes its age and moves it to the end
+    expiring["a"] = 3
+    bot.state.game_loop = 25
+    assert len(expiring) == 2 and list(expiring) == ["b", "a"]
+    assert expiring["a"] == 3 and expiring.__getitem__("b", with_age=True) == (2, 10)
+    bot.state.game_loop = 30
+    assert len(expiring) == 0 and "a" not in expiring and list(expiring.items()) == []
+    with pytest.raises(KeyError):
+        expiring["a"]  # pylint: disable=W0104
+
+
+def test_expired_items_do_not_pile_up():
+    bot = make_bot()
+    expiring = ExpiringDict(bot, max_age_frames=20)
+    for game_loop in range(1000):
+        bot.state.game_loop = game_loop
+        expiring[game_loop] = game_loop
+    assert len(expiring) == 20 and list(expiring.values()) == list(range(980, 1000))
+
+
+def test_max_size_and_thread_safe():
+    bot = make_bot()
+    expiring = ExpiringDict(bot, 100, max_size=3, thread_safe=True)
+    for key in "wxyz":
+        expiring[key] = key
+    assert list(expiring.keys()) == ["x", "y", "z"]
+    assert expiring.pop("x") == "x" and expiring.get("y", with_age=True) == ("y", 0) and len(expiring) == 2
+    for key in expiring:
+        expiring.pop(key)
+    assert len(expiring) == 0 and repr(expiring) == "ExpiringDict()"
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_random_operations_match_reference(seed):
+    """ Compares with a plain dict of (value, frame) that filters expired items on every read """
+    rng = random.Random(seed)
+    bot = make_bot()
+    max_age = rng.randint(0, 30)
+    expiring = ExpiringDict(bot, max_age_frames=max_age)
+    reference = {}
+
+    def alive():
+        return {
+            key: value
+            for key, (value, frame) in sorted(reference.items(), key=lambda item: item[1][1])
+            if bot.state.game_loop - frame < max_age
+        }
+
+    for _ in range(500):
+        bot.state.game_loop += rng.choice([0, 0, 1, 3, 10])
+        key = rng.randint(0, 20)
+        operation = rng.random()
+        if operation < 0.5:
+            reference.pop(key, None)
+            reference[key] = (operation, bot.state.game_loop)
+            expiring[key] = operation
+        elif operation < 0.6 and key in alive():
+            assert expiring.pop(key) == reference.pop(key)[0]
+        else:
+            assert (key in expiring) == (key in alive())
+        assert len(expiring) == len(alive())
+        assert dict(expiring.items()) == alive()
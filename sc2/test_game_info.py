@@ -0,0 +1,135 @@
+from collections import deque
+
+import numpy as np
+import pytest
+from s2clientprotocol import sc2api_pb2
+
+from sc2.game_info import GameInfo
+from sc2.pixel_map import PixelMap
+from sc2.position import Point2
+
+
+def make_game_info(width: int, height: int, seed: int) -> sc2api_pb2.ResponseGameInfo:
+    """ A low left and a high right half split by a cliff with a ramp every 25 rows and random vision blockers """
+    rng = np.random.default_rng(seed)
+    cliff = slice(width // 2 - 3, width // 2 + 3)
+    terrain_height = np.full((height, width), 100, np.uint8)
+    terrain_height[:, width // 2:] = 150
+    pathing = np.zeros((height, width), np.uint8)
+    pathing[2:height - 2, 2:width - 2] = 1
+    pathing[:, cliff] = 0
+    for y in range(5, height - 10, 25):
+        pathing[y:y + 6, cliff] = 1
+        terrain_height[y:y + 6, cliff] = np.linspace(100, 150, 6).astype(np.uint8)[None, :]
+    placement = pathing.copy()
+    placement[:, cliff] = 0
+    for _ in range(width * height // 400):
+        x, y = rng.integers(4, width // 2 - 8), rng.integers(4, height - 8)
+        placement[y:y + 3, x:x + 3] = 0
+
+    proto = sc2api_pb2.ResponseGameInfo()
+    start_raw = proto.start_raw
+    start_raw.map_size.x, start_raw.map_size.y = width, height
+    for grid, data, bits_per_pixel in (
+        (start_raw.pathing_grid, pathing, 1),
+        (start_raw.placement_grid, placement, 1),
+        (start_raw.terrain_height, terrain_height, 8),
+    ):
+        grid.size.x, grid.size.y = width, height
+        grid.bits_per_pixel = bits_per_pixel
+        grid.data = np.packbits(data).tobytes() if bits_per_pixel == 1 else data.tobytes()
+    start_raw.playable_area.p0.x, start_raw.playable_area.p0.y = 1, 1
+    start_raw.playable_area.p1.x, start_raw.playable_area.p1.y = width - 1, height - 1
+    return proto
+
+
+def reference_groups(points, minimum_points_per_group: int = 1):
+    """ Groups of 8-neighbour connected points by breadth first search """
+    remaining = set(points)
+    groups = set()
+    while remaining:
+        start = remaining.pop()
+        group = {start}
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            for dx in (-1, 0, 1):
+                for dy in (-1, 0, 1):
+                    neighbour = Point2((x + dx, y + dy))
+                    if neighbour in remaining:
+                        remaining.discard(neighbour)
+                        group.add(neighbour)
+                        queue.append(neighbour)
+        if len(group) >= minimum_points_per_group:
+            groups.add(frozenset(group))
+    return groups
+
+
+def reference_ramps_and_vision_blockers(game_info: GameInfo):
+    """ Pathable but not placeable points, split by whether the terrain height around them is equal """
+    heights = game_info.terrain_height.data_numpy
+    area = game_info.playable_area
+    points = [
+        Point2((x, y)) for (y, x), value in np.ndenumerate(game_info.pathing_grid.data_numpy)
+        if value == 1 and area.x <= x < area.x + area.width and area.y <= y < area.y + area.height
+        and game_info.placement_grid[(x, y)] == 0
+    ]
+    equal_height = {point: len(np.unique(heights[point.y - 1:point.y + 2, point.x - 1:point.x + 2])) == 1 for point in points}
+    ramps = reference_groups([point for point in points if not equal_height[point]], 8)
+    vision_blockers = frozenset(point for point in points if equal_height[point])
+    return ramps, vision_blockers
+
+
+@pytest.mark.parametrize("width, height, seed", [(64, 64, 0), (120, 90, 1), (200, 176, 2)])
+def test_ramps_and_vision_blockers_match_reference(width, height, seed):
+    game_info = GameInfo(make_game_info(width, height, seed))
+    ramps, vision_blockers = game_info._find_ramps_and_vision_blockers()
+    expected_ramps, expected_vision_blockers = reference_ramps_and_vision_blockers(game_info)
+    assert {ramp.points for ramp in ramps} == expected_ramps
+    assert vision_blockers == expected_vision_blockers
+    assert len(ramps) == len(range(5, height - 10, 25))
+    assert all(width // 2 - 3 <= point.x < width // 2 + 3 for ramp in ramps for point in ramp.points)
+    assert set(game_info._find_groups([point for ramp in ramps for point in ramp.points])) == expected_ramps
+
+
+@pytest.mark.parametrize("width, height, seed", [(64, 64, 3), (120, 90, 4)])
+def test_regions_and_chokes(width, height, seed):
+    game_info = GameInfo(make_game_info(width, height, seed))
+    game_info.map_ramps, game_info.vision_blockers = game_info._find_ramps_and_vision_blockers()
+    low, high = game_info.regions
+    assert round(low.height) < round(high.height)
+    assert game_info.region_at((5, 5)) is low and (5, 5) in low
+    assert game_info.region_at((width - 5, 5)) is high
+    # Cliffs, ramps and points outside of the map belong to no region
+    assert game_info.region_at((width // 2, 2)) is None
+    assert game_info.region_at(next(iter(game_info.map_ramps[0].points))) is None
+    assert game_info.region_at((-3, 5)) is None
+    assert low.neighbours == [high] and high.neighbours == [low]
+    assert len(low.ramps) == len(game_info.map_ramps)
+    assert len(game_info.chokes) == len(game_info.map_ramps)
+    for ramp in game_info.chokes:
+        assert game_info.ramp_regions(ramp) == [low, high]
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_flood_fill_matches_reference(seed):
+    """ 20 random grids with scattered and clustered set pixels """
+    rng = np.random.default_rng(seed)
+    width, height = rng.integers(5, 40, size=2)
+    data = (rng.random((height, width)) < rng.uniform(0.2, 0.7)).astype(np.uint8)
+    grid = sc2api_pb2.ResponseGameInfo().start_raw.placement_grid
+    grid.size.x, grid.size.y = int(width), int(height)
+    grid.bits_per_pixel = 8
+    grid.data = data.tobytes()
+    pixel_map = PixelMap(grid)
+
+    set_points = [Point2((int(x), int(y))) for y, x in zip(*np.nonzero(data))]
+    expected = reference_groups(set_points)
+    assert pixel_map.flood_fill_all(lambda value: value == 1) == expected
+    for point in set_points[:10]:
+        assert pixel_map.flood_fill(point, lambda value: value == 1) == next(group for group in expected if point in group)
+    assert pixel_map.flood_fill((-1, 0), lambda value: value == 1) == set()
+    unset = np.argwhere(data == 0)
+    if len(unset):
+        y, x = unset[0]
+        assert pixel_map.flood_fill((int(x), int(y)), lambda value: value == 1) == set()
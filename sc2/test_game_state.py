@@ -0,0 +1,65 @@
+import asyncio
+
+import numpy as np
+import pytest
+from s2clientprotocol import sc2api_pb2
+
+from sc2.game_state import GameState
+from sc2.ids.upgrade_id import UpgradeId
+from sc2.test_bot_ai import EmptyBot
+
+
+def observation(upgrade_ids=(), seed=0) -> sc2api_pb2.ResponseObservation:
+    rng = np.random.default_rng(seed)
+    response = sc2api_pb2.ResponseObservation()
+    raw_data = response.observation.raw_data
+    response.observation.game_loop = 100
+    response.observation.score.score = 5
+    raw_data.player.upgrade_ids.extend(upgrade_ids)
+    visibility, creep = raw_data.map_state.visibility, raw_data.map_state.creep
+    visibility.bits_per_pixel, creep.bits_per_pixel = 8, 1
+    visibility.size.x = visibility.size.y = creep.size.x = creep.size.y = 32
+    visibility.data = rng.integers(0, 3, 32 * 32, dtype=np.uint8).tobytes()
+    creep.data = rng.integers(0, 256, 32 * 32 // 8, dtype=np.uint8).tobytes()
+    effect = raw_data.effects.add(effect_id=1)
+    position = effect.pos.add()
+    position.x, position.y = 1, 2
+    return response
+
+
+def test_lazy_fields_are_built_on_first_access():
+    response = observation([1, 2])
+    state = GameState(response)
+    assert not set(GameState.LAZY_FIELDS) & set(vars(state))
+    state.prefetch("creep")
+    assert "creep" in vars(state) and "visibility" not in vars(state)
+    state.prefetch()
+    assert set(GameState.LAZY_FIELDS) <= set(vars(state))
+    with pytest.raises(AssertionError):
+        state.prefetch("units")
+
+    map_state = response.observation.raw_data.map_state
+    assert np.array_equal(state.creep.data_numpy.ravel(), np.unpackbits(np.frombuffer(map_state.creep.data, np.uint8)))
+    assert np.array_equal(state.visibility.data_numpy.ravel(), np.frombuffer(map_state.visibility.data, np.uint8))
+    assert state.score.score == 5 and state.upgrades == {UpgradeId(1), UpgradeId(2)} and len(state.effects) == 1
+    # The cached fields are kept for the frame
+    assert state.effects is state.effects and state.visibility is state.visibility
+
+
+def test_upgrade_events_without_the_upgrade_set():
+    completed = []
+
+    class UpgradeBot(EmptyBot):
+
+        async def on_upgrade_complete(self, upgrade: UpgradeId):
+            completed.append(upgrade)
+
+    bot = UpgradeBot()
+    bot._initialize_variables()
+    for upgrade_ids in ([], [1], [1], [1, 2, 3], [1, 2, 3]):
+        bot.state = GameState(observation(upgrade_ids))
+        new_upgrades = len(upgrade_ids) != len(bot._previous_upgrades)
+        asyncio.run(bot._issue_upgrade_events())
+        # Frames without a new upgrade do not build the set
+        assert ("upgrades" in vars(bot.state)) == new_upgrades
+    assert completed[0] == UpgradeId(1) and set(completed[1:]) == {UpgradeId(2), UpgradeId(3)}
@@ -0,0 +1,67 @@
+import math
+import random
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from sc2.position import Point2, Points, Rect
+
+
+def random_points(rng, count):
+    return [Point2((rng.uniform(0, 50), rng.uniform(0, 50))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_points_match_point2(seed):
+    rng = random.Random(seed)
+    points = random_points(rng, rng.randint(1, 40))
+    batch = Points(points)
+    target = Point2((rng.uniform(0, 50), rng.uniform(0, 50)))
+    assert len(batch) == len(points) and list(batch) == points
+    assert isinstance(batch[0], Point2) and len(batch[:5]) == min(5, len(points))
+
+    for limit in (False, True):
+        for distance in (1, 100):
+            assert list(batch.towards(target, distance, limit)) == [p.towards(target, distance, limit) for p in points]
+    assert list(batch.offset((1, 2))) == [p.offset((1, 2)) for p in points]
+    assert np.allclose(batch.distance_to(target), [p.distance_to(target) for p in points])
+    assert batch.center == Point2.center(points)
+    assert list(batch.rounded()) == [p.rounded for p in points]
+
+    others = random_points(rng, 7)
+    assert np.allclose(
+        batch.distance_matrix(Points(others)), [[p.distance_to(q) for q in others] for p in points]
+    )
+    rotated = batch.rotate(math.pi / 2, target)
+    assert np.allclose(rotated.distance_to(target), batch.distance_to(target))
+
+    # Pairwise with another Points object
+    assert list(batch.towards(Points(points), 3)) == points
+    moved = Points([p.towards(target, 3) for p in points])
+    first, second = batch.circle_intersection(moved, 2)
+    for a, b, p, q in zip(first, second, points, moved):
+        expected = sorted(p.circle_intersection(q, 2))
+        assert all(x.is_same_as(y, 1e-9) for x, y in zip(sorted([a, b]), expected))
+
+
+def test_points_operators_and_grid():
+    points = [Point2((1, 2)), Point2((3, -4))]
+    batch = Points(points)
+    target = Point2((20, 30))
+    assert list(batch - target + target) == points
+    assert list(2 * batch) == [p * 2 for p in points] and list(batch / 2) == [p / 2 for p in points]
+    assert list(-batch) == [-p for p in points]
+    assert Points([(1, 0)]).rotate(math.pi / 2)[0] == Point2((0, 1))
+    grid = Points.grid(4, 2, 1.5)
+    assert len(grid) == 8 and grid.center == Point2((0, -0.75))
+    assert set(grid.array[:, 1]) == {0, -1.5}
+
+
+def test_points_clamp():
+    assert Points([(1, 1), (20, 5)]).clamp(Rect((2, 3, 10, 10)))[0] == Point2((2, 3))
+    assert Points([(1, 1), (20, 5)]).clamp(Rect((2, 3, 10, 10)))[1].x < 12
+    pathing = np.zeros((20, 20), np.uint8)
+    pathing[5:15, 5:15] = 1
+    clamped = Points([(1, 1), (10, 10), (30, -4), (14.5, 9)]).clamp_to_pathing(SimpleNamespace(data_numpy=pathing))
+    assert list(clamped) == [Point2((5.5, 5.5)), Point2((10, 10)), Point2((14.5, 5.5)), Point2((14.5, 9))]
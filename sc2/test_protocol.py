@@ -0,0 +1,51 @@
+import asyncio
+
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+from sc2.client import Client
+
+
+class RecordingWebSocket:
+    """ Answers every request in order, answers to actions carry an error like a rejected command """
+
+    def __init__(self):
+        self.sent = []
+        self.answers = []
+
+    async def send_bytes(self, data: bytes):
+        request = sc_pb.Request()
+        request.ParseFromString(data)
+        self.sent.append(request.WhichOneof("request"))
+        response = sc_pb.Response(status=3)
+        if request.HasField("action"):
+            response.error.append("rejected")
+        self.answers.append(response.SerializeToString())
+
+    async def receive_bytes(self) -> bytes:
+        return self.answers.pop(0)
+
+
+def test_queued_requests_are_sent_with_the_next_request():
+
+    async def run():
+        ws = RecordingWebSocket()
+        client = Client(ws)
+        client._queue(action=sc_pb.RequestAction())
+        client._queue(debug=sc_pb.RequestDebug())
+        assert ws.sent == []
+        # The error of the queued action does not fail the step
+        response = await client.step(4)
+        assert ws.sent == ["action", "debug", "step"]
+        assert client._queued == [] and response.HasField("status")
+
+        # Nothing to draw, nothing is queued
+        await client._send_debug(queue=True)
+        assert client._queued == []
+        client.debug_text_simple("text")
+        await client._send_debug(queue=True)
+        assert len(client._queued) == 1
+        await client.ping()
+        assert ws.sent[-2:] == ["debug", "ping"]
+        assert ws.answers == []
+
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from sc2.position import Point2
+from sc2.spatial_index import SpatialIndex, UnitsIndex
+from sc2.test_bot_ai import make_bot
+from sc2.test_units import random_units
+from sc2.units import Units
+
+
+def arm(unit, rng):
+    """ Weapons without game data """
+    unit.__dict__.update(
+        can_attack_ground=rng.random() < 0.7,
+        can_attack_air=rng.random() < 0.5,
+        ground_range=rng.choice([0.1, 5, 6]),
+        air_range=rng.choice([5, 7]),
+    )
+    return unit
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_index_queries_match_units_queries(seed):
+    rng = random.Random(seed)
+    bot = make_bot()
+    units = Units(random_units(bot, rng, rng.randint(1, 40), 1000), bot)
+    index = UnitsIndex(units)
+    position = Point2((rng.uniform(0, 32), rng.uniform(0, 32)))
+    radius = rng.uniform(1, 10)
+    assert {unit.tag for unit in index.in_radius(position, radius)} == {
+        unit.tag for unit in units.closer_than(radius + 1e-9, position)
+    }
+    n = rng.randint(1, 5)
+    assert list(index.closest_n(position, n)) == list(units.closest_n_units(position, n))
+    assert index.closest(position) is units.closest_to(position)
+
+    attacker = arm(random_units(bot, rng, 1, 9000)[0], rng)
+    assert list(index.in_attack_range_of(attacker, 1)) == list(units.in_attack_range_of(attacker, 1))
+    for unit in units:
+        arm(unit, rng)
+    threats = UnitsIndex(units).threats_to(attacker, 1)
+    assert list(threats) == [unit for unit in units if unit.target_in_range(attacker, 1)]
+
+
+def test_empty_group():
+    bot = make_bot()
+    index = UnitsIndex(Units([], bot))
+    assert len(index) == 0
+    assert not index.in_radius(Point2((0, 0)), 5)
+    assert index.closest(Point2((0, 0))) is None
+
+
+def test_trees_are_built_per_group_on_first_use():
+    rng = random.Random(0)
+    bot = make_bot()
+    bot.units = Units(random_units(bot, rng, 10, 1000), bot)
+    bot.enemy_units = Units(random_units(bot, rng, 10, 5000), bot)
+    spatial_index = SpatialIndex(bot)
+    assert spatial_index.enemy_units is spatial_index.enemy_units
+    assert "units" not in vars(spatial_index)
+    assert set(spatial_index.enemy_air.units) == set(bot.enemy_units.flying)
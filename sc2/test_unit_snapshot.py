@@ -0,0 +1,186 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+from s2clientprotocol import sc2api_pb2
+
+from sc2.bot_ai import BotAI
+from sc2.constants import IS_PLACEHOLDER, FakeEffectID
+from sc2.data import Race
+from sc2.game_state import GameState
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.test_bot_ai_internal import STRUCTURE_TYPES, UNIT_TYPES, game_data
+from sc2.units import Units
+
+NEUTRAL_TYPES = [UnitTypeId.MINERALFIELD, UnitTypeId.VESPENEGEYSER, UnitTypeId.XELNAGATOWER, UnitTypeId.DESTRUCTIBLEROCK6X6]
+GROUPS = [
+    "all_units", "units", "workers", "larva", "structures", "townhalls", "gas_buildings", "all_own_units",
+    "enemy_units", "enemy_structures", "all_enemy_units", "resources", "destructables", "watchtowers",
+    "mineral_field", "vespene_geyser", "placeholders"
+]
+EVENTS = [
+    "on_unit_created", "on_unit_destroyed", "on_unit_took_damage", "on_unit_type_changed",
+    "on_building_construction_started", "on_building_construction_complete", "on_enemy_unit_entered_vision",
+    "on_enemy_unit_left_vision"
+]
+
+
+class EventBot(BotAI):
+    """ Records every event with the tag and the type of the units involved """
+
+    def __init__(self, lazy_units: bool):
+        self.lazy_units = lazy_units
+        self.log = []
+        for name in EVENTS:
+            setattr(self, name, self._recorder(name))
+
+    def _recorder(self, name):
+
+        async def record(*args):
+            self.log.append((name, ) + tuple((arg.tag, arg.type_id) if hasattr(arg, "tag") else arg for arg in args))
+
+        return record
+
+    async def on_step(self, iteration: int):
+        pass
+
+
+def make_bot(lazy_units: bool) -> EventBot:
+    bot = EventBot(lazy_units)
+    bot._initialize_variables()
+    bot._distances_override_functions(bot.distance_calculation_method)
+    bot.game_data = game_data()
+    bot.race = Race.Terran
+    bot.enemy_race = Race.Zerg
+    return bot
+
+
+def random_frames(seed: int, count: int):
+    """ Observations of units that appear, die, take damage, morph, finish construction and leave vision """
+    rng = random.Random(seed)
+    alive = {}
+    next_tag = 1
+    for game_loop in range(count):
+        dead = []
+        for tag, unit in list(alive.items()):
+            roll = rng.random()
+            if roll < 0.04:
+                dead.append(tag)
+                del alive[tag]
+                continue
+            if roll < 0.08:
+                unit["visible"] = not unit["visible"]
+            if rng.random() < 0.2:
+                unit["health"] = max(1.0, unit["health"] - rng.randint(0, 20))
+            if rng.random() < 0.2:
+                unit["shield"] = max(0.0, unit["shield"] - rng.randint(0, 20))
+            if rng.random() < 0.05:
+                unit["health"] += 3
+            if rng.random() < 0.05 and unit["type"] in {UnitTypeId.SIEGETANK, UnitTypeId.SIEGETANKSIEGED}:
+                unit["type"] = {
+                    UnitTypeId.SIEGETANK: UnitTypeId.SIEGETANKSIEGED,
+                    UnitTypeId.SIEGETANKSIEGED: UnitTypeId.SIEGETANK
+                }[unit["type"]]
+            if rng.random() < 0.05 and unit["type"] == UnitTypeId.COMMANDCENTER:
+                unit["type"] = UnitTypeId.ORBITALCOMMAND
+            unit["build_progress"] = min(1.0, unit["build_progress"] + rng.choice([0, 0.25, 0.5]))
+        for _ in range(rng.randint(0, 6)):
+            alliance = rng.choice([1, 1, 3, 4])
+            if alliance == 3:
+                unit_type = rng.choice(NEUTRAL_TYPES)
+            else:
+                unit_type = rng.choice([t for t in STRUCTURE_TYPES + UNIT_TYPES if t not in NEUTRAL_TYPES])
+            alive[next_tag] = {
+                "type": unit_type,
+                "alliance": alliance,
+                "health": 100.0,
+                "shield": float(rng.randint(0, 50)),
+                "build_progress": rng.choice([0.0, 0.5, 1.0]),
+                "visible": True,
+                "placeholder": rng.random() < 0.05,
+                "vespene_contents": rng.choice([0, 100]) if unit_type == UnitTypeId.VESPENEGEYSER else 0,
+                "x": rng.uniform(0, 100),
+                "y": rng.uniform(0, 100),
+            }
+            next_tag += 1
+        response = sc2api_pb2.ResponseObservation()
+        observation = response.observation
+        observation.game_loop = game_loop
+        units = list(alive.items())
+        rng.shuffle(units)
+        for tag, unit in units:
+            if not unit["visible"]:
+                continue
+            proto = observation.raw_data.units.add(
+                tag=tag,
+                unit_type=unit["type"].value,
+                alliance=unit["alliance"],
+                health=unit["health"],
+                shield=unit["shield"],
+                build_progress=unit["build_progress"],
+                vespene_contents=unit["vespene_contents"],
+                display_type=IS_PLACEHOLDER if unit["placeholder"] else 1,
+            )
+            proto.pos.x, proto.pos.y = unit["x"], unit["y"]
+        observation.raw_data.units.add(tag=10**6 + game_loop, is_blip=True, alliance=4, unit_type=48)
+        observation.raw_data.units.add(tag=2 * 10**6 + game_loop, unit_type=next(iter(FakeEffectID)), alliance=4)
+        observation.raw_data.event.dead_units.extend(dead)
+        yield response
+
+
+def step(bot: BotAI, response):
+    bot._prepare_step(GameState(response))
+    asyncio.run(bot.issue_events())
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_lazy_units_match_eager_units(seed):
+    eager, lazy = make_bot(False), make_bot(True)
+    for response in random_frames(seed, 80):
+        step(eager, response)
+        step(lazy, response)
+        for name in GROUPS:
+            eager_group, lazy_group = getattr(eager, name), getattr(lazy, name)
+            assert type(eager_group) is type(lazy_group)
+            assert [unit.tag for unit in eager_group] == [unit.tag for unit in lazy_group], name
+            assert [unit.distance_calculation_index for unit in eager_group
+                   ] == [unit.distance_calculation_index for unit in lazy_group]
+        assert eager.techlab_tags == lazy.techlab_tags and eager.reactor_tags == lazy.reactor_tags
+        assert len(eager.blips) == len(lazy.blips) and len(eager.state.effects) == len(lazy.state.effects)
+        assert eager._structures_previous_map.keys() == lazy._structures_previous_map.keys()
+    assert eager.log == lazy.log and eager.log
+    assert eager._units_created == lazy._units_created
+
+
+def test_lazy_units_are_created_on_first_access():
+    bot = make_bot(True)
+    for name in EVENTS:
+        delattr(bot, name)
+    for response in random_frames(0, 30):
+        step(bot, response)
+    snapshot = bot.unit_snapshot
+    assert "units" not in vars(bot) and "enemy_units" not in vars(bot)
+    assert all(unit is None for unit in snapshot._unit_objects)
+    marines = snapshot.select(snapshot.type_id == UnitTypeId.MARINE.value)
+    assert sum(unit is not None for unit in snapshot._unit_objects) == len(marines)
+    assert [unit.tag for unit in bot.units] == sorted(int(tag) for tag in snapshot.tag[snapshot.group_rows("units")])
+    assert bot.units is bot.units
+    # Units of the snapshot are the units of the collections
+    assert all(bot.all_units[i] is snapshot.unit(i) for i in range(len(snapshot)))
+
+
+def test_snapshot_columns_and_queries():
+    bot = make_bot(False)
+    for response in random_frames(1, 10):
+        step(bot, response)
+    snapshot = bot.unit_snapshot
+    assert len(snapshot) == len(bot.all_units)
+    assert np.array_equal(snapshot.tag, [unit.tag for unit in bot.all_units])
+    assert np.array_equal(snapshot.is_structure, [unit.is_structure for unit in bot.all_units])
+    assert np.allclose(snapshot.positions, [unit.position_tuple for unit in bot.all_units])
+    own = snapshot.select(snapshot.alliance == 1)
+    assert isinstance(own, Units) and list(own) == list(bot.all_own_units)
+    unit = bot.all_units[3]
+    assert snapshot.by_tag(unit.tag) is unit
+    assert snapshot.by_tag(123456789) is None
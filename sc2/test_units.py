@@ -0,0 +1,168 @@
+import random
+
+import numpy as np
+import pytest
+from s2clientprotocol import raw_pb2, sc2api_pb2
+
+from sc2.game_data import GameData
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+from sc2.test_bot_ai import make_bot
+from sc2.unit import Unit
+from sc2.units import IndexedUnits, Units
+
+UNIT_TYPES = [UnitTypeId.MARINE, UnitTypeId.ZERGLING, UnitTypeId.COLOSSUS, UnitTypeId.MUTALISK]
+
+
+def random_units(bot, rng, count, first_tag):
+    units = []
+    for tag in range(first_tag, first_tag + count):
+        proto = raw_pb2.Unit(
+            tag=tag,
+            unit_type=rng.choice(UNIT_TYPES).value,
+            radius=rng.choice([0.375, 0.5, 1.0]),
+            is_flying=rng.random() < 0.3,
+        )
+        proto.pos.x, proto.pos.y = rng.uniform(0, 32), rng.uniform(0, 32)
+        units.append(Unit(proto, bot))
+    return units
+
+
+def distance_squared(bot, unit, target):
+    """ The per unit distance that the vectorized queries replace """
+    if isinstance(target, Unit):
+        return bot._distance_squared_unit_to_unit(unit, target)
+    return unit.position._distance_squared(target)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_distance_queries_match_per_unit_distances(seed):
+    rng = random.Random(seed)
+    bot = make_bot()
+    units = random_units(bot, rng, rng.randint(1, 30), 1000)
+    others = random_units(bot, rng, rng.randint(1, 30), 5000)
+    group, other_group = Units(units, bot), Units(others, bot)
+
+    for target in (Point2((rng.uniform(0, 32), rng.uniform(0, 32))), others[0]):
+        by_distance = sorted(units, key=lambda unit: distance_squared(bot, unit, target))
+        assert group.closest_to(target) is by_distance[0]
+        assert group.furthest_to(target) is by_distance[-1]
+        assert group.closest_distance_to(target) == pytest.approx(distance_squared(bot, by_distance[0], target)**0.5)
+        assert group.furthest_distance_to(target) == pytest.approx(distance_squared(bot, by_distance[-1], target)**0.5)
+        assert list(group.sorted_by_distance_to(target)) == by_distance
+        assert list(group.sorted_by_distance_to(target, reverse=True)) == by_distance[::-1]
+        assert list(group.closest_n_units(target, 3)) == by_distance[:3]
+        for distance in (3, 8, 15):
+            assert list(group.closer_than(distance, target)) == [
+                unit for unit in units if distance_squared(bot, unit, target) < distance**2
+            ]
+            assert list(group.further_than(distance, target)) == [
+                unit for unit in units if distance_squared(bot, unit, target) > distance**2
+            ]
+            assert list(group.in_distance_between(target, distance, distance + 5)) == [
+                unit for unit in units if distance**2 < distance_squared(bot, unit, target) < (distance + 5)**2
+            ]
+
+    for distance in (2, 6):
+        assert list(group.in_distance_of_group(other_group, distance)) == [
+            unit for unit in units if any(distance_squared(bot, unit, other) < distance**2 for other in others)
+        ]
+    closest_pair = min(units, key=lambda unit: min(distance_squared(bot, unit, other) for other in others))
+    assert group.in_closest_distance_to_group(other_group) is closest_pair
+    closest = other_group.closest_to_each(group)
+    assert all(closest[unit.tag] is other_group.closest_to(unit) for unit in units)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_in_attack_range_of_matches_target_in_range(seed):
+    rng = random.Random(seed)
+    bot = make_bot()
+    targets = random_units(bot, rng, rng.randint(1, 30), 1000)
+    attacker = random_units(bot, rng, 1, 5000)[0]
+    attacker.__dict__.update(
+        can_attack_ground=rng.random() < 0.7,
+        can_attack_air=rng.random() < 0.5,
+        ground_range=rng.choice([0.1, 5, 6]),
+        air_range=rng.choice([5, 7]),
+    )
+    for bonus_distance in (0, 2):
+        assert list(Units(targets, bot).in_attack_range_of(attacker, bonus_distance)) == [
+            target for target in targets if attacker.target_in_range(target, bonus_distance)
+        ]
+
+
+
+def test_in_place_changes_drop_the_cached_arrays():
+    rng = random.Random(0)
+    bot = make_bot()
+    units = random_units(bot, rng, 10, 1)
+    others = random_units(bot, rng, 3, 100)
+    target = Point2((0, 0))
+    mutations = [
+        lambda group: group.sort(key=lambda unit: -unit.tag),
+        lambda group: group.reverse(),
+        lambda group: group.__setitem__(0, others[0]),
+        lambda group: group.__setitem__(slice(0, 2), others[:2]),
+        lambda group: (group.remove(group[3]), group.append(others[1])),
+        lambda group: (group.pop(0), group.insert(4, others[2])),
+        lambda group: (group.__delitem__(1), group.extend(others[:1])),
+        lambda group: group.__iadd__(others),
+        lambda group: group.clear(),
+    ]
+    for mutate in mutations:
+        group = Units(units, bot)
+        # Fill the caches before the change
+        group.closest_to(target)
+        group._state_columns  # pylint: disable=W0104
+        mutate(group)
+        assert np.array_equal(group._positions, np.array([unit.position_tuple for unit in group]).reshape(-1, 2))
+        assert np.array_equal(group._radii, [unit.radius for unit in group])
+        assert list(group._state_columns[0]) == [unit.tag for unit in group]
+        if group:
+            expected = min(group, key=lambda unit: unit.position._distance_squared(target))
+            assert group.closest_to(target) is expected
+
+
+# unit type: (unit alias, tech aliases)
+ALIASES = {
+    UnitTypeId.MARINE: (None, []),
+    UnitTypeId.SIEGETANK: (None, []),
+    UnitTypeId.SIEGETANKSIEGED: (UnitTypeId.SIEGETANK, []),
+    UnitTypeId.COMMANDCENTER: (None, []),
+    UnitTypeId.COMMANDCENTERFLYING: (UnitTypeId.COMMANDCENTER, []),
+    UnitTypeId.ORBITALCOMMAND: (None, [UnitTypeId.COMMANDCENTER]),
+    UnitTypeId.ROACH: (None, []),
+    UnitTypeId.ROACHBURROWED: (UnitTypeId.ROACH, []),
+}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_indexed_units_match_filtering_units(seed):
+    rng = random.Random(seed)
+    bot = make_bot()
+    data = sc2api_pb2.ResponseData()
+    for unit_type, (unit_alias, tech_aliases) in ALIASES.items():
+        unit_data = data.units.add(
+            unit_id=unit_type.value, name=unit_type.name, available=True, unit_alias=unit_alias.value if unit_alias else 0
+        )
+        unit_data.tech_alias.extend(alias.value for alias in tech_aliases)
+    bot.game_data = GameData(data)
+    types = list(ALIASES)
+    units = [Unit(raw_pb2.Unit(tag=tag, unit_type=rng.choice(types).value), bot) for tag in range(rng.randint(0, 60))]
+    filtering, indexed = Units(units, bot), IndexedUnits(units, bot)
+
+    for query in (rng.choice(types), set(rng.sample(types, 3)), [rng.choice(types)], {UnitTypeId.ZEALOT}):
+        assert list(filtering(query)) == list(indexed(query))
+        assert list(filtering.of_type(query)) == list(indexed.of_type(query))
+    for query in (UnitTypeId.SIEGETANK, UnitTypeId.COMMANDCENTER, {UnitTypeId.ROACHBURROWED, UnitTypeId.MARINE}):
+        assert list(filtering.same_unit(query)) == list(indexed.same_unit(query))
+    for query in ({UnitTypeId.COMMANDCENTER}, {UnitTypeId.ORBITALCOMMAND}, {UnitTypeId.MARINE}):
+        assert list(filtering.same_tech(query)) == list(indexed.same_tech(query))
+    assert type(indexed(UnitTypeId.MARINE)) is Units
+    # The index is rebuilt after in-place changes, also if the length stays the same
+    indexed.append(Unit(raw_pb2.Unit(tag=999, unit_type=UnitTypeId.MARINE.value), bot))
+    assert indexed(UnitTypeId.MARINE)[-1].tag == 999
+    indexed.sort(key=lambda unit: -unit.tag)
+    indexed[-1] = Unit(raw_pb2.Unit(tag=1000, unit_type=UnitTypeId.ROACH.value), bot)
+    for unit_type in types:
+        assert list(indexed(unit_type)) == [unit for unit in indexed if unit.type_id == unit_type]
@@ -0,0 +1,340 @@
+# pylint: disable=W0212
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from sc2.constants import ALL_GAS, IS_PLACEHOLDER, geyser_ids, mineral_ids
+from sc2.data import Alliance, race_townhalls
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import IndexedUnits, Units
+
+if TYPE_CHECKING:
+    from sc2.bot_ai import BotAI
+
+
+# Column name: (proto getter, dtype)
+_COLUMNS = {
+    "tag": (lambda proto: proto.tag, np.uint64),
+    "type_id": (lambda proto: proto.unit_type, np.int32),
+    "alliance": (lambda proto: proto.alliance, np.int8),
+    "display_type": (lambda proto: proto.display_type, np.int8),
+    "x": (lambda proto: proto.pos.x, np.float32),
+    "y": (lambda proto: proto.pos.y, np.float32),
+    "z": (lambda proto: proto.pos.z, np.float32),
+    "health": (lambda proto: proto.health, np.float32),
+    "health_max": (lambda proto: proto.health_max, np.float32),
+    "shield": (lambda proto: proto.shield, np.float32),
+    "shield_max": (lambda proto: proto.shield_max, np.float32),
+    "energy": (lambda proto: proto.energy, np.float32),
+    "radius": (lambda proto: proto.radius, np.float32),
+    "build_progress": (lambda proto: proto.build_progress, np.float32),
+    "vespene_contents": (lambda proto: proto.vespene_contents, np.int32),
+    "is_flying": (lambda proto: proto.is_flying, bool),
+    "is_burrowed": (lambda proto: proto.is_burrowed, bool),
+}
+_MINERAL_TYPES = list(mineral_ids)
+_GEYSER_TYPES = list(geyser_ids)
+_GAS_TYPES = [unit_type.value for unit_type in ALL_GAS]
+_WORKER_TYPES = [UnitTypeId.DRONE.value, UnitTypeId.DRONEBURROWED.value, UnitTypeId.SCV.value, UnitTypeId.PROBE.value]
+_TECHLAB_TYPES = [
+    UnitTypeId.TECHLAB.value,
+    UnitTypeId.BARRACKSTECHLAB.value,
+    UnitTypeId.FACTORYTECHLAB.value,
+    UnitTypeId.STARPORTTECHLAB.value,
+]
+_REACTOR_TYPES = [
+    UnitTypeId.REACTOR.value,
+    UnitTypeId.BARRACKSREACTOR.value,
+    UnitTypeId.FACTORYREACTOR.value,
+    UnitTypeId.STARPORTREACTOR.value,
+]
+# Collections that _prepare_units creates as IndexedUnits
+_INDEXED_GROUPS = {
+    "all_units", "units", "structures", "all_own_units", "enemy_units", "enemy_structures", "all_enemy_units"
+}
+
+
+class UnitSnapshot:
+    """Struct-of-arrays view of all units of one frame, available as BotAI.unit_snapshot.
+    Every column is a numpy array with one row per unit of self.all_units (same order, row i is all_units[i]),
+    so filters on type, alliance, flags or values are array operations and only the selected rows are turned into Units.
+
+    Columns (decoded on first access): tag, type_id, alliance, display_type, x, y, z, health, health_max, shield,
+    shield_max, energy, radius, build_progress, vespene_contents, is_flying, is_burrowed, is_structure
+
+    With BotAI.lazy_units the snapshot is built straight from the raw unit protos in _prepare_units (see from_raw),
+    Unit objects are only created for the rows that are used and the unit collections like self.units are only
+    built on first access, see group().
+
+    Example::
+
+        snapshot = self.unit_snapshot
+        wounded = snapshot.select(
+            (snapshot.alliance == Alliance.Self.value) & (snapshot.health < 0.3 * snapshot.health_max)
+        )
+    """
+
+    def __init__(self, bot_object: BotAI, protos: Optional[List] = None):
+        """
+        :param bot_object:
+        :param protos: Raw unit protos of the rows, see from_raw. Defaults to the protos of bot_object.all_units
+        """
+        self._bot_object = bot_object
+        if protos is None:
+            self._units: Optional[Units] = bot_object.all_units
+            protos = [unit._proto for unit in self._units]
+        else:
+            self._units = None
+        self._protos = protos
+        self._unit_objects: List[Optional[Unit]] = [None] * len(protos)
+        self._groups: Dict[str, Union[Units, Set[int]]] = {}
+        self._group_rows: Dict[str, np.ndarray] = {}
+        self._tag_order: Optional[np.ndarray] = None
+        self._sorted_tags: Optional[np.ndarray] = None
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        """Decodes a column from the protos on first access, columns that are never used are never decoded"""
+        if name == "is_structure":
+            types = np.unique(self.type_id)
+            column = np.isin(self.type_id, [t for t in types.tolist() if self._bot_object._is_structure_type(t)])
+        elif name in _COLUMNS:
+            getter, dtype = _COLUMNS[name]
+            protos = self._protos
+            column = np.fromiter((getter(proto) for proto in protos), dtype=dtype, count=len(protos))
+        else:
+            raise AttributeError(name)
+        setattr(self, name, column)
+        return column
+
+    @classmethod
+    def from_raw(cls, bot_object: BotAI, protos: List) -> UnitSnapshot:
+        """Snapshot of raw unit protos (without blips and fake effects), row i becomes all_units[i].
+        No Unit object is created here, see unit().
+
+        :param bot_object:
+        :param protos:
+        """
+        return cls(bot_object, protos)
+
+    def __len__(self) -> int:
+        return len(self._protos)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ (n, 2) array of the x and y columns """
+        return np.column_stack((self.x, self.y))
+
+    def select(self, rows: Union[np.ndarray, Iterable[int]]) -> Units:
+        """Returns the units of the given rows, either a boolean mask or row indices.
+
+        :param rows:
+        """
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            rows = np.flatnonzero(rows)
+        return Units((self.unit(row) for row in rows.tolist()), self._bot_object)
+
+    def unit(self, row: int) -> Unit:
+        """Returns the unit of the given row, the Unit object is created on first use.
+
+        :param row:
+        """
+        if self._units is not None:
+            return self._units[row]
+        unit = self._unit_objects[row]
+        if unit is None:
+            bot_object = self._bot_object
+            unit = Unit(self._protos[row], bot_object, distance_calculation_index=row, base_build=bot_object.base_build)
+            self._unit_objects[row] = unit
+        return unit
+
+    def mask(
+        self,
+        type_ids: Union[UnitTypeId, Iterable[UnitTypeId], None] = None,
+        alliance: Union[Alliance, int, None] = None,
+        flying: Optional[bool] = None,
+        structure: Optional[bool] = None,
+    ) -> np.ndarray:
+        """Boolean row mask combining the given filters, None means no filter.
+
+        Example::
+
+            enemy_air = self.unit_snapshot.mask(alliance=Alliance.Enemy, flying=True, structure=False)
+
+        :param type_ids:
+        :param alliance:
+        :param flying:
+        :param structure:
+        """
+        result = np.ones(len(self), dtype=bool)
+        if type_ids is not None:
+            if isinstance(type_ids, UnitTypeId):
+                type_ids = {type_ids}
+            result &= np.isin(self.type_id, [type_id.value for type_id in type_ids])
+        if alliance is not None:
+            result &= self.alliance == getattr(alliance, "value", alliance)
+        if flying is not None:
+            result &= self.is_flying == flying
+        if structure is not None:
+            result &= self.is_structure == structure
+        return result
+
+    def of_type(
+        self, type_ids: Union[UnitTypeId, Iterable[UnitTypeId]], alliance: Union[Alliance, int, None] = None
+    ) -> Units:
+        """Returns the units of the given types, optionally only of one alliance.
+
+        :param type_ids:
+        :param alliance:
+        """
+        return self.select(self.mask(type_ids=type_ids, alliance=alliance))
+
+    def row_of(self, tag: int) -> Optional[int]:
+        """Returns the row of the unit with the given tag, or None. Uses a binary search over the sorted tags.
+
+        :param tag:
+        """
+        if self._tag_order is None:
+            self._tag_order = np.argsort(self.tag)
+            self._sorted_tags = self.tag[self._tag_order]
+        sorted_tags = self._sorted_tags
+        position = int(np.searchsorted(sorted_tags, np.uint64(tag)))
+        if position < len(sorted_tags) and sorted_tags[position] == tag:
+            return int(self._tag_order[position])
+        return None
+
+    def by_tag(self, tag: int) -> Optional[Unit]:
+        """Returns the unit with the given tag, or None.
+
+        :param tag:
+        """
+        row = self.row_of(tag)
+        return None if row is None else self.unit(row)
+
+    def group_rows(self, name: str) -> np.ndarray:
+        """Rows of the BotAI unit collection 'name' (e.g. "units", "enemy_structures", "mineral_field"),
+        in the order _prepare_units fills the collection.
+
+        :param name:
+        """
+        rows = self._group_rows.get(name)
+        if rows is None:
+            rows = self._compute_group_rows(name)
+            self._group_rows[name] = rows
+        return rows
+
+    def _compute_group_rows(self, name: str) -> np.ndarray:
+        bot_object = self._bot_object
+        is_unit = self.display_type != IS_PLACEHOLDER
+        if name == "all_units":
+            return np.arange(len(self))
+        if name == "placeholders":
+            return np.flatnonzero(~is_unit)
+        neutral = is_unit & (self.alliance == Alliance.Neutral.value)
+        own = is_unit & (self.alliance == Alliance.Self.value)
+        enemy = is_unit & (self.alliance == Alliance.Enemy.value)
+        if name in {"watchtowers", "mineral_field", "vespene_geyser", "resources", "destructables"}:
+            watchtower = self.type_id == UnitTypeId.XELNAGATOWER.value
+            mineral = np.isin(self.type_id, _MINERAL_TYPES)
+            geyser = np.isin(self.type_id, _GEYSER_TYPES)
+            mask = {
+                "watchtowers": watchtower,
+                "mineral_field": mineral,
+                "vespene_geyser": geyser,
+                "resources": mineral | geyser,
+                "destructables": ~(watchtower | mineral | geyser),
+            }[name]
+            return np.flatnonzero(neutral & mask)
+        if name in {"all_own_units", "units", "workers", "larva"}:
+            mask = own
+            if name != "all_own_units":
+                mask = mask & ~self.is_structure
+            if name == "workers":
+                mask &= np.isin(self.type_id, _WORKER_TYPES)
+            elif name == "larva":
+                mask &= self.type_id == UnitTypeId.LARVA.value
+            rows = np.flatnonzero(mask)
+            if name == "units":
+                # self.units is sorted by tag
+                rows = rows[np.argsort(self.tag[rows], kind="stable")]
+            return rows
+        if name in {"structures", "townhalls", "gas_buildings", "techlab_tags", "reactor_tags"}:
+            structure = own & self.is_structure
+            if name == "structures":
+                return np.flatnonzero(structure)
+            townhall = np.isin(self.type_id, [unit_type.value for unit_type in race_townhalls[bot_object.race]])
+            gas = ~townhall & (np.isin(self.type_id, _GAS_TYPES) |
+                               (self.vespene_contents > 0))
+            mask = {
+                "townhalls": townhall,
+                "gas_buildings": gas,
+                "techlab_tags": ~townhall & ~gas & np.isin(self.type_id, _TECHLAB_TYPES),
+                "reactor_tags": ~townhall & ~gas & np.isin(self.type_id, _REACTOR_TYPES),
+            }[name]
+            return np.flatnonzero(structure & mask)
+        if name in {"all_enemy_units", "enemy_units", "enemy_structures"}:
+            mask = {
+                "all_enemy_units": enemy,
+                "enemy_units": enemy & ~self.is_structure,
+                "enemy_structures": enemy & self.is_structure,
+            }[name]
+            return np.flatnonzero(mask)
+        raise KeyError(name)
+
+    def group(self, name: str) -> Union[Units, Set[int]]:
+        """The BotAI unit collection 'name' built from the rows of group_rows, cached for the frame.
+        techlab_tags and reactor_tags are sets of tags like in BotAI.
+
+        :param name:
+        """
+        group = self._groups.get(name)
+        if group is None:
+            rows = self.group_rows(name).tolist()
+            if name in {"techlab_tags", "reactor_tags"}:
+                group = {int(self.tag[row]) for row in rows}
+            else:
+                units_class = IndexedUnits if name in _INDEXED_GROUPS else Units
+                group = units_class((self.unit(row) for row in rows), self._bot_object)
+            self._groups[name] = group
+        return group
+
+    def rows_view(self, name: str) -> SnapshotRows:
+        """ The rows of the unit collection 'name' as SnapshotRows, without creating the collection """
+        return SnapshotRows(self, self.group_rows(name))
+
+
+class SnapshotRows:
+    """Some rows of a UnitSnapshot that behave like a Units group for the event detection in BotAI.issue_events:
+    len(), indexing (creates the Unit of that row only) and the _state_columns of Units."""
+
+    def __init__(self, snapshot: UnitSnapshot, rows: np.ndarray):
+        """
+        :param snapshot:
+        :param rows:
+        """
+        self._snapshot = snapshot
+        self._rows = rows
+        self._cached_state_columns: Optional[Tuple[np.ndarray, ...]] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> Unit:
+        return self._snapshot.unit(int(self._rows[index]))
+
+    @property
+    def _state_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """ (tags, unit types, health, shield, build progress) like Units._state_columns """
+        if self._cached_state_columns is None:
+            snapshot, rows = self._snapshot, self._rows
+            self._cached_state_columns = (
+                snapshot.tag[rows],
+                snapshot.type_id[rows].astype(np.int64),
+                snapshot.health[rows].astype(float),
+                snapshot.shield[rows].astype(float),
+                snapshot.build_progress[rows].astype(float),
+            )
+        return self._cached_state_columns
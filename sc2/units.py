@@ -3,10 +3,13 @@ from __future__ import annotations
 
 import random
 from itertools import chain
-from typing import TYPE_CHECKING, Any, Callable, Generator, Iterable, List, Optional, Set, Tuple, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Generator, Iterable, List, Optional, Set, Tuple, Union
 
+import numpy as np
+
+from sc2.constants import UNIT_COLOSSUS
 from sc2.ids.unit_typeid import UnitTypeId
-from sc2.position import Point2
+from sc2.position import Point2, Points
 from sc2.unit import Unit
 
 if TYPE_CHECKING:
@@ -29,6 +32,67 @@ class Units(list):
         """
         super().__init__(units)
         self._bot_object = bot_object
+        # Lazily built position and radius arrays used by the vectorized distance queries, see _positions
+        self._cached_positions: Optional[np.ndarray] = None
+        self._cached_radii: Optional[np.ndarray] = None
+        self._cached_state_columns: Optional[Tuple[np.ndarray, ...]] = None
+
+    def _invalidate_caches(self):
+        """Drops the arrays built from the units, called by every in-place change of the list."""
+        self._cached_positions = None
+        self._cached_radii = None
+        self._cached_state_columns = None
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._invalidate_caches()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._invalidate_caches()
+
+    def __iadd__(self, other: Iterable[Unit]) -> Units:
+        result = super().__iadd__(other)
+        self._invalidate_caches()
+        return result
+
+    def __imul__(self, n: int) -> Units:
+        result = super().__imul__(n)
+        self._invalidate_caches()
+        return result
+
+    def append(self, unit: Unit):
+        super().append(unit)
+        self._invalidate_caches()
+
+    def extend(self, units: Iterable[Unit]):
+        super().extend(units)
+        self._invalidate_caches()
+
+    def insert(self, index: int, unit: Unit):
+        super().insert(index, unit)
+        self._invalidate_caches()
+
+    def pop(self, index: int = -1) -> Unit:
+        unit = super().pop(index)
+        self._invalidate_caches()
+        return unit
+
+    def remove(self, unit: Unit):
+        super().remove(unit)
+        self._invalidate_caches()
+
+    def clear(self):
+        super().clear()
+        self._invalidate_caches()
+
+    def sort(self, *args, **kwargs):
+        super().sort(*args, **kwargs)
+        self._invalidate_caches()
+
+    def reverse(self):
+        super().reverse()
+        self._invalidate_caches()
 
     def __call__(self, unit_types: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
         """Creates a new mutable Units object from Units or list object.
@@ -151,6 +215,59 @@ class Units(list):
             return self
         return self.subgroup(random.sample(self, n))
 
+    @property
+    def _positions(self) -> np.ndarray:
+        """(n, 2) array of the unit positions, built on first use and reused by all distance queries on this object.
+        Units objects are recreated every frame, in-place changes of the list drop it, see _invalidate_caches."""
+        if self._cached_positions is None:
+            self._cached_positions = np.array([unit.position_tuple for unit in self], dtype=float).reshape(-1, 2)
+        return self._cached_positions
+
+    @property
+    def _radii(self) -> np.ndarray:
+        """(n,) array of the unit radii, built on first use."""
+        if self._cached_radii is None:
+            self._cached_radii = np.array([unit.radius for unit in self], dtype=float)
+        return self._cached_radii
+
+    @property
+    def _state_columns(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """(tags, unit types, health, shield, build progress) arrays in the order of this group, built on first use.
+        Used to diff this frame against the previous one in BotAI.issue_events."""
+        if self._cached_state_columns is None:
+            n = len(self)
+            protos = [unit._proto for unit in self]
+            self._cached_state_columns = (
+                np.fromiter((proto.tag for proto in protos), dtype=np.uint64, count=n),
+                np.fromiter((proto.unit_type for proto in protos), dtype=np.int64, count=n),
+                np.fromiter((proto.health for proto in protos), dtype=float, count=n),
+                np.fromiter((proto.shield for proto in protos), dtype=float, count=n),
+                np.fromiter((proto.build_progress for proto in protos), dtype=float, count=n),
+            )
+        return self._cached_state_columns
+
+    def _distances_squared_to(self, position: Union[Unit, Point2, Tuple[float, float]]) -> np.ndarray:
+        """Squared distances of all units in this group to the given unit or position, in the order of this group.
+
+        :param position:
+        """
+        if isinstance(position, Unit):
+            position = position.position_tuple
+        difference = self._positions - (position[0], position[1])
+        return np.einsum("ij,ij->i", difference, difference)
+
+    def _distances_squared_to_group(self, other_units: Units) -> np.ndarray:
+        """(len(self), len(other_units)) matrix of squared distances between the two groups.
+
+        :param other_units:
+        """
+        difference = self._positions[:, None, :] - other_units._positions[None, :, :]
+        return np.einsum("ijk,ijk->ij", difference, difference)
+
+    def _compress(self, mask: np.ndarray) -> Units:
+        """Returns the units for which mask is True, keeping the order of this group."""
+        return self.subgroup(unit for unit, keep in zip(self, mask) if keep)
+
     def in_attack_range_of(self, unit: Unit, bonus_distance: float = 0) -> Units:
         """Filters units that are in attack range of the given unit.
         This uses the unit and target unit.radius when calculating the distance, so it should be accurate.
@@ -174,7 +291,16 @@ class Units(list):
         :param unit:
         :param bonus_distance:
         """
-        return self.filter(lambda x: unit.target_in_range(x, bonus_distance=bonus_distance))
+        if not self:
+            return self
+        flying = np.array([target.is_flying for target in self], dtype=bool)
+        colossus = np.array([target.type_id == UNIT_COLOSSUS for target in self], dtype=bool)
+        # Same rules as Unit.target_in_range, evaluated for all targets at once
+        ground = ~flying if unit.can_attack_ground else np.zeros(len(self), dtype=bool)
+        air = (flying | colossus) & ~ground if unit.can_attack_air else np.zeros(len(self), dtype=bool)
+        attack_range = np.where(ground, unit.ground_range, unit.air_range)
+        max_distance = unit.radius + self._radii + attack_range + bonus_distance
+        return self._compress((ground | air) & (self._distances_squared_to(unit) <= max_distance**2))
 
     def closest_distance_to(self, position: Union[Unit, Point2]) -> float:
         """Returns the distance between the closest unit from this group to the target unit.
@@ -190,9 +316,7 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
-        if isinstance(position, Unit):
-            return min(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
-        return min(self._bot_object._distance_units_to_pos(self, position))
+        return float(self._distances_squared_to(position).min())**0.5
 
     def furthest_distance_to(self, position: Union[Unit, Point2]) -> float:
         """Returns the distance between the furthest unit from this group to the target unit
@@ -209,9 +333,7 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
-        if isinstance(position, Unit):
-            return max(self._bot_object._distance_squared_unit_to_unit(unit, position) for unit in self)**0.5
-        return max(self._bot_object._distance_units_to_pos(self, position))
+        return float(self._distances_squared_to(position).max())**0.5
 
     def closest_to(self, position: Union[Unit, Point2]) -> Unit:
         """Returns the closest unit (from this Units object) to the target unit or position.
@@ -227,14 +349,7 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
-        if isinstance(position, Unit):
-            return min(
-                (unit1 for unit1 in self),
-                key=lambda unit2: self._bot_object._distance_squared_unit_to_unit(unit2, position),
-            )
-
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        return min(((unit, dist) for unit, dist in zip(self, distances)), key=lambda my_tuple: my_tuple[1])[0]
+        return self[int(self._distances_squared_to(position).argmin())]
 
     def furthest_to(self, position: Union[Unit, Point2]) -> Unit:
         """Returns the furhest unit (from this Units object) to the target unit or position.
@@ -250,13 +365,26 @@ class Units(list):
         :param position:
         """
         assert self, "Units object is empty"
-        if isinstance(position, Unit):
-            return max(
-                (unit1 for unit1 in self),
-                key=lambda unit2: self._bot_object._distance_squared_unit_to_unit(unit2, position),
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        return max(((unit, dist) for unit, dist in zip(self, distances)), key=lambda my_tuple: my_tuple[1])[0]
+        return self[int(self._distances_squared_to(position).argmax())]
+
+    def closest_to_each(self, units: Units) -> Dict[int, Unit]:
+        """Returns the closest unit of this group for every unit in 'units', computed in one vectorized pass.
+        Use this instead of calling closest_to() inside a loop over your own units.
+
+        Example::
+
+            if self.enemy_units:
+                closest_enemy = self.enemy_units.closest_to_each(self.units)
+                for unit in self.units:
+                    unit.attack(closest_enemy[unit.tag])
+
+        :param units:
+        :return: Dict of unit tag (from 'units') to the closest unit of this group
+        """
+        if not self or not units:
+            return {}
+        closest = self._distances_squared_to_group(units).argmin(axis=0)
+        return {unit.tag: self[int(index)] for unit, index in zip(units, closest)}
 
     def closer_than(self, distance: float, position: Union[Unit, Point2]) -> Units:
         """Returns all units (from this Units object) that are closer than 'distance' away from target unit or position.
@@ -274,14 +402,7 @@ class Units(list):
         """
         if not self:
             return self
-        if isinstance(position, Unit):
-            distance_squared = distance**2
-            return self.subgroup(
-                unit for unit in self
-                if self._bot_object._distance_squared_unit_to_unit(unit, position) < distance_squared
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        return self.subgroup(unit for unit, dist in zip(self, distances) if dist < distance)
+        return self._compress(self._distances_squared_to(position) < distance**2)
 
     def further_than(self, distance: float, position: Union[Unit, Point2]) -> Units:
         """Returns all units (from this Units object) that are further than 'distance' away from target unit or position.
@@ -299,14 +420,7 @@ class Units(list):
         """
         if not self:
             return self
-        if isinstance(position, Unit):
-            distance_squared = distance**2
-            return self.subgroup(
-                unit for unit in self
-                if distance_squared < self._bot_object._distance_squared_unit_to_unit(unit, position)
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        return self.subgroup(unit for unit, dist in zip(self, distances) if distance < dist)
+        return self._compress(distance**2 < self._distances_squared_to(position))
 
     def in_distance_between(
         self, position: Union[Unit, Point2, Tuple[float, float]], distance1: float, distance2: float
@@ -327,15 +441,8 @@ class Units(list):
         """
         if not self:
             return self
-        if isinstance(position, Unit):
-            distance1_squared = distance1**2
-            distance2_squared = distance2**2
-            return self.subgroup(
-                unit for unit in self if
-                distance1_squared < self._bot_object._distance_squared_unit_to_unit(unit, position) < distance2_squared
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        return self.subgroup(unit for unit, dist in zip(self, distances) if distance1 < dist < distance2)
+        distances_squared = self._distances_squared_to(position)
+        return self._compress((distance1**2 < distances_squared) & (distances_squared < distance2**2))
 
     def closest_n_units(self, position: Union[Unit, Point2], n: int) -> Units:
         """Returns the n closest units in distance to position.
@@ -383,21 +490,7 @@ class Units(list):
         # Return self because there are no enemies
         if not self:
             return self
-        distance_squared = distance**2
-        if len(self) == 1:
-            if any(
-                self._bot_object._distance_squared_unit_to_unit(self[0], target) < distance_squared
-                for target in other_units
-            ):
-                return self
-            return self.subgroup([])
-
-        return self.subgroup(
-            self_unit for self_unit in self if any(
-                self._bot_object._distance_squared_unit_to_unit(self_unit, other_unit) < distance_squared
-                for other_unit in other_units
-            )
-        )
+        return self._compress(self._distances_squared_to_group(other_units).min(axis=1) < distance**2)
 
     def in_closest_distance_to_group(self, other_units: Units) -> Unit:
         """Returns unit in shortest distance from any unit in self to any unit in group.
@@ -408,11 +501,7 @@ class Units(list):
         """
         assert self, "Units object is empty"
         assert other_units, "Given units object is empty"
-        return min(
-            self,
-            key=lambda self_unit:
-            min(self._bot_object._distance_squared_unit_to_unit(self_unit, other_unit) for other_unit in other_units),
-        )
+        return self[int(self._distances_squared_to_group(other_units).min(axis=1).argmin())]
 
     def _list_sorted_closest_to_distance(self, position: Union[Unit, Point2], distance: float) -> List[Unit]:
         """This function should be a bit faster than using units.sorted(key=lambda u: u.distance_to(position))
@@ -420,15 +509,8 @@ class Units(list):
         :param position:
         :param distance:
         """
-        if isinstance(position, Unit):
-            return sorted(
-                self,
-                key=lambda unit: abs(self._bot_object._distance_squared_unit_to_unit(unit, position) - distance),
-                reverse=True,
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        unit_dist_dict = {unit.tag: dist for unit, dist in zip(self, distances)}
-        return sorted(self, key=lambda unit2: abs(unit_dist_dict[unit2.tag] - distance), reverse=True)
+        deviation = np.abs(np.sqrt(self._distances_squared_to(position)) - distance)
+        return [self[int(index)] for index in np.argsort(-deviation, kind="stable")]
 
     def n_closest_to_distance(self, position: Point2, distance: float, n: int) -> Units:
         """Returns n units that are the closest to distance away.
@@ -487,13 +569,10 @@ class Units(list):
         :param position:
         :param reverse:
         """
-        if isinstance(position, Unit):
-            return sorted(
-                self, key=lambda unit: self._bot_object._distance_squared_unit_to_unit(unit, position), reverse=reverse
-            )
-        distances = self._bot_object._distance_units_to_pos(self, position)
-        unit_dist_dict = {unit.tag: dist for unit, dist in zip(self, distances)}
-        return sorted(self, key=lambda unit2: unit_dist_dict[unit2.tag], reverse=reverse)
+        distances_squared = self._distances_squared_to(position)
+        # Stable sort on the negated key matches sorted(..., reverse=True) for ties
+        order = np.argsort(-distances_squared if reverse else distances_squared, kind="stable")
+        return [self[int(index)] for index in order]
 
     def sorted_by_distance_to(self, position: Union[Unit, Point2], reverse: bool = False) -> Units:
         """This function should be a bit faster than using units.sorted(key=lambda u: u.distance_to(position))
@@ -590,15 +669,20 @@ class Units(list):
             "Please use a set as this filter function is already fairly slow. For example" +
             " 'self.units.same_tech({UnitTypeId.LAIR})'"
         )
+        tech_alias_types = self._tech_alias_types(other)
+        return self.filter(
+            lambda unit: unit._proto.unit_type in tech_alias_types or
+            any(same in tech_alias_types for same in unit._type_data._proto.tech_alias)
+        )
+
+    def _tech_alias_types(self, other: Set[UnitTypeId]) -> Set[int]:
+        """ The given types and their tech aliases, see same_tech """
         tech_alias_types: Set[int] = {u.value for u in other}
         unit_data = self._bot_object.game_data.units
         for unit_type in other:
             for same in unit_data[unit_type.value]._proto.tech_alias:
                 tech_alias_types.add(same)
-        return self.filter(
-            lambda unit: unit._proto.unit_type in tech_alias_types or
-            any(same in tech_alias_types for same in unit._type_data._proto.tech_alias)
-        )
+        return tech_alias_types
 
     def same_unit(self, other: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
         """Returns all units that have the same base unit while being in different modes.
@@ -620,6 +704,14 @@ class Units(list):
 
         :param other:
         """
+        unit_alias_types = self._unit_alias_types(other)
+        return self.filter(
+            lambda unit: unit._proto.unit_type in unit_alias_types or unit._type_data._proto.unit_alias in
+            unit_alias_types
+        )
+
+    def _unit_alias_types(self, other: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Set[int]:
+        """ The given types and their unit aliases, see same_unit """
         if isinstance(other, UnitTypeId):
             other = {other}
         unit_alias_types: Set[int] = {u.value for u in other}
@@ -627,21 +719,18 @@ class Units(list):
         for unit_type in other:
             unit_alias_types.add(unit_data[unit_type.value]._proto.unit_alias)
         unit_alias_types.discard(0)
-        return self.filter(
-            lambda unit: unit._proto.unit_type in unit_alias_types or unit._type_data._proto.unit_alias in
-            unit_alias_types
-        )
+        return unit_alias_types
 
     @property
     def center(self) -> Point2:
         """ Returns the central position of all units. """
         assert self, "Units object is empty"
-        return Point2(
-            (
-                sum(unit._proto.pos.x for unit in self) / self.amount,
-                sum(unit._proto.pos.y for unit in self) / self.amount,
-            )
-        )
+        return Point2(self._positions.mean(axis=0).tolist())
+
+    @property
+    def points(self) -> Points:
+        """ Positions of all units as one array-backed Points object, see Points """
+        return Points.from_units(self)
 
     @property
     def selected(self) -> Units:
@@ -733,3 +822,85 @@ class Units(list):
     def prefer_idle(self) -> Units:
         """ Sorts units based on if they are idle. Idle units come first. """
         return self.sorted(lambda unit: unit.is_idle, reverse=True)
+
+
+class IndexedUnits(Units):
+    """The unit collections of BotAI that are rebuilt every frame (self.units, self.structures, self.enemy_units, ...).
+    On the first type selection in a frame, a {unit type: positions} index is built in one pass,
+    after that of_type / __call__, same_unit and same_tech only touch the matching units instead of filtering the whole group.
+    Results are plain Units in the order of this collection, like the filtering versions.
+
+    Example::
+
+        # One pass over self.units for the index, then O(result) per call
+        tanks = self.units({UnitTypeId.SIEGETANK, UnitTypeId.SIEGETANKSIEGED})
+        marines = self.units(UnitTypeId.MARINE)
+    """
+
+    def __init__(self, units: Iterable[Unit], bot_object: BotAI):
+        """
+        :param units:
+        :param bot_object:
+        """
+        super().__init__(units, bot_object)
+        self._cached_type_index: Optional[Dict[int, List[int]]] = None
+
+    def _invalidate_caches(self):
+        super()._invalidate_caches()
+        self._cached_type_index = None
+
+    @property
+    def _type_index(self) -> Dict[int, List[int]]:
+        """{unit type value: positions in this collection}, dropped by in-place changes like _positions."""
+        if self._cached_type_index is None:
+            index: Dict[int, List[int]] = {}
+            for position, unit in enumerate(self):
+                index.setdefault(unit._proto.unit_type, []).append(position)
+            self._cached_type_index = index
+        return self._cached_type_index
+
+    def _select_types(self, type_values: Iterable[int]) -> Units:
+        """ Units of the given type values, in the order of this collection """
+        index = self._type_index
+        buckets = [index[type_value] for type_value in type_values if type_value in index]
+        if not buckets:
+            return Units([], self._bot_object)
+        positions = buckets[0] if len(buckets) == 1 else sorted(chain.from_iterable(buckets))
+        return Units([self[position] for position in positions], self._bot_object)
+
+    def of_type(self, other: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
+        """Filters all units that are of a specific type, see Units.of_type
+
+        :param other:
+        """
+        if isinstance(other, UnitTypeId):
+            return self._select_types((other.value, ))
+        return self._select_types({unit_type.value for unit_type in other if isinstance(unit_type, UnitTypeId)})
+
+    def same_tech(self, other: Set[UnitTypeId]) -> Units:
+        """Returns all structures that have the same base structure, see Units.same_tech
+
+        :param other:
+        """
+        assert isinstance(other, set), (
+            "Please use a set as this filter function is already fairly slow. For example" +
+            " 'self.units.same_tech({UnitTypeId.LAIR})'"
+        )
+        tech_alias_types = self._tech_alias_types(other)
+        unit_data = self._bot_object.game_data.units
+        return self._select_types(
+            type_value for type_value in self._type_index if type_value in tech_alias_types
+            or any(same in tech_alias_types for same in unit_data[type_value]._proto.tech_alias)
+        )
+
+    def same_unit(self, other: Union[UnitTypeId, Iterable[UnitTypeId]]) -> Units:
+        """Returns all units that have the same base unit while being in different modes, see Units.same_unit
+
+        :param other:
+        """
+        unit_alias_types = self._unit_alias_types(other)
+        unit_data = self._bot_object.game_data.units
+        return self._select_types(
+            type_value for type_value in self._type_index
+            if type_value in unit_alias_types or unit_data[type_value]._proto.unit_alias in unit_alias_types
+        )
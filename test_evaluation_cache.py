@@ -0,0 +1,51 @@
+import pytest
+
+import evaluation_cache
+from evaluation_cache import evaluation_key, load_evaluation, normalize_code, save_evaluation
+
+CODE = '''
+class BattleBot:
+    async def on_step(self, iteration):
+        await self.attack()
+'''
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(evaluation_cache, 'cache_dir', str(tmp_path / 'eval_cache'))
+    monkeypatch.setattr(evaluation_cache, 'map_digest', lambda map_name: 'digest-' + map_name)
+
+
+def key(code=CODE, **kwargs):
+    kwargs.setdefault('map_name', 'test1')
+    kwargs.setdefault('enemy_name', 'ProtossBot')
+    kwargs.setdefault('seeds', 1)
+    return evaluation_key(code, **kwargs)
+
+
+def test_normalize_code_ignores_comments_and_blank_lines():
+    reformatted = '# generated\n' + CODE.replace('await self.attack()', 'await self.attack()  # go') + '\n\n'
+    assert normalize_code(reformatted) == normalize_code(CODE)
+    assert normalize_code('def broken(:') == 'def broken(:'
+
+
+def test_evaluation_key():
+    assert key() == key(CODE.replace('\n', '\n\n'))
+    assert key() != key(CODE.replace('attack', 'retreat'))
+    assert key() != key(map_name='test2')
+    assert key() != key(enemy_name='EnhancedZergBot')
+    assert key() != key(seeds=2)
+
+
+def test_save_and_load():
+    assert load_evaluation('missing') is None
+    records = [{'result': 'data', 'content': {'result': 'Victory'}}]
+    save_evaluation('result', {'type': 'result', 'message': {'win': 1}, 'records': records, 'extra': 1})
+    assert load_evaluation('result') == {'type': 'result', 'message': {'win': 1}, 'records': records}
+    save_evaluation('preflight', {'type': 'bug', 'message': 'NameError'})
+    assert load_evaluation('preflight') == {'type': 'bug', 'message': 'NameError'}
+
+
+def test_bugs_from_game_runs_are_not_cached():
+    save_evaluation('game', {'type': 'bug', 'message': 'result disappear !!!', 'retry': True})
+    assert load_evaluation('game') is None
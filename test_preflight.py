@@ -0,0 +1,115 @@
+import asyncio
+import os
+import types
+
+import pytest
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+import preflight
+from sc2.data import Attribute, Target
+from sc2.ids.ability_id import AbilityId
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.test_game_info import make_game_info
+
+BOT = '''
+from sc2.bot_ai import BotAI
+
+
+class BattleBot(BotAI):
+    async def on_step(self, iteration):
+{}
+'''
+UNIT_TYPES = (UnitTypeId.MARINE, UnitTypeId.COMMANDCENTER, UnitTypeId.ZERGLING)
+
+
+def fixture_protos():
+    """ One own marine and command center against a zergling on a synthetic map """
+    data = sc_pb.ResponseData()
+    data.abilities.add(ability_id=AbilityId.ATTACK.value, available=True, target=Target.PointOrUnit.value)
+    for unit_type in UNIT_TYPES:
+        unit_data = data.units.add(unit_id=unit_type.value, name=unit_type.name, available=True)
+        if unit_type == UnitTypeId.COMMANDCENTER:
+            unit_data.attributes.append(Attribute.Structure.value)
+    game_info = make_game_info(64, 64, 0)
+    game_info.player_info.add(player_id=1, race_actual=1)
+    game_info.player_info.add(player_id=2, race_actual=2)
+    observation = sc_pb.ResponseObservation()
+    observation.observation.game_loop = 1
+    for tag, unit_type, alliance, x in ((1, UnitTypeId.MARINE, 1, 10), (2, UnitTypeId.COMMANDCENTER, 1, 8),
+                                        (3, UnitTypeId.ZERGLING, 4, 40)):
+        unit = observation.observation.raw_data.units.add(tag=tag, unit_type=unit_type.value, alliance=alliance,
+                                                          health=40, health_max=40, build_progress=1)
+        unit.pos.x, unit.pos.y = x, 10
+    return data, game_info, observation
+
+
+class FixtureClient:
+
+    def __init__(self, data):
+        self.data = data
+
+    async def _execute(self, **kwargs):
+        return sc_pb.Response(data=self.data)
+
+
+@pytest.fixture
+def fixture_dir(tmp_path, monkeypatch):
+    """ Records the synthetic fixture like a game would and points preflight to it """
+    data, game_info, observation = fixture_protos()
+    bot = types.SimpleNamespace(
+        client=FixtureClient(data),
+        game_info=types.SimpleNamespace(_proto=game_info),
+        state=types.SimpleNamespace(response_observation=observation),
+        player_id=1,
+    )
+    path = str(tmp_path / 'fixtures' / 'map-digest')
+    asyncio.run(preflight.record_fixture(bot, path))
+    monkeypatch.setattr(preflight, 'fixture_path', lambda map_name: path)
+    return path
+
+
+def check(body, **kwargs):
+    return preflight.preflight(BOT.format(body), map_name='map', steps=3, **kwargs)
+
+
+def test_fixture_is_written_atomically_and_read_back(fixture_dir):
+    data, game_info, observation = fixture_protos()
+    assert preflight.load_fixture(fixture_dir) == (data, game_info, observation, 1)
+    # No temporary directory is left next to the fixture
+    assert os.listdir(os.path.dirname(fixture_dir)) == [os.path.basename(fixture_dir)]
+    # A second recording of the same map keeps the first one
+    bot = types.SimpleNamespace(client=FixtureClient(data), game_info=types.SimpleNamespace(_proto=game_info),
+                                state=types.SimpleNamespace(response_observation=observation), player_id=2)
+    asyncio.run(preflight.record_fixture(bot, fixture_dir))
+    assert preflight.load_fixture(fixture_dir)[3] == 1
+    assert os.listdir(os.path.dirname(fixture_dir)) == [os.path.basename(fixture_dir)]
+    assert preflight.load_fixture(str(fixture_dir) + '-missing') is None
+
+
+def test_working_bot_passes(fixture_dir):
+    body = '        for marine in self.units(UnitTypeId.MARINE):\n            marine.attack(self.enemy_units.closest_to(marine))'
+    result = check('        from sc2.ids.unit_typeid import UnitTypeId\n' + body)
+    assert result == {'type': 'pass', 'message': '', 'driven': True}
+
+
+def test_name_and_attribute_errors_are_bugs(fixture_dir):
+    result = check('        self.units.first.attack(undefined_target)')
+    assert result['type'] == 'bug' and result['driven'] and 'NameError' in result['message']
+    result = check('        self.units.first.no_such_command()')
+    assert result['type'] == 'bug' and 'AttributeError' in result['message']
+
+
+def test_other_runtime_errors_are_left_to_the_game(fixture_dir):
+    result = check('        raise ValueError("only seen against the stub client")')
+    assert result['type'] == 'unknown' and not result['driven'] and 'ValueError' in result['message']
+
+
+def test_hanging_bot_is_a_bug_instead_of_blocking(fixture_dir):
+    result = check('        while True:\n            pass', timeout=2)
+    assert result['type'] == 'bug' and 'did not return within 2s' in result['message']
+
+
+def test_without_fixture_the_code_is_only_imported(monkeypatch, tmp_path):
+    monkeypatch.setattr(preflight, 'fixture_path', lambda map_name: str(tmp_path / 'missing'))
+    assert check('        pass') == {'type': 'pass', 'message': 'no preflight fixture for map', 'driven': False}
+    assert check('        pass\n  broken indentation')['type'] == 'bug'
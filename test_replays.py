@@ -0,0 +1,72 @@
+import asyncio
+import os
+import types
+
+import pytest
+from s2clientprotocol import sc2api_pb2 as sc_pb
+
+import replays
+from sc2.data import Result
+
+
+@pytest.fixture(autouse=True)
+def in_tmp_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+class ReplayClient:
+
+    async def _execute(self, **kwargs):
+        assert 'save_replay' in kwargs
+        return sc_pb.Response(save_replay=sc_pb.ResponseSaveReplay(data=b'replay'))
+
+
+def play(policy, result, code=None):
+    """Ends a game with result under policy and waits until its replay is written"""
+    async def on_end(game_result):
+        pass
+
+    bot = types.SimpleNamespace(client=ReplayClient(), on_end=on_end)
+    replays.attach_replay_saver(bot, policy, code)
+    asyncio.run(bot.on_end(result))
+    replays._writer.submit(lambda: None).result()
+
+
+def names(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.SC2Replay'))
+
+
+def test_should_save_replay():
+    assert replays.should_save_replay(Result.Victory, 'victory')
+    assert not replays.should_save_replay(Result.Defeat, 'victory')
+    assert replays.should_save_replay('bug', 'bug')
+    assert not replays.should_save_replay(Result.Victory, 'never')
+
+
+def test_victory_policy_saves_won_games():
+    play('victory', Result.Defeat)
+    assert not os.path.exists(replays.replay_dir)
+    play('victory', Result.Victory)
+    assert len(names(replays.replay_dir)) == 1
+
+
+def test_final_policy_keeps_the_replays_of_the_accepted_code():
+    for code, result in (('accepted', Result.Victory), ('accepted', Result.Defeat), ('rejected', Result.Victory)):
+        play('final', result, code)
+    assert names(replays.replay_dir) == []
+    assert len(names(replays.pending_dir)) == 3
+
+    replays.keep_final_replays('accepted', policy='final')
+    kept = names(replays.replay_dir)
+    assert len(kept) == 2 and all(replays.replay_tag('accepted') in name for name in kept)
+    assert names(replays.pending_dir) == []
+
+
+def test_prune_replays_keeps_the_newest():
+    os.makedirs(replays.replay_dir)
+    for i in range(5):
+        path = os.path.join(replays.replay_dir, '{}.SC2Replay'.format(i))
+        open(path, 'wb').close()
+        os.utime(path, (i, i))
+    replays.prune_replays(keep=2)
+    assert names(replays.replay_dir) == ['3.SC2Replay', '4.SC2Replay']
@@ -0,0 +1,217 @@
+import asyncio
+import json
+import random
+import time
+import traceback
+import types
+
+import numpy as np
+
+import rollout
+from configs.rollout_config import max_run_times
+from rollout import stop_decision
+from sc2.data import Result
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.test_bot_ai import make_bot, make_unit
+from sc2.units import Units
+
+
+def records(*results):
+    return [{'result': 'data', 'content': {'result': result}} for result in results]
+
+
+def start_service(monkeypatch, play, size=2):
+    """Pool with play instead of play_pooled_game, the forked workers inherit the patched functions"""
+    monkeypatch.setattr(rollout, 'play_pooled_game', play)
+    monkeypatch.setattr(rollout, 'flush_replays', lambda: None)
+    service = rollout.EvaluationService(size=size)
+    service.start()
+    return service
+
+
+def test_bug_stops_in_every_mode():
+    for mode in ('off', 'bound', 'sprt'):
+        assert stop_decision(records('Victory') + [{'result': 'bug', 'content': ''}], 3, mode=mode) == 'bug'
+
+
+def test_off_never_stops_early():
+    assert stop_decision(records('Defeat', 'Defeat'), 3, mode='off') is None
+
+
+def test_bound():
+    assert stop_decision(records('Victory', 'Victory'), 3, threshold=0.6, mode='bound') == 'pass'
+    assert stop_decision(records('Victory'), 3, threshold=0.6, mode='bound') is None
+    assert stop_decision(records('Defeat', 'Tie'), 3, threshold=0.6, mode='bound') == 'fail'
+    assert stop_decision(records('Victory', 'Defeat'), 3, threshold=0.9, mode='bound') == 'fail'
+    assert stop_decision(records('Victory', 'Victory', 'Victory'), 3, threshold=0.9, mode='bound') == 'pass'
+
+
+def test_sprt_bounds_of_the_config():
+    # The bounds documented next to sprt_delta in configs/rollout_config.py
+    assert stop_decision(records(*['Victory'] * 19), max_run_times, threshold=0.9, mode='sprt') is None
+    assert stop_decision(records(*['Victory'] * 20), max_run_times, threshold=0.9, mode='sprt') == 'pass'
+    assert stop_decision(records('Defeat', 'Defeat'), max_run_times, threshold=0.9, mode='sprt') == 'fail'
+    one_loss = records('Defeat', *['Victory'] * 29)
+    assert stop_decision(one_loss, max_run_times, threshold=0.9, mode='sprt') is None
+    assert stop_decision(one_loss + records('Victory'), max_run_times, threshold=0.9, mode='sprt') == 'pass'
+    assert max_run_times >= 31
+
+
+def test_verdict_drops_the_games_in_flight_and_keeps_the_workers(monkeypatch):
+    async def play(controllers, code, map_name, enemy_name, seed=None, path='res-temp.py'):
+        await asyncio.sleep(0.3 if code == 'code' and seed == rollout.rollout_seed(0) else 1.5)
+        return {'result': 'data', 'content': {'result': 'Defeat', 'code': code}}
+
+    service = start_service(monkeypatch, play)
+    try:
+        pids = [worker.pid for worker in service.workers]
+        start = time.time()
+        finished = service.evaluate_until('code', 3, lambda done: 'fail' if done else None, map_name='map')
+        assert len(finished) == 1 and time.time() - start < 1.5
+        # The outdated game finishes during the next evaluation and its result is dropped
+        finished = service.evaluate('other', 2, map_name='map')
+        assert [data['content']['code'] for data in finished] == ['other', 'other']
+        # No worker was killed, the SC2 clients stay in the pool
+        assert pids == [worker.pid for worker in service.workers]
+        assert not service.cancelled
+    finally:
+        service.close()
+
+
+def test_cancelled_jobs_are_skipped_before_they_start(monkeypatch):
+    async def play(controllers, code, map_name, enemy_name, seed=None, path='res-temp.py'):
+        return {'result': 'data', 'content': {'result': 'Victory'}}
+
+    service = start_service(monkeypatch, play, size=1)
+    try:
+        generation = service._next_generation()
+        service.cancel([service.job_count + 1])
+        job_id = service._submit(generation, 'code', 'res-temp.py', 'map', 'enemy', None)
+        assert service.result_queue.get(timeout=10) == (job_id, {'result': 'skipped'})
+        # Cancelled ids are kept in a ring of cancelled_capacity entries
+        service.cancel(range(100, 100 + service.cancelled_capacity))
+        assert job_id not in service.shared_cancelled[:]
+    finally:
+        service.close()
+
+
+def test_candidates_are_evaluated_together_and_stop_separately(monkeypatch):
+    async def play(controllers, code, map_name, enemy_name, seed=None, path='res-temp.py'):
+        await asyncio.sleep(0.1)
+        return {'result': 'data',
+                'content': {'result': 'Victory' if code == 'good' else 'Defeat', 'seed': seed, 'path': path}}
+
+    service = start_service(monkeypatch, play)
+    try:
+        results = service.evaluate_many(['good', 'bad'], 3,
+                                        lambda done: stop_decision(done, 3, threshold=0.6, mode='bound'), map_name='map',
+                                        paths=['res-cand0.py', 'res-cand1.py'])
+    finally:
+        service.close()
+    good, bad = results
+    assert [data['content']['result'] for data in good] == ['Victory', 'Victory']
+    assert [data['content']['result'] for data in bad] == ['Defeat', 'Defeat']
+    assert {data['content']['path'] for data in bad} == {'res-cand1.py'}
+    # Game i of every candidate uses the same seed
+    assert sorted(data['content']['seed'] for data in good) == sorted(data['content']['seed'] for data in bad)
+
+
+def test_tracebacks_show_the_lines_of_the_loaded_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    code = 'class BattleBot:\n    def on_step(self):\n        return undefined_name\n'
+    (tmp_path / 'res-cand1.py').write_text(code)
+    (tmp_path / 'res-temp.py').write_text('# another candidate\n' * 5)
+    module = rollout.load_bot_module(code, 'res-cand1.py')
+    assert module.__file__ == 'res-cand1.py'
+    try:
+        module.BattleBot().on_step()
+    except NameError:
+        message = traceback.format_exc()
+    assert 'File "res-cand1.py", line 3' in message and 'return undefined_name' in message
+
+
+def test_rollout_seeds(monkeypatch):
+    monkeypatch.setattr(rollout, 'base_seed', 100)
+    assert [rollout.rollout_seed(i) for i in range(3)] == [100, 101, 102]
+    monkeypatch.setattr(rollout, 'base_seed', None)
+    assert rollout.rollout_seed(5) is None
+
+    rollout.seed_everything(7)
+    first = (random.random(), np.random.rand())
+    rollout.seed_everything(7)
+    assert (random.random(), np.random.rand()) == first
+
+    enemy = types.SimpleNamespace(rng=random.Random())
+    rollout.seed_enemy(enemy, 7)
+    assert enemy.rng.random() == random.Random(7).random()
+    rollout.seed_enemy(enemy, None)
+
+
+def test_game_seed_reads_the_environment(monkeypatch):
+    monkeypatch.setenv(rollout.SEED_ENV, '42')
+    assert rollout.game_seed() == 42
+    monkeypatch.delenv(rollout.SEED_ENV)
+    assert rollout.game_seed() is None
+
+
+def test_hung_game_counts_as_timed_out_tie(monkeypatch):
+    async def play(controllers, code, map_name, enemy_name, seed=None, path='res-temp.py'):
+        await asyncio.sleep(60)
+
+    monkeypatch.setattr(rollout, 'game_wall_timeout', 1)
+    service = start_service(monkeypatch, play, size=1)
+    try:
+        pid = service.workers[0].pid
+        finished = service.evaluate('code', 1, map_name='map')
+        assert service.workers[0].pid != pid
+    finally:
+        service.close()
+    assert finished == [{'result': 'data', 'content': rollout.timeout_record(rollout.rollout_seed(0))}]
+    assert finished[0]['content']['result'] == 'Tie' and finished[0]['content']['timeout']
+
+
+def test_configure_stepping_keeps_the_values_of_the_bot():
+    bot, custom = types.SimpleNamespace(), types.SimpleNamespace(pathing_grid_refresh='always', coarse_game_step=4)
+    rollout.configure_stepping(bot, custom)
+    assert bot.pathing_grid_refresh == 'on_change' and bot.coarse_game_step == rollout.coarse_game_step
+    assert custom.pathing_grid_refresh == 'always' and custom.coarse_game_step == 4
+
+
+def finished_bot():
+    """ A bot at the end of a game with two marines left against a zergling and a hatchery """
+    bot = make_bot()
+    bot.state = types.SimpleNamespace(game_loop=2240, score=types.SimpleNamespace(
+        score=1500, total_damage_dealt_life=300.0, total_damage_dealt_shields=20.0, total_damage_taken_life=90.0,
+        total_damage_taken_shields=0.0, killed_value_units=400.0, lost_minerals_army=50.0, lost_vespene_army=0.0))
+    bot.units = Units([make_unit(bot, 1, 0, 0), make_unit(bot, 2, 1, 0)], bot)
+    bot.enemy_units = Units([make_unit(bot, 3, 9, 9, alliance=4, unit_type=UnitTypeId.ZERGLING)], bot)
+    bot.enemy_structures = Units([make_unit(bot, 4, 20, 20, alliance=4, unit_type=UnitTypeId.HATCHERY)], bot)
+    return bot
+
+
+def test_game_record_of_every_result():
+    record = rollout.game_record(finished_bot(), Result.Tie, seed=7)
+    assert record['result'] == 'Tie' and record['seed'] == 7 and record['game_loop'] == 2240
+    assert record['units_num'] == 2 and record['enemy_num'] == 2
+    assert record['survivors'] == {'MARINE': 2} and record['enemy_survivors'] == {'ZERGLING': 1, 'HATCHERY': 1}
+    # No step was measured yet, the minimum is reported as 0 instead of inf
+    assert record['step_time']['min'] == 0 and record['commands'] == {'sent': 0, 'suppressed': 0}
+    victory = rollout.game_record(finished_bot(), Result.Victory)
+    assert victory['enemy_num'] == 0 and victory['enemy_survivors'] == {} and victory['units_num'] == 2
+    defeat = rollout.game_record(finished_bot(), Result.Defeat)
+    assert defeat['units_num'] == 0 and defeat['survivors'] == {} and defeat['enemy_num'] == 2
+    # Every field of a played game is also in the timeout record
+    assert rollout.timeout_record(7).keys() == record.keys() | {'timeout'}
+    assert json.loads(json.dumps(record)) == record
+
+
+def test_write_game_record_to_the_result_path(tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'result.json'
+    monkeypatch.setenv(rollout.RESULT_PATH_ENV, str(path))
+    rollout.write_game_record(finished_bot(), Result.Victory, 3)
+    assert json.loads(path.read_text()) == rollout.game_record(finished_bot(), Result.Victory, 3)
+    assert capsys.readouterr().out == ''
+    # Without the environment variable the record is printed
+    monkeypatch.delenv(rollout.RESULT_PATH_ENV)
+    rollout.write_game_record(finished_bot(), Result.Defeat, 3)
+    assert json.loads(capsys.readouterr().out) == rollout.game_record(finished_bot(), Result.Defeat, 3)
@@ -10,7 +10,8 @@ import os
 from datetime import datetime
 from LLM.call_llm_api.call_llm import main_logger
 import shutil
-from configs.rollout_config import wining_rate
+from configs.rollout_config import wining_rate, candidates_per_round
+from replays import keep_final_replays
 import config
 
 def copy_and_rename_files(file_list, target_folder, prefix="success"):
@@ -139,14 +140,24 @@ def test_training(test_tech_table, log_dir):
             main_logger.info('##################### Generating #####################')
             print('##################### Generating #####################')
 
-            code = coder.generate_code(promotion)
-            main_logger.info('The basic code is:\n' + code)
-
-            if code == None:
-                main_logger.debug('The on_step function defination is wrong. Re-generate the code.')
-                print('The on_step function defination is wrong. Re-generate the code.')
-                continue
-            data = coder.test_code(restart_idx, iter_idx)
+            if candidates_per_round > 1:
+                # 并发生成多份候选代码并行评估，只把最好的一份交给 summarizer
+                paths = coder.generate_candidates(promotion, candidates_per_round)
+                if not paths:
+                    main_logger.debug('The on_step function defination is wrong. Re-generate the code.')
+                    print('The on_step function defination is wrong. Re-generate the code.')
+                    continue
+                data, code = coder.test_candidates(paths, restart_idx, iter_idx)
+                main_logger.info('The basic code is:\n' + code)
+            else:
+                code = coder.generate_code(promotion)
+                main_logger.info('The basic code is:\n' + code)
+
+                if code == None:
+                    main_logger.debug('The on_step function defination is wrong. Re-generate the code.')
+                    print('The on_step function defination is wrong. Re-generate the code.')
+                    continue
+                data = coder.test_code(restart_idx, iter_idx)
             if data['type'] == 'bug':
                 # TODO
                 bug_time += 1
@@ -155,6 +166,8 @@ def test_training(test_tech_table, log_dir):
                 result = data['message']
                 bug_time = 0
                 if isinstance(result, dict) and (result.get('win') / result.get('times')) >= wining_rate:
+                    # res-temp.py 可能正在被 archive_code 异步移走，直接使用内存中评估过的完整代码
+                    keep_final_replays(code)
                     shutil.copy2('res-temp.py', 'pre_code.py')
                     files_to_copy = ['pre_code.py']
                     copy_and_rename_files(files_to_copy, log_dir, "success")